@@ -1,4 +1,5 @@
 from .docker_container_directory import DockerContainerDirectory
 from .docker_container_sql import DockerContainerSql
+from .dedup import DedupRepositoryAdapter, LocalToDedup, DedupToLocal
 from .ftp import FtpRepositoryAdapter, LocalToFtp, FtpToLocal
 from .local import LocalBackupCreator, LocalRepositoryAdapter, LocalToLocal
@@ -0,0 +1,481 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+import uuid
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Iterable, List
+
+from easybackup.core.backup import Backup
+from easybackup.core.exceptions import EasyBackupException
+from easybackup.core.repository import RepositoryAdapter
+from easybackup.core.repository_link import RepositoryLink
+from easybackup.core.volume import Volume
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = False
+
+# bytes sampled by the chunker, derived from sha256 so that cut points are stable across runs
+SAMPLE_TABLE = bytes(hashlib.sha256(bytes([byte])).digest()[0] & 1 for byte in range(256))
+
+
+class CdcChunker():
+
+    """
+    Content-defined chunking with FastCDC normalized cut conditions.
+
+    Bytes are sampled to 0 or 1 and candidate cut points are the ends of
+    `pattern` in the sampled data, found with `bytes.translate` and
+    `find` so that scanning runs at C speed. A candidate is a cut point
+    when the CRC-32 of the `window` preceding bytes matches a mask. The mask is stricter before
+    the average size and looser after it, like FastCDC, chunk sizes are
+    bounded to [average / 4, average * 4]. Cut points only depend on the
+    bytes preceding them, an insertion in an archive only changes the
+    chunks around it.
+    """
+
+    # mixed zeros and ones keep candidates frequent when sampled bytes are skewed
+    pattern = b'\x01\x00\x01\x01\x00\x01\x00\x00'
+    window = 32
+
+    def __init__(self, average_size: int = 1024 * 1024):
+        bits = max(12, average_size.bit_length() - 1)
+        self.average_size = 1 << bits
+        self.min_size = self.average_size // 4
+        self.max_size = self.average_size * 4
+        self.mask_small = (1 << (bits - len(self.pattern) + 2)) - 1
+        self.mask_large = (1 << (bits - len(self.pattern) - 2)) - 1
+
+    def cut(self, data) -> int:
+        """ return the length of the first chunk of data """
+
+        size = len(data)
+        if size <= self.min_size:
+            return size
+
+        normal = min(self.average_size, size)
+        end = min(self.max_size, size)
+        sampled = bytes(data[:end]).translate(SAMPLE_TABLE)
+        pattern, window, crc32 = self.pattern, self.window, zlib.crc32
+
+        index = self.min_size - len(pattern)
+        while True:
+            index = sampled.find(pattern, index + 1, end)
+            if index < 0:
+                return end
+
+            cut = index + len(pattern)
+            mask = self.mask_small if cut < normal else self.mask_large
+            if not crc32(data[cut - window:cut]) & mask:
+                return cut
+
+
+class ChunkStore():
+
+    """
+    Chunks of a dedup repository directory, named by their sha256.
+
+    Every chunk counts the recipes referencing it, counts are saved in
+    `refcounts.json` and a chunk is removed once its count drops to 0.
+    `locked` serializes recipe changes across threads and, with `flock`,
+    across processes. Stores are shared by every adapter of a directory,
+    chunks referenced by archives being written are pending and never
+    removed.
+    """
+
+    _stores = {}
+    _stores_lock = threading.Lock()
+
+    RAW = b'R'
+    ZLIB = b'Z'
+
+    refcounts_filename = 'refcounts.json'
+    lock_filename = '.lock'
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.lock = threading.RLock()
+        self.pending = Counter()
+
+    @classmethod
+    def of(cls, directory: str) -> 'ChunkStore':
+        directory = os.path.abspath(directory)
+        with cls._stores_lock:
+            if directory not in cls._stores:
+                cls._stores[directory] = cls(directory)
+            return cls._stores[directory]
+
+    def path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest[:2], digest)
+
+    def put(self, digest: str, data: bytes, compression_level: int):
+        """ store chunk unless it already exists, the chunk stays pending until released """
+
+        with self.lock:
+            self.pending[digest] += 1
+            exists = os.path.exists(self.path(digest))
+
+        if exists:
+            return False
+
+        path = self.path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = '%s.%s.tmp' % (path, uuid.uuid4().hex)
+        with open(tmp_path, 'wb') as chunk:
+            if compression_level:
+                chunk.write(self.ZLIB + zlib.compress(data, compression_level))
+            else:
+                chunk.write(self.RAW + data)
+        os.replace(tmp_path, path)
+        return True
+
+    def get(self, digest: str) -> bytes:
+
+        with open(self.path(digest), 'rb') as chunk:
+            content = chunk.read()
+
+        data = zlib.decompress(content[1:]) if content[:1] == self.ZLIB else content[1:]
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise EasyBackupException('dedup_chunk_corrupted', chunk=digest)
+        return data
+
+    def release(self, digests: List[str]):
+        with self.lock:
+            self.pending.subtract(digests)
+            self.pending += Counter()
+
+    @contextmanager
+    def locked(self, recipes: Callable[[], Iterable[set]]):
+        """
+        hold the store exclusively and yield its reference counts, to be saved
+        with `save_refcounts`. Missing counts, in a store written before they
+        were kept, are rebuilt from `recipes`, the chunk digests of each recipe.
+        """
+
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, self.lock_filename), 'a') as lock:
+                if fcntl:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                try:
+                    refcounts = self.read_refcounts()
+                    if refcounts is None:
+                        refcounts = Counter()
+                        for digests in recipes():
+                            refcounts.update(digests)
+                        self.save_refcounts(refcounts)
+                    yield refcounts
+                finally:
+                    if fcntl:
+                        fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def read_refcounts(self) -> Counter:
+        try:
+            with open(os.path.join(self.directory, self.refcounts_filename), 'r') as refcounts:
+                return Counter(json.load(refcounts))
+        except FileNotFoundError:
+            return None
+
+    def save_refcounts(self, refcounts: Counter):
+        path = os.path.join(self.directory, self.refcounts_filename)
+        with open(path+'.tmp', 'w') as tmp:
+            json.dump(refcounts, tmp, separators=(',', ':'))
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(path+'.tmp', path)
+
+    def check(self, digests: Iterable[str]):
+        """ raise if a chunk was removed by another process before its recipe was written """
+        for digest in digests:
+            if not os.path.exists(self.path(digest)):
+                raise EasyBackupException('dedup_chunk_missing', chunk=digest)
+
+    def sweep(self, refcounts: Counter, digests: Iterable[str]) -> int:
+        """ remove chunks among digests neither referenced nor pending, return the count of removed chunks """
+
+        removed = 0
+        for digest in digests:
+            if refcounts[digest] > 0 or self.pending[digest] > 0:
+                continue
+            del refcounts[digest]
+            try:
+                os.remove(self.path(digest))
+                removed += 1
+            except FileNotFoundError:
+                pass
+
+        return removed
+
+    def digests(self) -> List[str]:
+        """ return every stored chunk, by listing the store directory """
+        return [
+            name
+            for prefix in self.list_directory(self.directory) if '.' not in prefix
+            for name in self.list_directory(os.path.join(self.directory, prefix)) if '.' not in name
+        ]
+
+    @classmethod
+    def list_directory(cls, directory):
+        try:
+            return os.listdir(directory)
+        except FileNotFoundError:
+            return []
+
+
+class ChunkingWriter():
+
+    """ Binary writer splitting its content in chunks, returns the recipe on finish """
+
+    def __init__(self, store: ChunkStore, chunker: CdcChunker, compression_level: int):
+        self._store = store
+        self._chunker = chunker
+        self._compression_level = compression_level
+        self._buffer = bytearray()
+        self.chunks = []
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= self._chunker.max_size:
+            self._emit(self._chunker.cut(self._buffer))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def finish(self) -> dict:
+        while self._buffer:
+            self._emit(self._chunker.cut(self._buffer))
+        return {'size': self.size, 'chunks': self.chunks}
+
+    @property
+    def digests(self) -> List[str]:
+        return [digest for digest, _ in self.chunks]
+
+    def _emit(self, size):
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        digest = hashlib.sha256(data).hexdigest()
+        self._store.put(digest, data, self._compression_level)
+        self.chunks.append([digest, size])
+
+
+class RecipeReader(io.RawIOBase):
+
+    """ Readable stream of an archive rebuilt from its recipe's chunks """
+
+    def __init__(self, store: ChunkStore, recipe: dict):
+        self._store = store
+        self._chunks = iter(recipe['chunks'])
+        self._current = memoryview(b'')
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while not self._current:
+            digest = next(self._chunks, None)
+            if digest is None:
+                return 0
+            self._current = memoryview(self._store.get(digest[0]))
+
+        size = min(len(buffer), len(self._current))
+        buffer[:size] = self._current[:size]
+        self._current = self._current[size:]
+        return size
+
+
+class DedupRepositoryAdapter(RepositoryAdapter):
+
+    """
+    Repository storing archives as content-defined chunks.
+
+    Archives are split by `CdcChunker`, chunks are stored once under `chunks/`, named by their sha256, and
+    each backup is a recipe under `recipes/` listing its chunks. On
+    cleanup, chunks whose reference count drops to 0 are removed.
+    Deduplication works on the bytes written by creators, it is only
+    effective with uncompressed archives (`compression: none`), chunks
+    are compressed by the repository.
+    """
+
+    type_tag = 'dedup'
+    volume_pushdown = True
+    recipe_suffix = '.recipe'
+
+    def setup(self, directory, chunk_size=1024 * 1024, compression_level=6):
+        self.directory = directory
+        self.chunker = CdcChunker(chunk_size)
+        self.compression_level = compression_level
+        self.store = ChunkStore.of(os.path.join(directory, 'chunks'))
+
+    @property
+    def identity(self):
+        return (self.type_tag, os.path.abspath(self.directory))
+
+    def fetch_backups(self, volume: Volume = False) -> List[Backup]:
+        backups = map(self.filename_to_backup, self.backup_filenames(volume=volume))
+        return sorted(backups, key=lambda backup: backup.epoch)
+
+    def list_backup_filenames(self, volume: Volume = False) -> List[str]:
+        prefix = volume.filename_prefix() if volume else self._prefix
+        return [
+            name[:-len(self.recipe_suffix)]
+            for name in ChunkStore.list_directory(self.recipes_directory)
+            if name.startswith(prefix) and name.endswith(self.recipe_suffix)
+            and self.filename_match_backup(name[:-len(self.recipe_suffix)])
+        ]
+
+    def cleanup_backups(self, backups: List[Backup]):
+
+        if not backups:
+            return
+
+        filenames = list(map(self.backup_to_filename, backups))
+        with self.store.locked(self.recipe_digests) as refcounts:
+            released = [self.read_digests(filename) for filename in filenames]
+            # recipes go first, an interrupted cleanup leaves chunks counted too much, never too little
+            for filename in filenames:
+                os.remove(self.recipe_path(filename))
+            for digests in released:
+                refcounts.subtract(digests)
+            refcounts = +refcounts
+            self.store.save_refcounts(refcounts)
+            self.store.sweep(refcounts, set().union(*released))
+
+        for backup in backups:
+            try:
+                os.remove(os.path.join(self.recipes_directory, self.metadata_filename(backup)))
+            except FileNotFoundError:
+                pass
+
+        if self.catalog:
+            self.catalog.remove(filenames)
+
+    def collect_garbage(self) -> int:
+        """ recount references from every recipe and remove chunks no recipe references, like after a crash """
+
+        with self.store.locked(self.recipe_digests) as refcounts:
+            refcounts.clear()
+            for digests in self.recipe_digests():
+                refcounts.update(digests)
+            removed = self.store.sweep(refcounts, self.store.digests())
+            self.store.save_refcounts(refcounts)
+
+        return removed
+
+    def recipe_digests(self) -> Iterable[set]:
+        for filename in self.list_backup_filenames():
+            yield self.read_digests(filename)
+
+    def read_digests(self, filename) -> set:
+        return {digest for digest, _ in self.read_recipe(filename)['chunks']}
+
+    @contextmanager
+    def open_backup_writer(self, backup):
+
+        filename = self.backup_to_filename(backup)
+        if os.path.exists(self.recipe_path(filename)):
+            raise FileExistsError(self.recipe_path(filename))
+
+        writer = ChunkingWriter(self.store, self.chunker, self.compression_level)
+        committed = False
+        try:
+            yield writer
+            recipe = writer.finish()
+            digests = set(writer.digests)
+            with self.store.locked(self.recipe_digests) as refcounts:
+                self.store.check(digests)
+                # counts are saved first, an interrupted write leaves chunks counted too much, never too little
+                refcounts.update(digests)
+                self.store.save_refcounts(refcounts)
+                self.write_recipe(filename, recipe)
+                committed = True
+        finally:
+            if committed:
+                self.store.release(writer.digests)
+            else:
+                # chunks stored by the failed write and used by no recipe are removed
+                with self.store.locked(self.recipe_digests) as refcounts:
+                    self.store.release(writer.digests)
+                    if self.store.sweep(refcounts, set(writer.digests)):
+                        self.store.save_refcounts(refcounts)
+
+    @contextmanager
+    def open_backup_reader(self, backup):
+        with RecipeReader(self.store, self.read_recipe(self.backup_to_filename(backup))) as reader:
+            yield io.BufferedReader(reader, buffer_size=self.chunker.average_size)
+
+    def backup_size(self, backup) -> int:
+        return self.read_recipe(self.backup_to_filename(backup))['size']
+
+    def read_metadata(self, backup):
+        try:
+            with open(os.path.join(self.recipes_directory, self.metadata_filename(backup)), 'r') as metadata:
+                return json.load(metadata)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def write_metadata(self, backup, metadata):
+        os.makedirs(self.recipes_directory, exist_ok=True)
+        path = os.path.join(self.recipes_directory, self.metadata_filename(backup))
+        with open(path+'.tmp', 'w') as tmp:
+            json.dump(metadata, tmp)
+        os.replace(path+'.tmp', path)
+
+    def read_recipe(self, filename) -> dict:
+        with open(self.recipe_path(filename), 'r') as recipe:
+            return json.load(recipe)
+
+    def write_recipe(self, filename, recipe):
+        os.makedirs(self.recipes_directory, exist_ok=True)
+        tmp_path = self.recipe_path(filename)+'.tmp'
+        with open(tmp_path, 'w') as tmp:
+            json.dump(recipe, tmp, separators=(',', ':'))
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, self.recipe_path(filename))
+
+    @property
+    def recipes_directory(self):
+        return os.path.join(self.directory, 'recipes')
+
+    def recipe_path(self, filename):
+        return os.path.join(self.recipes_directory, filename+self.recipe_suffix)
+
+
+class LocalToDedup(RepositoryLink):
+
+    type_tag_source = 'local'
+    type_tag_target = 'dedup'
+
+    buffer_size = 1024 * 1024
+
+    def copy_backup(self, backup):
+        with open(self.source_adapter.backup_path(backup), 'rb') as source:
+            with self.target_adapter.open_backup_writer(backup) as target:
+                shutil.copyfileobj(source, target, self.buffer_size)
+                return target.size
+
+
+class DedupToLocal(RepositoryLink):
+
+    type_tag_source = 'dedup'
+    type_tag_target = 'local'
+
+    buffer_size = 1024 * 1024
+
+    def copy_backup(self, backup):
+        with self.source_adapter.open_backup_reader(backup) as source:
+            with self.target_adapter.open_backup_writer(backup) as target:
+                shutil.copyfileobj(source, target, self.buffer_size)
+        return self.source_adapter.backup_size(backup)
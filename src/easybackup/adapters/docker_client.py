@@ -0,0 +1,334 @@
+import collections
+import io
+import json
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import List
+from urllib.parse import quote
+
+from easybackup.core.exceptions import DockerApiError, DockerExecError
+
+DEFAULT_SOCKET = '/var/run/docker.sock'
+
+STREAM_STDOUT = 1
+STREAM_STDERR = 2
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+class DockerClient():
+
+    """
+    Minimal Docker Engine API client speaking HTTP/1.1 over a unix socket.
+
+    Only the endpoints used by the docker creators are implemented.
+    Every request opens its own connection, so a stream can be consumed
+    while other requests are issued. Streams are read on demand, the
+    daemon is slowed down by the socket when the consumer is slower.
+    """
+
+    exec_timeout = 30
+
+    def __init__(self, socket_path=DEFAULT_SOCKET):
+        self.socket_path = socket_path
+
+    def exec_create(self, container: str, command: List[str], user=False, stdin=False) -> str:
+        body = {
+            'AttachStdin': stdin,
+            'AttachStdout': True,
+            'AttachStderr': True,
+            'Tty': False,
+            'Cmd': list(command)
+        }
+        if user:
+            body['User'] = user
+
+        return self.request_json('POST', '/containers/%s/exec' % quote(container), body)['Id']
+
+    def exec_inspect(self, exec_id: str) -> dict:
+        return self.request_json('GET', '/exec/%s/json' % quote(exec_id))
+
+    def exec_wait(self, exec_id: str) -> int:
+        """ return exec's exit code, once the daemon reports it stopped """
+
+        deadline = time.monotonic() + self.exec_timeout
+        while True:
+            state = self.exec_inspect(exec_id)
+            if not state.get('Running') and state.get('ExitCode') is not None:
+                return state['ExitCode']
+            if time.monotonic() > deadline:
+                return state.get('ExitCode')
+            time.sleep(0.05)
+
+    @contextmanager
+    def exec_stream(self, container: str, command: List[str], user=False):
+        """
+        run command in container and yield its stdout as a binary stream,
+        a non zero exit code raises DockerExecError once stdout has been consumed
+        """
+
+        exec_id = self.exec_create(container, command, user)
+        response = self.request(
+            'POST', '/exec/%s/start' % quote(exec_id),
+            {'Detach': False, 'Tty': False},
+            headers={'Connection': 'Upgrade', 'Upgrade': 'tcp'}
+        )
+
+        stream = MultiplexedStream(response.body)
+        try:
+            yield stream
+        finally:
+            response.close()
+
+        exit_code = self.exec_wait(exec_id)
+        if exit_code != 0:
+            raise DockerExecError(
+                'docker_exec_failed',
+                container=container,
+                command=' '.join(command),
+                returncode=exit_code,
+                stderr=stream.stderr().decode(errors='replace').strip()
+            )
+
+    @contextmanager
+    def exec_input(self, container: str, command: List[str], user=False):
+        """
+        run command in container and yield a binary writer feeding its stdin,
+        a non zero exit code raises DockerExecError once stdin has been closed
+        """
+
+        exec_id = self.exec_create(container, command, user, stdin=True)
+        response = self.request(
+            'POST', '/exec/%s/start' % quote(exec_id),
+            {'Detach': False, 'Tty': False},
+            headers={'Connection': 'Upgrade', 'Upgrade': 'tcp'}
+        )
+
+        # the output is read while stdin is written, a command printing a lot
+        # would otherwise stop reading its input once the connection is full
+        output = MultiplexedStream(response.body)
+        reader = threading.Thread(target=self.drain, args=(output,), daemon=True)
+        reader.start()
+        try:
+            with response.open_writer() as stdin:
+                yield stdin
+            response.shutdown_write()
+            reader.join()
+        finally:
+            response.close()
+            reader.join()
+
+        exit_code = self.exec_wait(exec_id)
+        if exit_code != 0:
+            raise DockerExecError(
+                'docker_exec_failed',
+                container=container,
+                command=' '.join(command),
+                returncode=exit_code,
+                stderr=output.stderr().decode(errors='replace').strip()
+            )
+
+    @staticmethod
+    def drain(stream):
+        """ read stream until the command exits, or the connection is closed """
+        try:
+            while stream.read(STREAM_BUFFER_SIZE):
+                pass
+        except (OSError, ValueError):
+            pass
+
+    def request_json(self, method, path, body=None):
+        response = self.request(method, path, body)
+        try:
+            return json.loads(response.body.read() or b'{}')
+        finally:
+            response.close()
+
+    def request(self, method, path, body=None, headers=None) -> 'HttpResponse':
+
+        payload = json.dumps(body).encode() if body is not None else b''
+        lines = [
+            '%s %s HTTP/1.1' % (method, path),
+            'Host: docker',
+            'Content-Length: %d' % len(payload)
+        ]
+        if body is not None:
+            lines.append('Content-Type: application/json')
+        for name, value in (headers or {'Connection': 'close'}).items():
+            lines.append('%s: %s' % (name, value))
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.socket_path)
+            sock.sendall(('\r\n'.join(lines)+'\r\n\r\n').encode('latin-1') + payload)
+            response = HttpResponse(sock)
+        except BaseException:
+            sock.close()
+            raise
+
+        if response.status >= 400:
+            try:
+                message = response.body.read().decode(errors='replace')
+            finally:
+                response.close()
+            try:
+                message = json.loads(message).get('message', message)
+            except ValueError:
+                pass
+            raise DockerApiError('docker_api_error', method=method, path=path, status=response.status, message=message)
+
+        return response
+
+
+class HttpResponse():
+
+    """ HTTP/1.1 response read from a socket, the body is streamed """
+
+    def __init__(self, sock):
+        self._sock = sock
+        self._fp = sock.makefile('rb')
+
+        status_line = self._fp.readline().decode('latin-1')
+        parts = status_line.split(' ', 2)
+        if len(parts) < 2 or not parts[0].startswith('HTTP/'):
+            raise ConnectionError('Invalid HTTP response from docker daemon: %r' % status_line)
+        self.status = int(parts[1])
+
+        self.headers = {}
+        while True:
+            line = self._fp.readline().decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            self.headers[name.strip().lower()] = value.strip()
+
+        if self.status == 101:
+            # hijacked connection, the raw stream follows the headers
+            self.body = HttpBody(self._fp)
+        elif self.headers.get('transfer-encoding', '').lower() == 'chunked':
+            self.body = HttpBody(self._fp, chunked=True)
+        elif 'content-length' in self.headers:
+            self.body = HttpBody(self._fp, length=int(self.headers['content-length']))
+        else:
+            self.body = HttpBody(self._fp)
+
+    def open_writer(self):
+        """ binary writer sending to a hijacked connection, closing it leaves the connection open """
+        return self._sock.makefile('wb')
+
+    def shutdown_write(self):
+        self._sock.shutdown(socket.SHUT_WR)
+
+    def close(self):
+        try:
+            # wakes up a thread blocked reading the connection
+            self._sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self._fp.close()
+        self._sock.close()
+
+
+class HttpBody(io.RawIOBase):
+
+    """ response body delimited by a length, by chunks, or by the end of the connection """
+
+    def __init__(self, fp, length=None, chunked=False):
+        self._fp = fp
+        self._remaining = length
+        self._chunked = chunked
+        self._done = False
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+
+        if self._done:
+            return 0
+
+        if self._chunked and not self._remaining:
+            if self._remaining == 0:
+                self._fp.readline()
+            size = int(self._fp.readline().split(b';')[0].strip() or b'0', 16)
+            if size == 0:
+                while self._fp.readline().strip():
+                    pass
+                self._done = True
+                return 0
+            self._remaining = size
+
+        size = len(buffer) if self._remaining is None else min(len(buffer), self._remaining)
+        count = self._fp.readinto(memoryview(buffer)[:size])
+
+        if self._remaining is not None:
+            if not count and size:
+                raise ConnectionError('Docker daemon closed the connection before the end of the response')
+            self._remaining -= count
+            if self._remaining == 0 and not self._chunked:
+                self._done = True
+        elif not count:
+            self._done = True
+
+        return count
+
+
+class MultiplexedStream(io.RawIOBase):
+
+    """
+    stdout of a docker stream multiplexed with stderr,
+    frames are an 8 bytes header (stream, 0, 0, 0, size) followed by data.
+    The tail of stderr is kept for error reporting.
+    """
+
+    stderr_limit = 64 * 1024
+
+    def __init__(self, raw):
+        self._raw = raw
+        self._remaining = 0
+        self._stderr = collections.deque()
+        self._stderr_size = 0
+
+    def readable(self):
+        return True
+
+    def stderr(self) -> bytes:
+        return b''.join(self._stderr)
+
+    def readinto(self, buffer):
+
+        while not self._remaining:
+            header = self._read_exactly(8)
+            if not header:
+                return 0
+            stream, size = header[0], int.from_bytes(header[4:8], 'big')
+            if stream == STREAM_STDERR:
+                self._keep_stderr(self._read_exactly(size))
+            elif stream == STREAM_STDOUT:
+                self._remaining = size
+            else:
+                self._read_exactly(size)
+
+        count = self._raw.readinto(memoryview(buffer)[:min(len(buffer), self._remaining)])
+        if not count:
+            raise ConnectionError('Docker stream ended in the middle of a frame')
+        self._remaining -= count
+        return count
+
+    def _keep_stderr(self, data):
+        self._stderr.append(data)
+        self._stderr_size += len(data)
+        while self._stderr_size > self.stderr_limit and len(self._stderr) > 1:
+            self._stderr_size -= len(self._stderr.popleft())
+
+    def _read_exactly(self, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = self._raw.read(size - len(data))
+            if not chunk:
+                if data:
+                    raise ConnectionError('Docker stream ended in the middle of a frame')
+                break
+            data += chunk
+        return bytes(data)
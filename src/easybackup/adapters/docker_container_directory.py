@@ -1,67 +1,64 @@
-import os
+import shutil
 
 from easybackup.core.backup_creator import BackupCreator
-from .local import LocalRepositoryAdapter, LocalBackupCreator
+from easybackup.core.compression import Codec
+from easybackup.utils.streams import HashingWriter
+from .docker_client import DockerClient
+from .docker_exec import docker_exec
+from .local import LocalRepositoryAdapter
 
 
 class DockerContainerDirectory(BackupCreator):
 
     type_tag = 'docker_container_directory'
+    docker_bin = 'docker'
+    buffer_size = 1024 * 1024
 
     def setup(
         self,
         container_name,
         container_user,
         directory,
-        backup_directory
+        backup_directory,
+        compression='gzip',
+        compression_level=None,
+        compression_threads=1,
+        docker_socket=False
     ):
         self.container_name = container_name
         self.container_user = container_user
         self.directory = directory
         self.backup_directory = backup_directory
+        self.codec = Codec.build(compression, compression_level, compression_threads)
+        self.docker_socket = docker_socket
 
-    def target_adapter(self):
-        return LocalRepositoryAdapter(directory=self.backup_directory)
-
-    def build_backup(self, backup):
-        backup.file_type = 'tar'
-
-        tmp_container_tar = self.tmp_container_tar(backup)
-        archive_path = self.target_adapter().backup_path(backup)
+    @property
+    def file_type(self):
+        return self.codec.file_type('tar')
 
-        self.tar(tmp_container_tar)
-        self.copy(tmp_container_tar, archive_path)
-        self.delete_tmp(tmp_container_tar)
+    @property
+    def concurrency_key(self):
+        return 'docker'
 
-    def tar(self, tmp_container_tar):
-
-        cmd = 'docker exec -u {user} {container} tar -czf {tar_file} {directory}'.format(
-            user=self.container_user,
-            container=self.container_name,
-            tar_file=tmp_container_tar,
-            directory=self.directory
-        )
-        os.system(cmd)
+    def target_adapter(self):
+        return LocalRepositoryAdapter(directory=self.backup_directory)
 
-    def copy(self, tmp_container_tar, archive_path):
+    def stream_backup(self, backup, archive):
+        """ read an uncompressed tar of directory from the container and compress it on the fly """
 
-        cmd = 'docker cp {container}:/{tar_file} {archive_path}'.format(
-            container=self.container_name,
-            tar_file=tmp_container_tar,
-            archive_path=archive_path
-        )
-        os.system(cmd)
+        with self.tar_stream() as tar:
+            with self.codec.compressor(archive) as compressed:
+                source = HashingWriter(compressed)
+                shutil.copyfileobj(tar, source, self.buffer_size)
 
-    def delete_tmp(self, tmp_container_tar):
+        # checked once the exit status is known, an unchanged source discards the archive
+        self.record_fingerprint('sha256:'+source.hexdigest())
 
-        cmd = 'docker exec -u {user} {container} rm {tar_file}'.format(
-            user=self.container_user,
-            container=self.container_name,
-            tar_file=tmp_container_tar
-        )
-        os.system(cmd)
+    def tar_stream(self):
+        # the archive endpoint would drop the parent directories from member names and ignore the user
+        if self.docker_socket:
+            return DockerClient(self.docker_socket).exec_stream(self.container_name, self.tar_cmd(), self.container_user)
+        return docker_exec(self.container_name, self.container_user, self.tar_cmd(), self.docker_bin)
 
-    def tmp_container_tar(self, backup):
-        # copy = backup.copy()
-        # copy.file_type = 'tar'
-        return backup.formated_name+'.tar'
+    def tar_cmd(self):
+        return ['tar', '-c', self.directory]
@@ -1,12 +1,22 @@
-import os
+import shlex
+import shutil
+import tarfile
+from contextlib import contextmanager
 
 from easybackup.core.backup_creator import BackupCreator
-from .local import LocalRepositoryAdapter, LocalBackupCreator
+from easybackup.core.compression import Codec
+from easybackup.core.exceptions import EasyBackupException
+from easybackup.utils.streams import HashingWriter
+from .docker_client import DockerClient
+from .docker_exec import docker_exec, docker_exec_input
+from .local import LocalRepositoryAdapter
 
 
 class DockerContainerSql(BackupCreator):
 
     type_tag = 'docker_container_sql'
+    docker_bin = 'docker'
+    buffer_size = 1024 * 1024
 
     def setup(
         self,
@@ -14,45 +24,86 @@ class DockerContainerSql(BackupCreator):
         container_user,
         database,
         dump_cmd,
-        backup_directory
+        backup_directory,
+        compression='gzip',
+        compression_level=None,
+        compression_threads=1,
+        docker_socket=False,
+        import_cmd=False
     ):
         self.container_name = container_name
         self.container_user = container_user
         self.database = database
         self.dump_cmd = dump_cmd
         self.backup_directory = backup_directory
+        self.codec = Codec.build(compression, compression_level, compression_threads)
+        self.docker_socket = docker_socket
+        self.import_cmd = import_cmd
+
+    @property
+    def file_type(self):
+        return self.codec.file_type('sql')
+
+    @property
+    def concurrency_key(self):
+        return 'docker'
 
     def target_adapter(self):
         return LocalRepositoryAdapter(directory=self.backup_directory)
 
-    def build_backup(self, backup):
-        dump_file_name = self.dump_file_name(backup)
-        self.dump(dump_file_name)
-        self.tar(dump_file_name, backup)
-        self.remove_dump(dump_file_name)
-
-    def dump_file_name(self, backup):
-        backup.file_type = 'sql'
-        return self.target_adapter().backup_path(backup)
-
-    def dump(self, dump_file_name):
-        os.system(self.backup_cmd(dump_file_name))
-
-    def backup_cmd(self, dump_file_name):
-        return "docker exec -u {user} {container} {dump_cmd} {database} > \"{dump_file_name}\"".format(**{
-            'user': self.container_user,
-            'container': self.container_name,
-            'dump_cmd': self.dump_cmd,
-            'database': self.database,
-            'dump_file_name': dump_file_name
-        })
-
-    def tar(self, archive_path, backup):
-        localBackup = LocalBackupCreator(
-            source=archive_path,
-            backup_directory=self.backup_directory
-        )
-        localBackup.build_backup(backup)
-
-    def remove_dump(self, dump_file):
-        os.remove(dump_file)
+    def stream_backup(self, backup, archive):
+        """ compress the dump while it is read from the container, no dump file is written """
+
+        with self.dump_stream() as dump:
+            with self.codec.compressor(archive) as compressed:
+                source = HashingWriter(compressed)
+                shutil.copyfileobj(dump, source, self.buffer_size)
+
+        # checked once the exit status is known, an unchanged source discards the archive
+        self.record_fingerprint('sha256:'+source.hexdigest())
+
+    def dump_stream(self):
+        if self.docker_socket:
+            return DockerClient(self.docker_socket).exec_stream(self.container_name, self.backup_cmd(), self.container_user)
+        return docker_exec(self.container_name, self.container_user, self.backup_cmd(), self.docker_bin)
+
+    def backup_cmd(self):
+        return shlex.split(self.dump_cmd) + [self.database]
+
+    def restore_backup(self, backup, content):
+        """ pipe the dump into import_cmd while it is downloaded and decompressed """
+
+        with self.dump_content(backup, content) as dump, self.import_stream() as target:
+            shutil.copyfileobj(dump, target, self.buffer_size)
+
+    @contextmanager
+    def dump_content(self, backup, content):
+        """ yield the dump of backup's decompressed content, older backups are tars holding the .sql file """
+
+        archive_type = (backup.file_type or '').split('.', 1)[0]
+        if archive_type == 'sql':
+            yield content
+            return
+
+        if archive_type != 'tar':
+            raise EasyBackupException('sql_backup_type_unsupported', backup=backup.formated_name, file_type=backup.file_type)
+
+        with tarfile.open(fileobj=content, mode='r|') as tar:
+            for member in tar:
+                if member.isfile() and member.name.endswith('.sql'):
+                    yield tar.extractfile(member)
+                    return
+
+        raise EasyBackupException('sql_backup_dump_not_found', backup=backup.formated_name)
+
+    @property
+    def restorable(self):
+        return bool(self.import_cmd)
+
+    def import_stream(self):
+        if self.docker_socket:
+            return DockerClient(self.docker_socket).exec_input(self.container_name, self.restore_cmd(), self.container_user)
+        return docker_exec_input(self.container_name, self.container_user, self.restore_cmd(), self.docker_bin)
+
+    def restore_cmd(self):
+        return shlex.split(self.import_cmd) + [self.database]
@@ -0,0 +1,94 @@
+import subprocess
+import tempfile
+from contextlib import contextmanager
+from typing import List
+
+from easybackup.core.exceptions import DockerExecError
+
+
+@contextmanager
+def docker_exec(container: str, user: str, command: List[str], docker_bin: str = 'docker'):
+    """
+    run command in container and yield its stdout as a binary pipe.
+
+    The command is killed if the caller fails while reading, a non zero
+    exit status raises DockerExecError once stdout has been consumed.
+    """
+
+    with tempfile.TemporaryFile() as stderr:
+
+        process = subprocess.Popen(
+            docker_exec_args(container, user, command, docker_bin),
+            stdout=subprocess.PIPE,
+            stderr=stderr
+        )
+        try:
+            yield process.stdout
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            process.stdout.close()
+            process.wait()
+
+        check_returncode(process, container, command, stderr)
+
+
+@contextmanager
+def docker_exec_input(container: str, user: str, command: List[str], docker_bin: str = 'docker'):
+    """
+    run command in container and yield its stdin as a binary pipe.
+
+    The command is killed if the caller fails while writing, a non zero
+    exit status raises DockerExecError once stdin has been closed.
+    """
+
+    with tempfile.TemporaryFile() as stderr:
+
+        process = subprocess.Popen(
+            docker_exec_args(container, user, command, docker_bin, interactive=True),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=stderr
+        )
+        try:
+            yield process.stdin
+        except BrokenPipeError:
+            # the command exited before reading its whole input, its status tells why
+            process.wait()
+            check_returncode(process, container, command, stderr)
+            raise
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+            process.wait()
+
+        check_returncode(process, container, command, stderr)
+
+
+def docker_exec_args(container: str, user: str, command: List[str], docker_bin: str = 'docker', interactive=False):
+
+    args = [docker_bin, 'exec']
+    if interactive:
+        args.append('-i')
+    if user:
+        args += ['-u', user]
+    return args + [container] + list(command)
+
+
+def check_returncode(process, container: str, command: List[str], stderr):
+
+    if process.returncode != 0:
+        stderr.seek(0)
+        raise DockerExecError(
+            'docker_exec_failed',
+            container=container,
+            command=' '.join(command),
+            returncode=process.returncode,
+            stderr=stderr.read().decode(errors='replace').strip()
+        )
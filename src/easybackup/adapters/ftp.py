@@ -1,56 +1,315 @@
+import io
+import json
 import os
+import shutil
+import threading
 from contextlib import contextmanager
-from ftplib import FTP
+from ftplib import FTP, all_errors, error_perm
 from pathlib import Path
 from typing import List
 import tarfile
 
 
 from easybackup.core.backup import Backup
+from easybackup.core.catalog import Catalog
 from easybackup.core.repository_link import RepositoryLink
 from easybackup.core.lexique import ARCHIVE_TYPE
 from easybackup.core.repository import RepositoryAdapter
+from easybackup.core.volume import Volume
 
 from .local import LocalRepositoryAdapter
 
 
+class FtpSessionPool():
+
+    """
+    Authenticated FTP sessions kept alive across a run.
+
+    At most `size` sessions are used at once. Idle sessions are
+    health-checked with NOOP before being handed out again, and
+    replaced by a new connection when the check fails.
+    """
+
+    def __init__(self, connect, size: int = 1):
+        self._connect = connect
+        self._size = max(1, size)
+        self._in_use = 0
+        self._idle = []
+        self._condition = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def resize(self, size: int):
+        with self._condition:
+            self._size = max(1, size)
+            self._condition.notify_all()
+
+    def acquire(self) -> FTP:
+
+        with self._condition:
+            while self._in_use >= self._size:
+                self._condition.wait()
+            self._in_use += 1
+            ftp = self._idle.pop() if self._idle else False
+
+        try:
+            return self.check(ftp) or self._connect()
+        except BaseException:
+            self.release(False)
+            raise
+
+    def release(self, ftp: FTP):
+        """ give back a session, False when the session is lost """
+
+        with self._condition:
+            self._in_use -= 1
+            if ftp and len(self._idle) < self._size:
+                self._idle.append(ftp)
+                ftp = False
+            self._condition.notify()
+
+        if ftp:
+            self.disconnect(ftp)
+
+    def check(self, ftp: FTP) -> FTP:
+        """ return ftp if the session is still alive, otherwise False """
+
+        if not ftp:
+            return False
+
+        try:
+            ftp.voidcmd('NOOP')
+            return ftp
+        except all_errors:
+            self.disconnect(ftp, quit=False)
+            return False
+
+    def close(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for ftp in idle:
+            self.disconnect(ftp)
+
+    @classmethod
+    def disconnect(cls, ftp: FTP, quit=True):
+        try:
+            if quit:
+                ftp.quit()
+        except all_errors:
+            pass
+        finally:
+            ftp.close()
+
+
 class FtpRepositoryAdapter(RepositoryAdapter):
 
     type_tag = 'ftp'
 
-    def setup(self, host, user, password, directory):
+    def setup(self, host, user, password, directory, catalog=False, pattern_listing=False, sessions=1):
         self._host = host
         self._user = user
         self._password = password
         self._directory = directory
+        self._pool = FtpSessionPool(self.connect, size=sessions)
+        # unknown until the first listing, servers without MLSD answer 500
+        self._mlsd = None
+
+        # not every server supports wildcards in NLST, so it is opt-in
+        self.volume_pushdown = pattern_listing
+
+        if catalog:
+            self.catalog = Catalog(self)
+
+    @property
+    def identity(self):
+        return (self.type_tag, self._host, self._user, self._directory)
+
+    def connect(self) -> FTP:
+        ftp = FTP(
+            host=self._host,
+            user=self._user,
+            passwd=self._password
+        )
+        ftp.cwd(self._directory)
+        return ftp
 
     @contextmanager
     def ftp(self):
+        """ borrow a session from the adapter's pool """
+
+        ftp = self._pool.acquire()
         try:
-            ftp = FTP(
-                host=self._host,
-                user=self._user,
-                passwd=self._password
-            )
-            ftp.cwd(self._directory)
             yield ftp
-        finally:
-            if ftp:
-                ftp.close()
+        except BaseException:
+            # the session state is unknown after a failure, do not reuse it
+            self._pool.release(False)
+            FtpSessionPool.disconnect(ftp, quit=False)
+            raise
+        self._pool.release(ftp)
+
+    def set_concurrency(self, count: int):
+        if count > self._pool.size:
+            self._pool.resize(count)
+
+    def close(self):
+        self._pool.close()
+
+    def fetch_backups(self, volume: Volume = False):
+        backups = [
+            self.filename_to_backup(filename, size=size)
+            for filename, size in self.backup_entries(volume=volume).items()
+        ]
 
-    def fetch_backups(self):
-        return list(map(self.filename_to_backup, self.list_directory_filenames()))
+        # listing order depends on the server, or on the catalog's insertion order
+        return sorted(backups, key=lambda backup: backup.epoch)
 
     def cleanup_backups(self, backups):
-        filenames = map(self.backup_to_filename, backups)
+        filenames = list(map(self.backup_to_filename, backups))
         paths = map(self.path, filenames)
 
         with self.ftp() as ftp:
             list(map(ftp.delete, paths))
+            for backup in backups:
+                try:
+                    ftp.delete(self.path(self.metadata_filename(backup)))
+                except error_perm:
+                    pass
 
-    def list_directory_filenames(self):
+        if self.catalog:
+            self.catalog.remove(filenames)
+
+    @contextmanager
+    def open_backup_writer(self, backup):
+        """ write straight into the STOR data connection, without local staging """
+
+        path = self.backup_path(backup)
+        try:
+            with self.ftp() as ftp:
+                ftp.voidcmd('TYPE I')
+                with ftp.transfercmd('STOR '+path) as conn, conn.makefile('wb') as archive:
+                    yield archive
+                ftp.voidresp()
+        except BaseException:
+            self.remove_quietly(path)
+            raise
+
+    @contextmanager
+    def open_backup_reader(self, backup):
+        """ read straight from the RETR data connection """
+
+        with self.ftp() as ftp:
+            ftp.voidcmd('TYPE I')
+            with ftp.transfercmd('RETR '+self.backup_path(backup)) as conn, conn.makefile('rb') as archive:
+                yield archive
+            ftp.voidresp()
+
+    def backup_size(self, backup):
+        with self.ftp() as ftp:
+            ftp.voidcmd('TYPE I')
+            return ftp.size(self.backup_path(backup))
+
+    def load_sizes(self, backups):
+        """ read sizes with SIZE in a single session, servers without SIZE leave them unknown """
+
+        if not backups:
+            return
+
+        with self.ftp() as ftp:
+            ftp.voidcmd('TYPE I')
+            for backup in backups:
+                try:
+                    backup.size = ftp.size(self.backup_path(backup))
+                except error_perm:
+                    pass
+
+    def remove_quietly(self, path):
+        try:
+            with self.ftp() as ftp:
+                ftp.delete(path)
+        except all_errors:
+            pass
+
+    def list_backup_filenames(self, volume: Volume = False):
+        return list(self.list_backup_entries(volume=volume))
+
+    def list_backup_entries(self, volume: Volume = False):
+        """
+        return archive sizes by filename from the MLSD facts, in a single listing,
+        servers without MLSD are listed with NLST, without sizes. With
+        `pattern_listing`, a volume is listed with a wildcard NLST whether
+        the server supports MLSD or not, sizes are then left unknown
+        """
+
+        with self.ftp() as ftp:
+            if volume and self.volume_pushdown:
+                return dict.fromkeys(self.nlst_backup_filenames(ftp, pattern=volume.filename_prefix()+'*'))
+
+            if self._mlsd is not False:
+                try:
+                    entries = list(ftp.mlsd(facts=['type', 'size']))
+                    self._mlsd = True
+                except error_perm:
+                    self._mlsd = False
+
+            if not self._mlsd:
+                return dict.fromkeys(self.nlst_backup_filenames(ftp))
+
+        return {
+            name: int(facts['size']) if 'size' in facts else None
+            for name, facts in entries
+            if facts.get('type', 'file') == 'file' and name.startswith(self._prefix) and self.filename_match_backup(name)
+        }
+
+    def read_metadata(self, backup):
+        content = io.BytesIO()
         with self.ftp() as ftp:
+            try:
+                ftp.retrbinary('RETR '+self.path(self.metadata_filename(backup)), content.write)
+            except error_perm:
+                return {}
+        try:
+            return json.loads(content.getvalue().decode())
+        except ValueError:
+            return {}
+
+    def write_metadata(self, backup, metadata):
+        with self.ftp() as ftp:
+            ftp.storbinary('STOR '+self.path(self.metadata_filename(backup)), io.BytesIO(json.dumps(metadata).encode()))
+
+    def read_catalog(self):
+        content = io.BytesIO()
+        with self.ftp() as ftp:
+            try:
+                ftp.retrbinary('RETR '+self.path(Catalog.filename), content.write)
+            except error_perm:
+                return False
+        return content.getvalue().decode()
+
+    def append_catalog(self, content):
+        with self.ftp() as ftp:
+            ftp.storbinary('APPE '+self.path(Catalog.filename), io.BytesIO(content.encode()))
+
+    def write_catalog(self, content):
+        tmp_path = self.path(Catalog.filename+'.tmp')
+        with self.ftp() as ftp:
+            ftp.storbinary('STOR '+tmp_path, io.BytesIO(content.encode()))
+            try:
+                ftp.delete(self.path(Catalog.filename))
+            except error_perm:
+                pass
+            ftp.rename(tmp_path, self.path(Catalog.filename))
+
+    def nlst_backup_filenames(self, ftp, pattern=False):
+        if not pattern:
             files = ftp.nlst()
+        else:
+            try:
+                files = [os.path.basename(f) for f in ftp.nlst(pattern)]
+            except error_perm:
+                # most servers answer 550 when nothing match the pattern
+                files = []
         return filter(self.filename_match_backup, files)
 
     def backup_path(self, backup):
@@ -70,14 +329,18 @@ class LocalToFtp(RepositoryLink):
     type_tag_source = 'local'
     type_tag_target = 'ftp'
 
+    buffer_size = 1024 * 1024
+
     def copy_backup(self, backup):
 
-        source_archive = self.source_adapter.backup_path(backup)
-        source_archive = open(source_archive, 'rb')
+        source_path = self.source_adapter.backup_path(backup)
+
+        # the target writer removes a partial upload, the next run copies it again
+        with open(source_path, 'rb') as source:
+            with self.target_adapter.open_backup_writer(backup) as target:
+                shutil.copyfileobj(source, target, self.buffer_size)
 
-        with self.target_adapter.ftp() as ftp:
-            target_archive = self.target_adapter.backup_path(backup)
-            ftp.storbinary('STOR '+target_archive, source_archive)
+        return os.path.getsize(source_path)
 
 
 class FtpToLocal(RepositoryLink):
@@ -85,11 +348,12 @@ class FtpToLocal(RepositoryLink):
     type_tag_source = 'ftp'
     type_tag_target = 'local'
 
-    def copy_backup(self, backup):
+    buffer_size = 1024 * 1024
 
-        source_archive = self.source_adapter.backup_path(backup)
-        target_archive = self.target_adapter.backup_path(backup)
-        target_archive = open(target_archive, 'wb')
+    def copy_backup(self, backup):
 
-        with self.source_adapter.ftp() as ftp:
-            ftp.retrbinary('RETR '+source_archive, target_archive.write)
+        # the target writer removes a partial download, the next run copies it again
+        with self.source_adapter.open_backup_reader(backup) as source:
+            with self.target_adapter.open_backup_writer(backup) as target:
+                shutil.copyfileobj(source, target, self.buffer_size)
+                return target.tell()
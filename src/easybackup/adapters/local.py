@@ -1,45 +1,145 @@
+import hashlib
+import io
+import json
 import os
 import random
 import string
 import tarfile
+import time
 import shutil
+from contextlib import contextmanager
 
 from typing import List
 from easybackup.core.backup import Backup
 from easybackup.core.backup_creator import BackupCreator
+from easybackup.core.catalog import Catalog
+from easybackup.core.chain import DELETIONS_MEMBER, DIFFERENTIAL, FULL, INCREMENTAL, BackupChain
+from easybackup.core.compression import Codec
+from easybackup.core.exceptions import EasyBackupException
+from easybackup.core.manifest import FileManifest
 from easybackup.core.repository_link import RepositoryLink
 from easybackup.core.repository import RepositoryAdapter
+from easybackup.core.volume import Volume
 
 
 class LocalRepositoryAdapter(RepositoryAdapter):
 
     type_tag = 'local'
+    volume_pushdown = True
 
-    def setup(self, directory):
+    def setup(self, directory, catalog=False):
         self.directory = directory
 
-    def fetch_backups(self) -> List[Backup]:
-        backup_filenames = filter(
-            self.filename_match_backup,
-            self.list_directory_filenames()
-        )
-        backups = map(
-            self.filename_to_backup,
-            backup_filenames
-        )
+        if catalog or os.path.isfile(self.path(Catalog.filename)):
+            self.catalog = Catalog(self)
 
-        return sorted(backups, key=lambda b: b.datetime)
+    @property
+    def identity(self):
+        return (self.type_tag, os.path.abspath(self.directory))
+
+    def fetch_backups(self, volume: Volume = False) -> List[Backup]:
+        backups = [
+            self.filename_to_backup(filename, size=size)
+            for filename, size in self.backup_entries(volume=volume).items()
+        ]
+
+        return sorted(backups, key=lambda b: b.epoch)
 
     def cleanup_backups(self, backups):
-        filenames = map(self.backup_to_filename, backups)
+        filenames = list(map(self.backup_to_filename, backups))
         paths = map(self.path, filenames)
         list(map(lambda backup: os.remove(backup), paths))
 
-    def list_directory_filenames(self):
-        return list(filter(
-            lambda f: os.path.isfile(self.path(f)),
-            os.listdir(self.directory)
-        ))
+        for backup in backups:
+            try:
+                os.remove(self.path(self.metadata_filename(backup)))
+            except FileNotFoundError:
+                pass
+
+        if self.catalog:
+            self.catalog.remove(filenames)
+
+    def list_backup_filenames(self, volume: Volume = False):
+        return list(self.list_backup_entries(volume=volume))
+
+    def list_backup_entries(self, volume: Volume = False):
+        """ return archive sizes by filename, from a single scandir """
+
+        prefix = volume.filename_prefix() if volume else self._prefix
+        entries = {}
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not (entry.name.startswith(prefix) and self.filename_match_backup(entry.name) and entry.is_file()):
+                    continue
+                try:
+                    entries[entry.name] = entry.stat().st_size
+                except FileNotFoundError:
+                    # removed since the directory was read
+                    pass
+        return entries
+
+    @contextmanager
+    def open_backup_writer(self, backup):
+        path = self.backup_path(backup)
+        archive = open(path, 'xb')
+        try:
+            with archive:
+                yield archive
+        except BaseException:
+            os.remove(path)
+            raise
+
+    @contextmanager
+    def open_backup_reader(self, backup):
+        with open(self.backup_path(backup), 'rb') as archive:
+            yield archive
+
+    def backup_size(self, backup):
+        return os.stat(self.backup_path(backup)).st_size
+
+    def read_metadata(self, backup):
+        try:
+            with open(self.path(self.metadata_filename(backup)), 'r') as metadata:
+                return json.load(metadata)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def write_metadata(self, backup, metadata):
+        self.write_atomically(self.metadata_filename(backup), json.dumps(metadata))
+
+    def read_catalog(self):
+        try:
+            with open(self.path(Catalog.filename), 'r') as catalog:
+                return catalog.read()
+        except FileNotFoundError:
+            return False
+
+    def append_catalog(self, content):
+        with open(self.path(Catalog.filename), 'a') as catalog:
+            catalog.write(content)
+            catalog.flush()
+            os.fsync(catalog.fileno())
+
+    def write_catalog(self, content):
+        self.write_atomically(Catalog.filename, content)
+
+    def read_manifest(self, filename):
+        try:
+            with open(self.path(filename), 'r') as manifest:
+                return manifest.read()
+        except FileNotFoundError:
+            return False
+
+    def write_manifest(self, filename, content):
+        self.write_atomically(filename, content)
+
+    def write_atomically(self, filename, content):
+        tmp_path = self.path(filename+'.tmp')
+        with open(tmp_path, 'w') as tmp:
+            tmp.write(content)
+            tmp.flush()
+            os.fsync(tmp.fileno())
+        os.replace(tmp_path, self.path(filename))
 
     def backup_path(self, backup):
         archive_name = self.backup_to_filename(backup)
@@ -56,50 +156,163 @@ class LocalRepositoryAdapter(RepositoryAdapter):
 class LocalBackupCreator(BackupCreator):
 
     type_tag = 'local'
-    file_type = 'tar'
+    modes = {'full': FULL, 'incremental': INCREMENTAL, 'differential': DIFFERENTIAL}
 
-    def setup(self, source, backup_directory):
+    def setup(
+        self,
+        source,
+        backup_directory,
+        compression='gzip',
+        compression_level=None,
+        compression_threads=1,
+        mode='full',
+        full_interval=False
+    ):
         self.source = source
         self.source_is_file = os.path.isfile(self.source)
         self.source_is_directory = os.path.isdir(self.source)
         self.backup_directory = backup_directory
+        self.codec = Codec.build(compression, compression_level, compression_threads)
+
+        if mode not in self.modes:
+            raise EasyBackupException('backup_mode_not_found', mode=mode)
+        self.mode = self.modes[mode]
+        self.full_interval = full_interval
+        self._plan = False
+
+    @property
+    def file_type(self):
+        return self.codec.file_type('tar')
 
     def target_adapter(self):
         return LocalRepositoryAdapter(directory=self.backup_directory)
 
-    def build_backup(self, backup):
-        backup.file_type = self.file_type
-        archive_path = self.target_adapter().backup_path(backup)
-        self._backup_source(archive_path)
-        return backup
+    def fingerprint(self):
+        """ hash of the names, sizes and modification times of the source's files """
+
+        if self.source_is_file:
+            files = {os.path.basename(self.source): FileManifest.stat(self.source)}
+        else:
+            files = FileManifest.scan(self.source)
+
+        fingerprint = hashlib.sha256()
+        for name in sorted(files):
+            size, mtime, _ = files[name]
+            fingerprint.update(('%s\0%d\0%d\n' % (name, size, mtime)).encode('utf-8', 'surrogateescape'))
+        return 'tree:'+fingerprint.hexdigest()
+
+    @property
+    def incremental(self):
+        return self.mode != FULL and not self.source_is_file
+
+    def prepare_backup(self, backup):
+
+        self._plan = self.plan_backup(backup) if self.incremental else False
+        level = self._plan['level'] if self._plan else FULL
+        backup.file_type = BackupChain.file_type(level, self.file_type)
+        if level != FULL:
+            # stored with the archive's metadata, restores follow it instead of the listing order
+            self._metadata['base'] = backup.base = self._plan['base_backup']
+
+    def plan_backup(self, backup):
+        """ choose backup's level and the file states it is compared to """
+
+        manifest = FileManifest(self.target_adapter(), backup.project, backup.volume)
+        plan = {'manifest': manifest, 'state': manifest.load(), 'level': FULL, 'base': {}}
+        if not plan['state']:
+            return plan
+
+        stored = {
+            stored.formated_name: stored
+            for stored in self.target_adapter().fetch_backups(volume=Volume(backup.volume, backup.project))
+        }
+        full = stored.get(plan['state']['full']['backup'])
+        base = plan['state']['full' if self.mode == DIFFERENTIAL else 'last']
+
+        if not full or base['backup'] not in stored:
+            return plan
+
+        if self.full_interval and backup.epoch - full.epoch >= self.full_interval:
+            return plan
+
+        plan['level'] = self.mode
+        plan['base'] = base['files']
+        plan['base_backup'] = base['backup']
+        return plan
+
+    def complete_backup(self, backup):
 
-    def _backup_source(self, archive):
+        if not self._plan:
+            return
+
+        record = FileManifest.record(backup, self._plan['files'])
+        if self._plan['level'] == FULL:
+            state = {'full': record, 'last': record}
+        else:
+            state = dict(self._plan['state'], last=record)
+
+        self._plan['manifest'].save(state)
+        self._plan = False
+
+    def stream_backup(self, backup, archive):
 
         if self.source_is_file:
             self._backup_source_file(archive)
 
-        if self.source_is_directory:
+        elif self.source_is_directory and self._plan:
+            self._backup_source_changes(archive)
+
+        elif self.source_is_directory:
             self._backup_source_directory(archive)
 
     def _backup_source_file(self, archive):
 
-        with tarfile.open(archive, 'x:gz') as tar:
+        with self.codec.compressor(archive) as compressed, tarfile.open(fileobj=compressed, mode='w|') as tar:
             with open(self.source, 'rb') as f:
                 info = tar.gettarinfo(self.source, arcname=os.path.basename(self.source))
                 tar.addfile(info, f)
 
     def _backup_source_directory(self, archive):
 
-        with tarfile.open(archive, "x:gz") as tar:
+        with self.codec.compressor(archive) as compressed, tarfile.open(fileobj=compressed, mode='w|') as tar:
             tar.add(self.source, arcname=os.path.basename(self.source))
 
+    def _backup_source_changes(self, archive):
+        """ archive entries changed since the plan's base, and the list of deleted ones """
+
+        files = FileManifest.scan(self.source)
+        changed, deleted = FileManifest.diff(self._plan['base'], files)
+        parent = os.path.dirname(os.path.normpath(self.source))
+
+        with self.codec.compressor(archive) as compressed, tarfile.open(fileobj=compressed, mode='w|') as tar:
+
+            if self._plan['level'] != FULL:
+                deletions = '\n'.join(deleted).encode('utf-8')
+                info = tarfile.TarInfo(DELETIONS_MEMBER)
+                info.size = len(deletions)
+                info.mtime = int(time.time())
+                tar.addfile(info, io.BytesIO(deletions))
+
+            for name in changed:
+                try:
+                    tar.add(os.path.join(parent, name), arcname=name, recursive=False)
+                except FileNotFoundError:
+                    # vanished since the scan, the next backup records it as deleted
+                    del files[name]
+
+        self._plan['files'] = files
+
 
 class LocalToLocal(RepositoryLink):
 
     type_tag_source = 'local'
     type_tag_target = 'local'
 
+    buffer_size = 1024 * 1024
+
     def copy_backup(self, backup):
-        source_path = self.source_adapter.backup_path(backup)
-        target_path = self.target_adapter.backup_path(backup)
-        shutil.copyfile(source_path, target_path)
+        # the target writer removes a partial copy, the next run copies it again
+        with open(self.source_adapter.backup_path(backup), 'rb') as source:
+            with self.target_adapter.open_backup_writer(backup) as target:
+                shutil.copyfileobj(source, target, self.buffer_size)
+                return target.tell()
@@ -31,6 +31,70 @@ def parse_args():
         help="backup-compose filename",
         type=str,
     )
+    parser.add_argument(
+        "--reindex",
+        help="rebuild repositories catalog from their real listing",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--watch",
+        help="keep running, sleeping until the next backup is due",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--verify",
+        help="check archives of every repository, 'size' only compares stored sizes",
+        nargs="?",
+        const="full",
+        choices=["full", "size"],
+        default=False,
+    )
+    parser.add_argument(
+        "--verify-jobs",
+        help="number of archives verified concurrently",
+        type=int,
+        default=4,
+    )
+    parser.add_argument(
+        "--restore",
+        help="restore a volume, given as project/volume",
+        metavar="PROJECT/VOLUME",
+        default=False,
+    )
+    parser.add_argument(
+        "--datetime",
+        help="restore the last backup taken at or before this datetime (YYYYmmdd_HHMMSS)",
+        default=False,
+    )
+    parser.add_argument(
+        "--restore-from",
+        help="name of the repository to restore from, the volume's creator repository by default",
+        default=False,
+    )
+    parser.add_argument(
+        "--restore-to",
+        help="directory to extract into, without it the backup is restored into the volume's source",
+        default=False,
+    )
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        help="number of volumes backed up concurrently",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "--repository-jobs",
+        help="maximum number of volumes writing to the same repository concurrently",
+        type=int,
+        default=False,
+    )
+    parser.add_argument(
+        "--creator-jobs",
+        help="maximum number of volumes using the same kind of creator concurrently",
+        type=int,
+        default=False,
+    )
     args = parser.parse_args()
     return args
 
@@ -47,8 +111,35 @@ def main(args):
     composer_content = composer_file.read()
 
     conf = YamlComposer(composer_content)
-    for composer in conf.composers:
-        composer.run()
+    if args.reindex:
+        conf.reindex()
+    elif args.restore:
+        project, _, volume = args.restore.partition('/')
+        conf.restore(
+            project,
+            volume,
+            datetime=args.datetime,
+            destination=args.restore_to,
+            repository=args.restore_from
+        )
+    elif args.verify:
+        failures = conf.verify(mode=args.verify, jobs=args.verify_jobs)
+        if failures:
+            sys.exit(1)
+    elif args.watch:
+        conf.watch(
+            jobs=args.jobs,
+            repository_jobs=args.repository_jobs,
+            creator_jobs=args.creator_jobs
+        )
+    else:
+        failures = conf.run(
+            jobs=args.jobs,
+            repository_jobs=args.repository_jobs,
+            creator_jobs=args.creator_jobs
+        )
+        if failures:
+            sys.exit(1)
 
     logging.info('bye')
 
@@ -1,6 +1,17 @@
+from .clock import Clock
+
 
 class Backup():
 
+    """
+    Immutable description of a backup, compared and hashed by name.
+
+    The datetime is parsed once into an integer `epoch` so that
+    policies can compare and sort backups without re-parsing dates.
+    """
+
+    __slots__ = ('_datetime', '_project', '_volume', '_file_type', '_size', '_base', '_name', '_epoch')
+
     prefix = 'easybackup'
 
     def __init__(
@@ -8,20 +19,39 @@ class Backup():
         datetime,
         project,
         volume,
-        file_type=None
+        file_type=None,
+        size=None,
+        base=None
     ):
 
         self._datetime = datetime
         self._project = project
         self._volume = volume
         self._file_type = file_type
+        self._size = size
+        self._base = base
+        self._name = self.format_name(volume=volume, project=project, datetime=datetime)
+        self._epoch = Clock.timestamp(datetime)
+
+    def __eq__(self, other):
+        if not isinstance(other, Backup):
+            return NotImplemented
+        return self._name == other._name
+
+    def __hash__(self):
+        return hash(self._name)
+
+    def __repr__(self):
+        return "Backup(%s)" % self._name
 
     def copy(self):
         return Backup(
             datetime=self._datetime,
             project=self._project,
             volume=self._volume,
-            file_type=self._file_type
+            file_type=self._file_type,
+            size=self._size,
+            base=self._base
         )
 
     @property
@@ -29,6 +59,11 @@ class Backup():
         """ datetime of backup """
         return self._datetime
 
+    @property
+    def epoch(self) -> int:
+        """ datetime of backup as seconds since epoch """
+        return self._epoch
+
     @property
     def project(self) -> str:
         """ backup's project """
@@ -41,20 +76,34 @@ class Backup():
 
     @property
     def file_type(self):
-        """ backup file type """
+        """ backup file type, it is not part of the backup identity """
         return self._file_type
 
     @file_type.setter
     def file_type(self, value):
         self._file_type = value
 
+    @property
+    def size(self):
+        """ archive size in bytes when the listing provides it, else None, it is not part of the backup identity """
+        return self._size
+
+    @size.setter
+    def size(self, value):
+        self._size = value
+
+    @property
+    def base(self):
+        """ name of the backup an incremental or differential backup was taken against, None when not recorded """
+        return self._base
+
+    @base.setter
+    def base(self, value):
+        self._base = value
+
     @property
     def formated_name(self):
-        return self.format_name(
-            volume=self.volume,
-            project=self.project,
-            datetime=self.datetime
-        )
+        return self._name
 
     @classmethod
     def format_name(
@@ -70,4 +119,4 @@ class Backup():
             volume=volume,
             project=project,
             datetime=datetime,
-        )
\ No newline at end of file
+        )
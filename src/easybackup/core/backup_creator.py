@@ -1,16 +1,24 @@
 
+from contextlib import ExitStack
+
 from .backup import Backup
 from .repository import Repository
+from ..utils.streams import HashingWriter, TeeWriter
 from ..utils.taggable import Taggable
 from .hook import Hook
+from .snapshot import ListingSnapshot
+from . import exceptions as exp
 
 
 class BackupCreator(Taggable):
 
     type_tag = False
+    file_type = 'tar'
 
     def __init__(self, **conf):
         self.setup(**conf)
+        self._metadata = {}
+        self._previous_fingerprint = False
 
     def __str__(self):
         return "[%s]" % self.type_tag
@@ -19,19 +27,121 @@ class BackupCreator(Taggable):
         """ setup creator with custom configuration values """
         raise NotImplementedError
 
+    @property
+    def concurrency_key(self):
+        """ creators sharing a key share the same concurrency limit """
+        return self.type_tag
+
     def target_adapter(self) -> Repository:
         """ Return the repository where backups are stored """
         raise NotImplementedError
 
-    def do_build_backup(self, backup: Backup) -> Backup:
+    def do_build_backup(self, backup: Backup, fingerprint: str = False, previous_fingerprint: str = False) -> Backup:
         Hook.plays('before_build_backup', creator=self, backup=backup, repository=self.target_repository)
+        self.start_backup(fingerprint, previous_fingerprint)
         self.build_backup(backup)
+        adapter = self.target_adapter()
+        adapter.register_backups([backup])
+        self.store_metadata(adapter, backup)
+        ListingSnapshot.add(adapter, [backup])
         Hook.plays('after_build_backup', creator=self, backup=backup, repository=self.target_repository)
 
+    def do_stream_backup(
+        self,
+        backup: Backup,
+        repository: Repository,
+        tee: bool = False,
+        fingerprint: str = False,
+        previous_fingerprint: str = False
+    ) -> Backup:
+        """ stream backup straight into repository, with an optional copy on the creator's repository """
+
+        Hook.plays('before_build_backup', creator=self, backup=backup, repository=repository)
+        self.start_backup(fingerprint, previous_fingerprint)
+
+        self.prepare_backup(backup)
+        adapters = [repository.adapter]
+        if tee:
+            adapters.append(self.target_adapter())
+
+        with ExitStack() as stack:
+            archives = [stack.enter_context(adapter.open_backup_writer(backup)) for adapter in adapters]
+            archive = HashingWriter(archives[0] if len(archives) == 1 else TeeWriter(*archives))
+            self.stream_backup(backup, archive)
+            self.record_archive(backup, archive)
+        self.complete_backup(backup)
+
+        for adapter in adapters:
+            adapter.register_backups([backup])
+            self.store_metadata(adapter, backup)
+            ListingSnapshot.add(adapter, [backup])
+
+        Hook.plays('after_build_backup', creator=self, backup=backup, repository=repository)
+
     def build_backup(self, backup: Backup) -> Backup:
-        """ build backup """
+        """ build backup on the creator's repository """
+
+        self.prepare_backup(backup)
+        with self.target_adapter().open_backup_writer(backup) as archive:
+            archive = HashingWriter(archive)
+            self.stream_backup(backup, archive)
+            self.record_archive(backup, archive)
+        self.complete_backup(backup)
+        return backup
+
+    def prepare_backup(self, backup: Backup):
+        """ set up backup before its archive is opened """
+        backup.file_type = self.file_type
+
+    def complete_backup(self, backup: Backup):
+        """ called once backup's archive has been written """
+        pass
+
+    def fingerprint(self) -> str:
+        """ cheap fingerprint of the source computed before building, False when unknown """
+        return False
+
+    def start_backup(self, fingerprint: str = False, previous_fingerprint: str = False):
+        self._metadata = {'fingerprint': fingerprint} if fingerprint else {}
+        self._previous_fingerprint = previous_fingerprint
+
+    def record_fingerprint(self, fingerprint: str):
+        """
+        record the fingerprint of the data read while streaming,
+        raise BackupUnchanged when it matches the previous backup
+        """
+
+        self._metadata['fingerprint'] = fingerprint
+        if self._previous_fingerprint and fingerprint == self._previous_fingerprint:
+            raise exp.BackupUnchanged('source_unchanged', fingerprint=fingerprint)
+
+    def record_archive(self, backup: Backup, archive: HashingWriter):
+        """ record checksum and size of the archive, computed while it was written """
+        self._metadata['sha256'] = archive.hexdigest()
+        self._metadata['size'] = backup.size = archive.size
+
+    def store_metadata(self, adapter, backup: Backup):
+        if self._metadata:
+            adapter.write_metadata(backup, dict(self._metadata))
+
+    def stream_backup(self, backup: Backup, archive):
+        """ write backup's archive into the writable binary file object archive """
         raise NotImplementedError
 
+    @property
+    def streamable(self) -> bool:
+        """ True if the creator is able to stream archives """
+        return type(self).stream_backup is not BackupCreator.stream_backup
+
+    def restore_backup(self, backup: Backup, content):
+        """ load the decompressed content of backup's archive, a readable binary stream, back into the source """
+        raise NotImplementedError
+
+    @property
+    def restorable(self) -> bool:
+        """ True if the creator is able to restore backups into its source """
+        return type(self).restore_backup is not BackupCreator.restore_backup
+
     @property
     def target_repository(self) -> Repository:
         """ Repository where backups are store. """
@@ -8,7 +8,9 @@ from ..policy.backup import BackupPolicy
 from ..policy.cleanup import CleanupPolicy
 from .clock import Clock
 from .repository import Repository
+from .chain import BackupChain
 from .hook import Hook
+from . import exceptions as exp
 
 
 class BackupSupervisor():
@@ -21,14 +23,22 @@ class BackupSupervisor():
         repository: Repository = False,
         synchronizers: List[Synchroniser] = [],
         cleanup_policy: CleanupPolicy = False,
-        backup_policy: BackupPolicy = False
+        backup_policy: BackupPolicy = False,
+        stream_repository: Repository = False,
+        stream_tee: bool = False,
+        skip_unchanged: bool = False
     ):
         self._project = project
         self._volume = volume
         self._creator = creator
+        self._stream_repository = stream_repository
+        self._stream_tee = stream_tee
+        self._skip_unchanged = skip_unchanged
 
         if repository:
             self._repository = repository
+        elif stream_repository:
+            self._repository = stream_repository
         else:
             self._repository = creator.target_repository
 
@@ -52,10 +62,28 @@ class BackupSupervisor():
     def repository(self) -> Repository:
         return self._repository
 
+    @property
+    def stream_repository(self) -> Repository:
+        """ repository receiving backups streamed by the creator, without local staging """
+        return self._stream_repository
+
+    @property
+    def skip_unchanged(self) -> bool:
+        """ do not build a backup when the source fingerprint matches the last backup's one """
+        return self._skip_unchanged
+
     @property
     def synchronizers(self) -> List[BackupCreator]:
         return self._synchronizers
 
+    @property
+    def repositories(self) -> List[Repository]:
+        """ repositories written by the supervisor """
+        return [self.repository] + [
+            synchronizer.link.target_repository
+            for synchronizer in self.synchronizers
+        ]
+
     @property
     def cleanup_policy(self) -> CleanupPolicy:
         return self._cleanup_policy
@@ -97,6 +125,15 @@ class BackupSupervisor():
         if should_backup:
             self.build_backup()
 
+    def next_due(self) -> int:
+        """ epoch of the volume's next backup, from the repository listing, False when unknown """
+
+        if not self._backup_policy:
+            return False
+
+        volume = Volume(name=self.volume, project=self.project)
+        return self._backup_policy.next_due(self.repository.fetch(volume=volume))
+
     def run_cleanup(self):
         self.repository.cleanup(policy=self.cleanup_policy, volume=Volume(self.volume, self.project))
 
@@ -107,7 +144,45 @@ class BackupSupervisor():
             volume=self.volume,
             project=self.project
         )
-        self._creator.do_build_backup(backup)
+
+        fingerprint = previous = previous_fingerprint = False
+        if self._skip_unchanged:
+            previous = self.last_restorable_backup()
+            previous_fingerprint = previous and self.repository.read_metadata(previous).get('fingerprint', False)
+            fingerprint = self._creator.fingerprint()
+            if fingerprint and fingerprint == previous_fingerprint:
+                self.on_unchanged(previous, fingerprint)
+                return
+
+        try:
+            if self._stream_repository:
+                self._creator.do_stream_backup(
+                    backup,
+                    self._stream_repository,
+                    tee=self._stream_tee,
+                    fingerprint=fingerprint,
+                    previous_fingerprint=previous_fingerprint
+                )
+            else:
+                self._creator.do_build_backup(
+                    backup,
+                    fingerprint=fingerprint,
+                    previous_fingerprint=previous_fingerprint
+                )
+        except exp.BackupUnchanged:
+            self.on_unchanged(previous, previous_fingerprint)
+
+    def last_restorable_backup(self) -> Backup:
+        backups = BackupChain.restorable(self.repository.fetch(volume=Volume(self.volume, self.project)))
+        return max(backups, key=lambda backup: backup.epoch) if backups else False
+
+    def on_unchanged(self, backup: Backup, fingerprint: str):
+        Hook.plays(
+            'on_backup_unchanged',
+            volume=Volume(name=self.volume, project=self.project),
+            backup=backup,
+            fingerprint=fingerprint
+        )
 
     def synchronize(self):
         for synchronizeer in self.synchronizers:
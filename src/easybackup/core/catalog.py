@@ -0,0 +1,76 @@
+from typing import Dict, List
+
+
+class Catalog():
+
+    """
+    Append-only manifest of the archives stored on a repository.
+
+    Each line records an added (`+ filename`) or a removed
+    (`- filename`) archive. Added archives are followed by their size
+    in bytes, after a tab, when it is known. The storage is the
+    repository adapter, it must implement `read_catalog`,
+    `append_catalog` and `write_catalog`.
+    """
+
+    filename = 'easybackup.catalog'
+
+    def __init__(self, storage):
+        self._storage = storage
+
+    def filenames(self) -> List[str]:
+        """ return archive filenames recorded in the catalog, or False if it does not exist """
+        content = self._storage.read_catalog()
+        if content is False:
+            return False
+        return self.parse(content)
+
+    def entries(self) -> Dict[str, int]:
+        """ return archive filenames recorded in the catalog with their size, or False if it does not exist """
+        content = self._storage.read_catalog()
+        if content is False:
+            return False
+        return self.parse_entries(content)
+
+    def add(self, entries: Dict[str, int]):
+        """ record archives, entries map their filename to their size, None when unknown """
+        self._storage.append_catalog(self.format('+', entries))
+
+    def remove(self, filenames: List[str]):
+        self._storage.append_catalog(self.format('-', dict.fromkeys(filenames)))
+
+    def rebuild(self, entries: Dict[str, int]):
+        """ replace the whole catalog with entries """
+        self._storage.write_catalog(self.format('+', entries))
+
+    @classmethod
+    def format(cls, operation: str, entries: Dict[str, int]) -> str:
+        return ''.join(
+            '{operation} {filename}{size}\n'.format(
+                operation=operation,
+                filename=filename,
+                size='' if size is None else '\t%d' % size
+            )
+            for filename, size in entries.items()
+        )
+
+    @classmethod
+    def parse(cls, content: str) -> List[str]:
+        return list(cls.parse_entries(content))
+
+    @classmethod
+    def parse_entries(cls, content: str) -> Dict[str, int]:
+
+        entries = {}
+
+        # an unterminated last line is an interrupted append, ignore it
+        for line in content.split('\n')[:-1]:
+            operation, _, entry = line.partition(' ')
+            filename, _, size = entry.partition('\t')
+            if operation == '+':
+                # lines written before sizes were recorded have none
+                entries[filename] = int(size) if size else None
+            elif operation == '-':
+                entries.pop(filename, None)
+
+        return entries
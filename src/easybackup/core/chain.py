@@ -0,0 +1,144 @@
+import os
+import shutil
+import tarfile
+from typing import Dict, List
+
+from .backup import Backup
+from .compression import Codec
+from .exceptions import EasyBackupException
+
+FULL = 'full'
+INCREMENTAL = 'inc'
+DIFFERENTIAL = 'diff'
+
+# archive member listing the files deleted since the base backup
+DELETIONS_MEMBER = '.easybackup-deletions'
+
+
+class BackupChain():
+
+    """
+    Dependencies between full, incremental and differential backups.
+
+    The level of a backup is the prefix of its file type, an incremental
+    (`inc.tar`) depends on the previous backup of its volume and a
+    differential (`diff.tar`) depends on the previous full backup.
+    The base a backup was taken against is recorded in its metadata as
+    `base`, a chain whose recorded base is missing is broken. Backups
+    made before bases were recorded fall back to the listing order.
+    """
+
+    @classmethod
+    def level(cls, backup: Backup) -> str:
+        prefix = (backup.file_type or '').split('.', 1)[0]
+        return prefix if prefix in (INCREMENTAL, DIFFERENTIAL) else FULL
+
+    @classmethod
+    def file_type(cls, level: str, file_type: str) -> str:
+        return file_type if level == FULL else level+'.'+file_type
+
+    @classmethod
+    def chains(cls, backups: List[Backup]) -> Dict[Backup, List[Backup]]:
+        """ return for each backup the backups to restore, base first, or False when the chain is broken """
+
+        volumes = {}
+        names = {}
+        for backup in sorted(backups, key=lambda backup: backup.epoch):
+            volumes.setdefault((backup.project, backup.volume), []).append(backup)
+            names[backup.formated_name] = backup
+
+        chains = {}
+        for volume_backups in volumes.values():
+            full = previous = False
+            for backup in volume_backups:
+                level = cls.level(backup)
+                if level == FULL:
+                    chain = full = [backup]
+                    chains[backup] = previous = chain
+                    continue
+
+                if backup.base is not None:
+                    base = chains.get(names.get(backup.base), False)
+                elif level == DIFFERENTIAL:
+                    base = full
+                else:
+                    base = previous
+                chain = base + [backup] if base else False
+                chains[backup] = previous = chain
+
+        return chains
+
+    @classmethod
+    def load_bases(cls, adapter, backups: List[Backup]):
+        """ set the base recorded in the metadata of incremental and differential backups """
+        for backup in backups:
+            if backup.base is None and cls.level(backup) != FULL:
+                backup.base = adapter.read_metadata(backup).get('base')
+
+    @classmethod
+    def chain(cls, backups: List[Backup], backup: Backup) -> List[Backup]:
+        return cls.chains(backups).get(backup, False)
+
+    @classmethod
+    def restorable(cls, backups: List[Backup]) -> List[Backup]:
+        """ return backups whose whole chain is available """
+        chains = cls.chains(backups)
+        return [backup for backup in backups if chains.get(backup)]
+
+    @classmethod
+    def with_dependencies(cls, backups: List[Backup], tokeep: List[Backup]) -> List[Backup]:
+        """ return tokeep extended with the backups it depends on, in backups order """
+
+        chains = cls.chains(backups)
+        keep = set(tokeep)
+        for backup in tokeep:
+            keep.update(chains.get(backup) or [])
+
+        return [backup for backup in backups if backup in keep]
+
+    @classmethod
+    def restore(cls, adapter, backups: List[Backup], backup: Backup, destination: str) -> List[Backup]:
+        """ extract backup's chain from adapter into destination, return the restored chain """
+
+        chain = cls.chain(backups, backup)
+        if not chain:
+            raise EasyBackupException('backup_chain_broken', backup=backup.formated_name)
+
+        for link in chain:
+            with adapter.open_backup_reader(link) as archive:
+                cls.extract(archive, link, destination)
+
+        return chain
+
+    @classmethod
+    def extract(cls, archive, backup: Backup, destination: str):
+        cls.extract_content(Codec.decompressed(archive), destination)
+
+    @classmethod
+    def extract_content(cls, content, destination: str):
+        """ extract the uncompressed tar stream content into destination, applying its deletions """
+
+        with tarfile.open(fileobj=content, mode='r|') as tar:
+            for member in tar:
+                if member.name == DELETIONS_MEMBER:
+                    deleted = tar.extractfile(member).read().decode('utf-8')
+                    cls.apply_deletions(deleted.splitlines(), destination)
+                else:
+                    tar.extract(member, destination, **EXTRACT_OPTIONS)
+
+    @classmethod
+    def apply_deletions(cls, names: List[str], destination: str):
+
+        root = os.path.abspath(destination)
+        for name in names:
+            path = os.path.abspath(os.path.join(root, name))
+            if not path.startswith(root+os.sep):
+                continue
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            elif os.path.lexists(path):
+                os.remove(path)
+
+
+# refuse absolute names and path traversal where tarfile supports filters
+EXTRACT_OPTIONS = {'filter': 'tar'} if hasattr(tarfile, 'tar_filter') else {}
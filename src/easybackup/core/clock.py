@@ -1,5 +1,8 @@
 import datetime
 from .lexique import DATE_FORMAT
+from . import exceptions as exp
+
+EPOCH = datetime.datetime(1970, 1, 1)
 
 
 class Clock():
@@ -18,12 +21,36 @@ class Clock():
             now = datetime.datetime.now()
             return now.strftime(DATE_FORMAT)
 
+    @classmethod
+    def now_timestamp(cls) -> int:
+        return cls.timestamp(cls.now())
+
+    @classmethod
+    def timestamp(cls, date: str) -> int:
+        """ convert a DATE_FORMAT string to seconds since epoch, without strptime """
+
+        if type(date) is not str or len(date) != 15 or date[8] != '_':
+            raise exp.BackupParseNameError('datetime_do_not_match_date_format', datetime=date)
+
+        try:
+            date = datetime.datetime(
+                int(date[0:4]), int(date[4:6]), int(date[6:8]),
+                int(date[9:11]), int(date[11:13]), int(date[13:15])
+            )
+        except ValueError:
+            raise exp.BackupParseNameError('datetime_do_not_match_date_format', datetime=date)
+
+        return (date - EPOCH) // datetime.timedelta(seconds=1)
+
+    @classmethod
+    def from_timestamp(cls, timestamp: int) -> str:
+        """ convert seconds since epoch back to a DATE_FORMAT string """
+        return (EPOCH + datetime.timedelta(seconds=timestamp)).strftime(DATE_FORMAT)
+
     @classmethod
     def delta_from(cls, date_from: str):
         return cls.delta(date_from, cls.now())
 
     @classmethod
     def delta(cls, date_from: str, date_to: str):
-        date_from = datetime.datetime.strptime(date_from, DATE_FORMAT)
-        date_to = datetime.datetime.strptime(date_to, DATE_FORMAT)
-        return (date_to-date_from).total_seconds()
+        return cls.timestamp(date_to) - cls.timestamp(date_from)
@@ -0,0 +1,261 @@
+import bz2
+import gzip
+import lzma
+import tarfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from ..utils.streams import NonClosingWriter
+from ..utils.taggable import Taggable
+from .exceptions import EasyBackupException
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = False
+
+try:
+    import lz4.frame as lz4frame
+except ImportError:
+    lz4frame = False
+
+
+class Codec(Taggable):
+
+    """
+    Compression codec of archives.
+
+    `compressor` and `decompressor` wrap a binary file object, closing
+    the wrapper never closes the wrapped file object.
+    """
+
+    type_tag = False
+    suffix = ''
+    default_level = None
+    magic = b''
+
+    def __init__(self, level=None, threads=1):
+        if not self.available():
+            raise EasyBackupException('compression_codec_unavailable', codec=self.type_tag)
+        self.level = self.default_level if level is None else level
+        self.threads = max(1, int(threads))
+
+    def __str__(self):
+        return "[%s codec]" % self.type_tag
+
+    @classmethod
+    def available(cls) -> bool:
+        return True
+
+    def file_type(self, kind: str = 'tar') -> str:
+        """ file type of a `kind` archive compressed with the codec """
+        return kind+'.'+self.suffix if self.suffix else kind
+
+    def compressor(self, fileobj):
+        raise NotImplementedError
+
+    def decompressor(self, fileobj):
+        raise NotImplementedError
+
+    @classmethod
+    def detect(cls, fileobj) -> type:
+        """ return the codec of the buffered readable fileobj from its magic number, without consuming it """
+
+        head = fileobj.peek(8)[:8]
+        for codec in cls.__subclasses__():
+            if codec.magic and head.startswith(codec.magic):
+                return codec
+        return NoCompressionCodec
+
+    @classmethod
+    def decompressed(cls, fileobj):
+        """ return a readable stream of the content of fileobj, decompressed with the detected codec """
+        return cls.detect(fileobj)().decompressor(fileobj)
+
+    @classmethod
+    def tar_reader(cls, fileobj) -> tarfile.TarFile:
+        """ open a stream reading the tar archive fileobj, compressed with any codec """
+        return tarfile.open(fileobj=cls.decompressed(fileobj), mode='r|')
+
+    @classmethod
+    def build(cls, name: str, level=None, threads=1) -> 'Codec':
+        codec = cls.by_type_tag(name)
+        if not codec:
+            raise EasyBackupException('compression_codec_not_found', codec=name)
+        return codec(level, threads)
+
+
+class NoCompressionCodec(Codec):
+
+    type_tag = 'none'
+
+    def compressor(self, fileobj):
+        return NonClosingWriter(fileobj)
+
+    def decompressor(self, fileobj):
+        return fileobj
+
+
+class GzipCodec(Codec):
+
+    type_tag = 'gzip'
+    magic = b'\x1f\x8b'
+    suffix = 'gz'
+    default_level = 6
+
+    def file_type(self, kind='tar'):
+        # gzipped tar archives have always been stored with a plain .tar extension
+        return 'tar' if kind == 'tar' else super().file_type(kind)
+
+    def compressor(self, fileobj):
+        if self.threads > 1:
+            return ParallelGzipWriter(fileobj, level=self.level, threads=self.threads)
+        return gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=self.level)
+
+    def decompressor(self, fileobj):
+        return gzip.GzipFile(fileobj=fileobj, mode='rb')
+
+
+class Bz2Codec(Codec):
+
+    type_tag = 'bz2'
+    magic = b'BZh'
+    suffix = 'bz2'
+    default_level = 9
+
+    def compressor(self, fileobj):
+        return bz2.BZ2File(fileobj, mode='wb', compresslevel=self.level)
+
+    def decompressor(self, fileobj):
+        return bz2.BZ2File(fileobj, mode='rb')
+
+
+class XzCodec(Codec):
+
+    type_tag = 'xz'
+    magic = b'\xfd7zXZ\x00'
+    suffix = 'xz'
+    default_level = 6
+
+    def compressor(self, fileobj):
+        return lzma.LZMAFile(fileobj, mode='wb', preset=self.level)
+
+    def decompressor(self, fileobj):
+        return lzma.LZMAFile(fileobj, mode='rb')
+
+
+class ZstdCodec(Codec):
+
+    type_tag = 'zstd'
+    magic = b'\x28\xb5\x2f\xfd'
+    suffix = 'zst'
+    default_level = 3
+
+    @classmethod
+    def available(cls):
+        return bool(zstandard)
+
+    def compressor(self, fileobj):
+        return zstandard.ZstdCompressor(level=self.level).stream_writer(fileobj, closefd=False)
+
+    def decompressor(self, fileobj):
+        return zstandard.ZstdDecompressor().stream_reader(fileobj, closefd=False)
+
+
+class Lz4Codec(Codec):
+
+    type_tag = 'lz4'
+    magic = b'\x04\x22\x4d\x18'
+    suffix = 'lz4'
+    default_level = 0
+
+    @classmethod
+    def available(cls):
+        return bool(lz4frame)
+
+    def compressor(self, fileobj):
+        return lz4frame.LZ4FrameFile(fileobj, mode='wb', compression_level=self.level)
+
+    def decompressor(self, fileobj):
+        return lz4frame.LZ4FrameFile(fileobj, mode='rb')
+
+
+class ParallelGzipWriter():
+
+    """
+    Gzip writer compressing fixed size blocks on a thread pool.
+
+    Every block is written as an independent gzip member, the output is
+    a standard multi-member gzip stream readable by `gzip -d` or
+    `tar -xzf`. zlib releases the GIL so blocks compress in parallel,
+    at most `2 * threads` blocks are held in memory.
+    """
+
+    block_size = 1024 * 1024
+
+    def __init__(self, fileobj, level=GzipCodec.default_level, threads=2, block_size=False):
+        self._fileobj = fileobj
+        self._level = level
+        self._threads = threads
+        self._block_size = block_size or self.block_size
+        self._executor = ThreadPoolExecutor(max_workers=threads)
+        self._pending = deque()
+        self._buffer = bytearray()
+        self._members = 0
+        self.closed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        while len(self._buffer) >= self._block_size:
+            self._submit(bytes(self._buffer[:self._block_size]))
+            del self._buffer[:self._block_size]
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if self.closed:
+            return
+
+        try:
+            if self._buffer or not self._members:
+                self._submit(bytes(self._buffer))
+                self._buffer = bytearray()
+            while self._pending:
+                self._write_next()
+            self._fileobj.flush()
+        finally:
+            self.abort()
+
+    def abort(self):
+        """ stop compression, pending blocks are discarded """
+        self.closed = True
+        for future in self._pending:
+            future.cancel()
+        self._pending.clear()
+        self._executor.shutdown(wait=True)
+
+    def _submit(self, block):
+        while len(self._pending) >= 2 * self._threads:
+            self._write_next()
+        self._pending.append(self._executor.submit(self._compress, block))
+        self._members += 1
+
+    def _write_next(self):
+        self._fileobj.write(self._pending.popleft().result())
+
+    def _compress(self, block):
+        return gzip.compress(block, compresslevel=self._level, mtime=0)
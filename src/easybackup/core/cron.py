@@ -0,0 +1,133 @@
+import datetime
+from typing import List
+
+from .clock import EPOCH
+from .exceptions import EasyBackupException
+
+ALIASES = {
+    '@yearly': '0 0 1 1 *',
+    '@annually': '0 0 1 1 *',
+    '@monthly': '0 0 1 * *',
+    '@weekly': '0 0 * * 0',
+    '@daily': '0 0 * * *',
+    '@midnight': '0 0 * * *',
+    '@hourly': '0 * * * *',
+}
+
+# minute, hour, day of month, month, day of week (0 or 7 is sunday)
+FIELDS = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 7))
+
+# give up looking for a matching date after this many years, like for `0 0 30 2 *`
+SEARCH_YEARS = 8
+
+
+class CronExpression():
+
+    """
+    Five fields cron expression: minute, hour, day of month, month and
+    day of week, with `*`, lists, ranges and steps, or an @alias.
+
+    Allowed values are expanded once, `next_after` then skips whole
+    months, days and hours that do not match instead of testing every
+    minute. As in cron, when both days of month and days of week are
+    restricted a day matching either of them fires.
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        fields = ALIASES.get(expression.strip(), expression).split()
+        if len(fields) != len(FIELDS):
+            raise EasyBackupException('cron_expression_invalid', expression=expression)
+
+        minutes, hours, days, months, weekdays = [
+            self.parse_field(field, low, high)
+            for field, (low, high) in zip(fields, FIELDS)
+        ]
+        self.minutes = minutes
+        self.hours = hours
+        self.days = set(days)
+        self.months = set(months)
+        self.weekdays = {weekday % 7 for weekday in weekdays}
+        self.any_day = fields[2] == '*'
+        self.any_weekday = fields[4] == '*'
+
+    def __str__(self):
+        return self.expression
+
+    def parse_field(self, field: str, low: int, high: int) -> List[int]:
+
+        values = set()
+        try:
+            for part in field.split(','):
+                interval, _, step = part.partition('/')
+                step = int(step) if step else 1
+                if interval == '*':
+                    start, end = low, high
+                elif '-' in interval:
+                    start, end = map(int, interval.split('-', 1))
+                else:
+                    start = int(interval)
+                    end = high if step > 1 else start
+
+                if step < 1 or start < low or end > high or start > end:
+                    raise ValueError(part)
+                values.update(range(start, end + 1, step))
+        except ValueError:
+            raise EasyBackupException('cron_expression_invalid', expression=self.expression)
+
+        return sorted(values)
+
+    def match_day(self, date: datetime.date) -> bool:
+
+        in_days = date.day in self.days
+        # isoweekday is 7 on sunday
+        in_weekdays = date.isoweekday() % 7 in self.weekdays
+
+        if self.any_day or self.any_weekday:
+            return in_days and in_weekdays
+        return in_days or in_weekdays
+
+    def next_after(self, epoch: int) -> int:
+        """ return the first fire time strictly after epoch, both in seconds since epoch """
+
+        moment = EPOCH + datetime.timedelta(seconds=epoch - epoch % 60 + 60)
+        limit = moment.year + SEARCH_YEARS
+
+        while moment.year <= limit:
+
+            if moment.month not in self.months:
+                moment = self.first_of_next_month(moment)
+                continue
+
+            if not self.match_day(moment.date()):
+                moment = datetime.datetime(moment.year, moment.month, moment.day) + datetime.timedelta(days=1)
+                continue
+
+            hour = self.first_at_least(self.hours, moment.hour)
+            if hour is None:
+                moment = datetime.datetime(moment.year, moment.month, moment.day) + datetime.timedelta(days=1)
+                continue
+            if hour != moment.hour:
+                moment = moment.replace(hour=hour, minute=0)
+
+            minute = self.first_at_least(self.minutes, moment.minute)
+            if minute is None:
+                moment = moment.replace(minute=0) + datetime.timedelta(hours=1)
+                continue
+
+            return (moment.replace(minute=minute) - EPOCH) // datetime.timedelta(seconds=1)
+
+        raise EasyBackupException('cron_expression_never_fires', expression=self.expression)
+
+    @staticmethod
+    def first_at_least(values: List[int], value: int):
+        for candidate in values:
+            if candidate >= value:
+                return candidate
+        return None
+
+    @staticmethod
+    def first_of_next_month(moment: datetime.datetime) -> datetime.datetime:
+        if moment.month == 12:
+            return datetime.datetime(moment.year + 1, 1, 1)
+        return datetime.datetime(moment.year, moment.month + 1, 1)
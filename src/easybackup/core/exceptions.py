@@ -22,3 +22,19 @@ class RepositoryLinkNotFound(EasyBackupException):
 
 class BuilderChainningIncompatibility(EasyBackupException):
     pass
+
+
+class BackupTransferError(EasyBackupException):
+    pass
+
+
+class DockerExecError(EasyBackupException):
+    pass
+
+
+class DockerApiError(EasyBackupException):
+    pass
+
+
+class BackupUnchanged(EasyBackupException):
+    pass
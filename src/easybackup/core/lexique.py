@@ -6,7 +6,25 @@ from ..i18n import i18n
 ARCHIVE_TYPE = [
     'zip',
     'tar',
-    'sql'
+    'tar.gz',
+    'tar.bz2',
+    'tar.xz',
+    'tar.zst',
+    'tar.lz4',
+    'sql',
+    'sql.gz',
+    'sql.bz2',
+    'sql.xz',
+    'sql.zst',
+    'sql.lz4'
+]
+
+# incremental and differential directory archives, see core.chain
+CHAIN_LEVELS = ['inc', 'diff']
+ARCHIVE_TYPE += [
+    level+'.'+file_type
+    for level in CHAIN_LEVELS
+    for file_type in ARCHIVE_TYPE if file_type.split('.')[0] == 'tar'
 ]
 
 DATE_FORMAT = '%Y%m%d_%H%M%S'
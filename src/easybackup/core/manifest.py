@@ -0,0 +1,72 @@
+import json
+import os
+from typing import Dict, List, Tuple
+
+from .backup import Backup
+
+
+class FileManifest():
+
+    """
+    File state of a volume's source directory, used for incremental backups.
+
+    The manifest records the files seen by the last full backup and by
+    the last backup of the volume, each file is identified by its archive
+    name and described by `[size, mtime_ns, inode]`. The storage is the
+    repository adapter, it must implement `read_manifest` and
+    `write_manifest`.
+    """
+
+    def __init__(self, storage, project: str, volume: str):
+        self._storage = storage
+        self.filename = Backup.format_name(project=project, volume=volume, datetime='').rstrip('-')+'.manifest'
+
+    def load(self) -> Dict:
+        """ return {'full': record, 'last': record}, or False if there is no manifest """
+
+        content = self._storage.read_manifest(self.filename)
+        if not content:
+            return False
+
+        try:
+            return json.loads(content)
+        except ValueError:
+            return False
+
+    def save(self, state: Dict):
+        self._storage.write_manifest(self.filename, json.dumps(state, separators=(',', ':')))
+
+    @classmethod
+    def record(cls, backup: Backup, files: Dict) -> Dict:
+        return {'backup': backup.formated_name, 'files': files}
+
+    @classmethod
+    def scan(cls, directory: str) -> Dict[str, List[int]]:
+        """ return the state of directory's entries, named as in archives """
+
+        root = os.path.basename(os.path.normpath(directory))
+        files = {root: cls.stat(directory)}
+
+        for path, directories, filenames in os.walk(directory):
+            relative = os.path.relpath(path, directory)
+            prefix = root if relative == '.' else root+'/'+relative.replace(os.sep, '/')
+            for name in directories + filenames:
+                try:
+                    files[prefix+'/'+name] = cls.stat(os.path.join(path, name))
+                except FileNotFoundError:
+                    pass
+
+        return files
+
+    @classmethod
+    def stat(cls, path: str) -> List[int]:
+        stat = os.lstat(path)
+        return [stat.st_size, stat.st_mtime_ns, stat.st_ino]
+
+    @classmethod
+    def diff(cls, previous: Dict, current: Dict) -> Tuple[List[str], List[str]]:
+        """ return (changed, deleted) names of current compared to previous """
+
+        changed = [name for name, state in current.items() if previous.get(name) != state]
+        deleted = [name for name in previous if name not in current]
+        return sorted(changed), sorted(deleted)
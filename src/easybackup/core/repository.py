@@ -1,12 +1,14 @@
 
-from pathlib import Path
-from typing import List
+from typing import Dict, List
 
-from ..policy.cleanup import CleanupPolicy
+from ..policy.cleanup import VOLUME_SCOPE, CleanupPolicy
 from ..utils.taggable import Taggable
 from .backup import Backup
+from .catalog import Catalog
+from .chain import BackupChain
 from .hook import Hook
 from .lexique import ARCHIVE_TYPE
+from .snapshot import ListingSnapshot
 from .volume import Volume
 
 
@@ -15,6 +17,12 @@ class RepositoryAdapter(Taggable):
     type_tage = False
 
     _prefix = 'easybackup'
+    metadata_suffix = '.meta'
+
+    catalog = False
+
+    # adapters able to restrict their listing to a volume
+    volume_pushdown = False
 
     def __init__(self, **conf):
         self.setup(**conf)
@@ -26,27 +34,126 @@ class RepositoryAdapter(Taggable):
         """ setup the adapter with config values """
         raise NotImplementedError
 
-    def fetch_backups(self) -> List[Backup]:
-        """ return a list of string describing backup from the repository """
+    @property
+    def identity(self):
+        """ value identifying the storage behind the adapter """
+        return (self.type_tag, id(self))
+
+    def fetch_backups(self, volume: Volume = False) -> List[Backup]:
+        """
+        return a list of backups from the repository, adapters with
+        `volume_pushdown` may restrict the listing to volume's backups
+        """
         raise NotImplementedError
 
     def cleanup_backups(self, backups: List[Backup]):
         """ cleanup backups """
         raise NotImplementedError
 
+    def open_backup_writer(self, backup: Backup):
+        """
+        context manager returning a writable binary file object storing backup's
+        archive, a partially written archive is removed on failure
+        """
+        raise NotImplementedError
+
+    def open_backup_reader(self, backup: Backup):
+        """ context manager returning a readable binary file object of backup's archive """
+        raise NotImplementedError
+
+    def backup_size(self, backup: Backup) -> int:
+        """ return the size in bytes of backup's archive, as stored """
+        raise NotImplementedError
+
+    def load_sizes(self, backups: List[Backup]):
+        """ set the size of backups listed without it """
+        for backup in backups:
+            backup.size = self.backup_size(backup)
+
+    def read_metadata(self, backup: Backup) -> dict:
+        """ return metadata stored next to backup's archive, adapters without metadata return {} """
+        return {}
+
+    def write_metadata(self, backup: Backup, metadata: dict):
+        """ store metadata next to backup's archive, removed with the backup """
+        pass
+
+    @classmethod
+    def metadata_filename(cls, backup: Backup) -> str:
+        return cls.backup_to_filename(backup)+cls.metadata_suffix
+
+    def list_backup_filenames(self, volume: Volume = False) -> List[str]:
+        """ return archive filenames from the real repository listing """
+        raise NotImplementedError
+
+    def list_backup_entries(self, volume: Volume = False) -> Dict[str, int]:
+        """
+        return archive filenames from the real repository listing with their size,
+        sizes are None when the listing does not provide them
+        """
+        return dict.fromkeys(self.list_backup_filenames(volume=volume))
+
+    def backup_entries(self, volume: Volume = False) -> Dict[str, int]:
+        """ return archive filenames with their size, from the catalog when it is enabled """
+
+        if not self.catalog:
+            return self.list_backup_entries(volume=volume)
+
+        entries = self.catalog.entries()
+        if entries is False:
+            entries = self.list_backup_entries()
+            self.catalog.rebuild(entries)
+
+        if volume:
+            prefix = volume.filename_prefix()
+            entries = {
+                filename: size for filename, size in entries.items()
+                if filename.startswith(prefix)
+            }
+
+        return entries
+
+    def backup_filenames(self, volume: Volume = False) -> List[str]:
+        """ return archive filenames, from the catalog when it is enabled """
+
+        if not self.catalog:
+            return self.list_backup_filenames(volume=volume)
+        return list(self.backup_entries(volume=volume))
+
+    def set_concurrency(self, count: int):
+        """ prepare the adapter to serve `count` concurrent operations """
+        pass
+
+    def close(self):
+        """ release resources kept alive during a run """
+        pass
+
+    def register_backups(self, backups: List[Backup]):
+        """ record backups stored on the repository by a creator or a link """
+        if self.catalog:
+            self.catalog.add({self.backup_to_filename(backup): backup.size for backup in backups})
+
+    def reindex(self) -> int:
+        """ rebuild the catalog, with sizes when listed, from the real repository listing """
+        entries = self.list_backup_entries()
+        self.catalog = self.catalog or Catalog(self)
+        self.catalog.rebuild(entries)
+        return len(entries)
+
     @classmethod
     def backup_to_filename(cls, backup: Backup) -> str:
         return backup.formated_name +'.'+ backup.file_type
 
     @classmethod
-    def filename_to_backup(cls, filename: str) -> Backup:
+    def filename_to_backup(cls, filename: str, size: int = None) -> Backup:
         _, projet, volume, date = filename.split('-')
-        date, file_type = date.split('.')
+        date, file_type = date.split('.', 1)
         return Backup(**{
             'volume': volume,
             'project': projet,
             'datetime': date,
-            'file_type': file_type
+            'file_type': file_type,
+            'size': size
         })
 
     @classmethod
@@ -55,7 +162,8 @@ class RepositoryAdapter(Taggable):
         if not filename.startswith(cls._prefix):
             return False
 
-        if not (Path(filename).suffix.split('.')[-1] in ARCHIVE_TYPE):
+        file_type = filename.rsplit('-', 1)[-1].partition('.')[2]
+        if file_type not in ARCHIVE_TYPE:
             return False
 
         return True
@@ -77,7 +185,17 @@ class Repository():
     def fetch(self, volume: Volume = False) -> List[Backup]:
         """ return all backups on the repository """
         Hook.plays('before_fetch_backups', repository=self, volume=volume)
-        backups = self._adapter.fetch_backups()
+
+        backups = ListingSnapshot.get(self._adapter, volume=volume)
+        if backups is False:
+            if volume and self._adapter.volume_pushdown:
+                backups = self._adapter.fetch_backups(volume=volume)
+                BackupChain.load_bases(self._adapter, backups)
+                ListingSnapshot.store(self._adapter, backups, volume=volume)
+            else:
+                backups = self._adapter.fetch_backups()
+                BackupChain.load_bases(self._adapter, backups)
+                ListingSnapshot.store(self._adapter, backups)
 
         if volume:
             backups = volume.match(backups)
@@ -85,13 +203,16 @@ class Repository():
         Hook.plays('after_fetch_backups', repository=self, backups=backups, volume=volume)
         return backups
 
+    def read_metadata(self, backup: Backup) -> dict:
+        return self._adapter.read_metadata(backup)
+
     def last_backup(self) -> Backup:
         """ return last backup on the repository """
         fetch = self.fetch()
         if not fetch:
             return False
         else:
-            return self.fetch()[-1]
+            return max(fetch, key=lambda backup: backup.epoch)
 
     def cleanup(self, policy: CleanupPolicy, volume: Volume = False):
         tocleanup = self.tocleanup(policy, volume)
@@ -105,9 +226,16 @@ class Repository():
         )
 
     def tocleanup(self, policy: CleanupPolicy, volume: Volume = False) -> List[Backup]:
-        backups = self.fetch(volume=volume)
+        backups = self.fetch(volume=volume if policy.scope == VOLUME_SCOPE else False)
+        if policy.needs_sizes:
+            self._adapter.load_sizes([backup for backup in backups if backup.size is None])
         tocleanup = policy.filter_backups_to_cleanup(backups)
         return tocleanup
 
     def cleanup_backups(self, backups: List[Backup]):
         self._adapter.cleanup_backups(backups)
+        ListingSnapshot.discard(self._adapter, backups)
+
+    def reindex(self):
+        count = self._adapter.reindex()
+        Hook.plays('on_reindex_repository', repository=self, count=count)
@@ -1,11 +1,20 @@
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
 
 from .backup import Backup
 from .volume import Volume
 from .repository import Repository, RepositoryAdapter
-from ..policy.synchronization import SynchronizationPolicy, CopyPastePolicy
+from .snapshot import ListingSnapshot
+from ..policy.synchronization import SynchronizationPolicy, CopyPastePolicy, TransferBudget
 from . import exceptions as exp
 from .hook import Hook
 
+# returned by a transfer left to the next run once the budget is exhausted
+POSTPONED = object()
+
+
 class RepositoryLink():
 
     type_tag_source = False
@@ -15,16 +24,26 @@ class RepositoryLink():
         self,
         source: RepositoryAdapter,
         target: RepositoryAdapter,
-        volume: Volume = False
+        volume: Volume = False,
+        workers: int = 1
     ):
         self._source = source
         self._target = target
         self._volume = volume
+        self._workers = max(1, workers)
 
-    def copy_backup(self, backup: Backup):
-        """ Synchronize backup from source to target """
+        source.set_concurrency(self._workers)
+        target.set_concurrency(self._workers)
+
+    def copy_backup(self, backup: Backup) -> int:
+        """ Synchronize backup from source to target, return the copied size in bytes when known """
         raise NotImplementedError
 
+    @property
+    def workers(self) -> int:
+        """ number of concurrent transfers """
+        return self._workers
+
     @property
     def volume(self) -> Volume:
         return self._volume
@@ -49,31 +68,113 @@ class RepositoryLink():
         """ Synchronize all backup from source to target """
 
         policy = policy or CopyPastePolicy(volume=self.volume)
+        target_repository = self.target_repository
 
-        tocopy = policy.to_copy(
+        tocopy, todelete = policy.plan(
             source=self.source_repository,
-            target=self.target_repository
-        )
-        todelete = policy.to_delete(
-            source=self.source_repository,
-            target=self.target_repository
+            target=target_repository
         )
 
         Hook.plays(
             'on_synchronize_repository',
             volume=self.volume,
             source=self.source_adapter,
-            target=self.target_repository,
+            target=target_repository,
             policy=policy,
             tocopy=tocopy,
             todelete=todelete
         )
 
-        self.copy_backups(tocopy)
-        self.target_repository.cleanup_backups(todelete)
+        self.copy_backups(tocopy, budget=policy.budget())
+        target_repository.cleanup_backups(todelete)
+
+    def copy_backups(self, backups: List[Backup], budget: TransferBudget = False):
+        """
+        Copy backups with up to `workers` concurrent transfers, in order,
+        until budget is exhausted. Failures are raised together once every
+        transfer is done.
+        """
+
+        transfer = functools.partial(self.transfer, budget=budget)
+        if self.workers > 1 and len(backups) > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                errors = list(pool.map(transfer, backups))
+        else:
+            errors = list(map(transfer, backups))
+
+        # copied backups are registered, the next run's diff starts where this one stopped
+        copied = [backup for backup, error in zip(backups, errors) if error is None]
+        self.target_adapter.register_backups(copied)
+        ListingSnapshot.add(self.target_adapter, copied)
+
+        postponed = [backup for backup, error in zip(backups, errors) if error is POSTPONED]
+        if postponed:
+            Hook.plays(
+                'on_transfer_budget_exhausted',
+                volume=self.volume,
+                target=self.target_adapter,
+                postponed=postponed,
+                budget=budget
+            )
+
+        failures = [
+            (backup, error) for backup, error in zip(backups, errors)
+            if error is not None and error is not POSTPONED
+        ]
+        if failures:
+            raise exp.BackupTransferError(
+                'backups_transfer_failed',
+                count=len(failures),
+                target=str(self.target_adapter),
+                errors='; '.join(
+                    '{backup}: {error}'.format(backup=backup.formated_name, error=error)
+                    for backup, error in failures
+                ),
+                failures=failures
+            )
+
+    def transfer(self, backup: Backup, budget: TransferBudget = False):
+        """ copy a single backup, return the raised error if any, or POSTPONED when out of budget """
+
+        if budget and budget.exhausted:
+            return POSTPONED
+
+        start = time.monotonic()
+        try:
+            metadata = None
+            known_size = backup.size
+            if budget and known_size is None:
+                # the sidecar is read anyway to be copied, it may know the size
+                metadata = self.source_adapter.read_metadata(backup)
+                known_size = metadata.get('size')
+            if budget and not budget.admit(known_size):
+                return POSTPONED
+
+            size = self.copy_backup(backup)
+            if budget and known_size is None:
+                budget.spend(size)
+            if backup.size is None:
+                # recorded by the target catalog on registration
+                backup.size = size
+            self.copy_metadata(backup, metadata)
+        except Exception as error:
+            return error
+
+        Hook.plays(
+            'on_backup_transferred',
+            backup=backup,
+            source=self.source_adapter,
+            target=self.target_adapter,
+            size=size,
+            duration=time.monotonic() - start
+        )
 
-    def copy_backups(self, backups):
-        list(map(self.copy_backup, backups))
+    def copy_metadata(self, backup: Backup, metadata: dict = None):
+        """ propagate backup's sidecar metadata, like checksums, to the target """
+        if metadata is None:
+            metadata = self.source_adapter.read_metadata(backup)
+        if metadata:
+            self.target_adapter.write_metadata(backup, metadata)
 
     @classmethod
     def get_source_target_compatible(cls, source, target):
@@ -0,0 +1,93 @@
+import io
+import os
+from contextlib import ExitStack, contextmanager
+from typing import List
+
+from ..utils.streams import PrefetchReader
+from .backup import Backup
+from .backup_creator import BackupCreator
+from .chain import BackupChain
+from .clock import Clock
+from .compression import Codec
+from .exceptions import EasyBackupException
+from .hook import Hook
+from .repository import Repository
+from .volume import Volume
+
+
+class BackupRestorer():
+
+    """
+    Restore backups of a volume from a repository.
+
+    Archives are streamed from the repository adapter, never staged on
+    disk. The download and the decompression each run in a thread reading
+    `prefetch` blocks ahead of the next stage, so a restore lasts as long
+    as its slowest stage instead of the sum of the stages.
+    """
+
+    block_size = 1024 * 1024
+
+    def __init__(self, repository: Repository, volume: Volume, prefetch: int = 8):
+        self.repository = repository
+        self.volume = volume
+        self.prefetch = max(1, prefetch)
+
+    @property
+    def adapter(self):
+        return self.repository.adapter
+
+    def select(self, datetime: str = False) -> Backup:
+        """ return the last restorable backup of the volume, taken at or before datetime """
+
+        backups = BackupChain.restorable(self.repository.fetch(volume=self.volume))
+        if datetime:
+            epoch = Clock.timestamp(datetime)
+            backups = [backup for backup in backups if backup.epoch <= epoch]
+
+        if not backups:
+            raise EasyBackupException(
+                'restorable_backup_not_found',
+                volume=str(self.volume),
+                repository=str(self.repository),
+                datetime=datetime or Clock.now()
+            )
+        return max(backups, key=lambda backup: backup.epoch)
+
+    @contextmanager
+    def open_content(self, backup: Backup):
+        """ yield a reader of the decompressed content of backup's archive """
+
+        with ExitStack() as stack:
+            archive = stack.enter_context(self.adapter.open_backup_reader(backup))
+            fetched = stack.enter_context(PrefetchReader(archive, self.block_size, self.prefetch))
+            compressed = io.BufferedReader(fetched, self.block_size)
+            content = stack.enter_context(PrefetchReader(Codec.decompressed(compressed), self.block_size, self.prefetch))
+            yield io.BufferedReader(content, self.block_size)
+
+    def restore(self, backup: Backup, destination: str) -> List[Backup]:
+        """ extract backup and the backups it depends on into destination, return the restored chain """
+
+        chain = BackupChain.chain(self.repository.fetch(volume=self.volume), backup)
+        if not chain:
+            raise EasyBackupException('backup_chain_broken', backup=backup.formated_name)
+
+        os.makedirs(destination, exist_ok=True)
+        for link in chain:
+            with self.open_content(link) as content:
+                BackupChain.extract_content(content, destination)
+            Hook.plays('on_backup_restored', backup=link, repository=self.repository, destination=destination)
+
+        return chain
+
+    def restore_into(self, backup: Backup, creator: BackupCreator) -> Backup:
+        """ load backup back into the source of creator, like a dump imported into its database """
+
+        if not creator.restorable:
+            raise EasyBackupException('creator_cannot_restore', creator=str(creator), volume=str(self.volume))
+
+        with self.open_content(backup) as content:
+            creator.restore_backup(backup, content)
+        Hook.plays('on_backup_restored', backup=backup, repository=self.repository, destination=str(creator))
+
+        return backup
@@ -0,0 +1,89 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from typing import List
+
+from ..logger import Logger
+from .backup_supervisor import BackupSupervisor
+from .hook import Hook
+from .volume import Volume
+
+
+class SupervisorRunner():
+
+    """
+    Run backup supervisors with a pool of `jobs` threads.
+
+    Supervisors writing to the same repository, or using creators
+    with the same concurrency key, are limited to `repository_jobs`
+    and `creator_jobs` concurrent runs. Logs are emitted per volume
+    once its supervisor is done, and a failing supervisor does not
+    stop the others.
+    """
+
+    def __init__(
+        self,
+        supervisors: List[BackupSupervisor],
+        jobs: int = 1,
+        repository_jobs: int = False,
+        creator_jobs: int = False
+    ):
+        self._supervisors = supervisors
+        self._jobs = max(1, jobs)
+        self._repository_jobs = repository_jobs or self._jobs
+        self._creator_jobs = creator_jobs or self._jobs
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def run(self) -> List[BackupSupervisor]:
+        """ run every supervisor and return the failing ones """
+
+        if self._jobs == 1:
+            results = list(map(self.run_supervisor, self._supervisors))
+        else:
+            with ThreadPoolExecutor(max_workers=self._jobs) as pool:
+                results = list(pool.map(self.run_supervisor, self._supervisors))
+
+        return [
+            supervisor for supervisor, succeed in zip(self._supervisors, results)
+            if not succeed
+        ]
+
+    def run_supervisor(self, supervisor: BackupSupervisor) -> bool:
+
+        with Logger.buffered():
+            try:
+                with self.acquire(supervisor):
+                    supervisor.run()
+                return True
+            except Exception as error:
+                Hook.plays(
+                    'on_supervisor_failure',
+                    volume=Volume(name=supervisor.volume, project=supervisor.project),
+                    error=error
+                )
+                return False
+
+    def acquire(self, supervisor: BackupSupervisor) -> ExitStack:
+        """ take every limit of supervisor, always in the same order to avoid deadlocks """
+
+        stack = ExitStack()
+        for key in sorted(self.limits(supervisor), key=repr):
+            stack.enter_context(self.semaphore(key))
+        return stack
+
+    def limits(self, supervisor: BackupSupervisor) -> set:
+        keys = set(
+            ('repository', repository.adapter.identity)
+            for repository in supervisor.repositories
+        )
+        if supervisor.creator:
+            keys.add(('creator', supervisor.creator.concurrency_key))
+        return keys
+
+    def semaphore(self, key) -> threading.Semaphore:
+        with self._lock:
+            if key not in self._semaphores:
+                size = self._repository_jobs if key[0] == 'repository' else self._creator_jobs
+                self._semaphores[key] = threading.Semaphore(size)
+            return self._semaphores[key]
@@ -0,0 +1,99 @@
+import threading
+from contextlib import contextmanager
+from typing import List
+
+from .backup import Backup
+
+
+class ListingSnapshot():
+
+    """
+    Run-scoped cache of repository listings.
+
+    Listings are keyed by adapter identity so that every adapter
+    instance pointing to the same storage shares a single listing,
+    adapters with volume pushdown also get one listing per volume.
+    The cache is only active inside `ListingSnapshot.run()`.
+    """
+
+    _listings = False
+    _lock = threading.Lock()
+
+    @classmethod
+    @contextmanager
+    def run(cls):
+
+        if cls.active():
+            yield
+            return
+
+        cls._listings = {}
+        try:
+            yield
+        finally:
+            cls._listings = False
+
+    @classmethod
+    def active(cls) -> bool:
+        return cls._listings is not False
+
+    @classmethod
+    def get(cls, adapter, volume=False) -> List[Backup]:
+        """
+        return the cached listing of adapter, or False.
+        The whole listing is preferred, otherwise the volume listing is used.
+        """
+
+        with cls._lock:
+
+            if not cls.active():
+                return False
+
+            listings = cls._listings.get(adapter.identity, {})
+            backups = listings.get(None, False)
+            if backups is False and volume:
+                backups = listings.get(volume.key, False)
+
+            if backups is False:
+                return False
+
+            return list(backups)
+
+    @classmethod
+    def store(cls, adapter, backups: List[Backup], volume=False):
+        with cls._lock:
+            if cls.active():
+                listings = cls._listings.setdefault(adapter.identity, {})
+                listings[volume.key if volume else None] = list(backups)
+
+    @classmethod
+    def add(cls, adapter, backups: List[Backup]):
+        """ record backups created on adapter's storage """
+
+        with cls._lock:
+
+            if not cls.active():
+                return
+
+            for key, listing in cls._listings.get(adapter.identity, {}).items():
+                known = set(listing)
+                for backup in backups:
+                    if backup in known:
+                        continue
+                    if key is None or key == (backup.project, backup.volume):
+                        listing.append(backup)
+                        known.add(backup)
+
+    @classmethod
+    def discard(cls, adapter, backups: List[Backup]):
+        """ record backups removed from adapter's storage """
+
+        with cls._lock:
+
+            if not cls.active():
+                return
+
+            removed = set(backups)
+            listings = cls._listings.get(adapter.identity, {})
+            for key, listing in listings.items():
+                listings[key] = [backup for backup in listing if backup not in removed]
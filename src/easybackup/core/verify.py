@@ -0,0 +1,138 @@
+import hashlib
+import tarfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from .backup import Backup
+from .compression import Codec
+from .exceptions import EasyBackupException
+from .hook import Hook
+from .repository import Repository
+from .volume import Volume
+
+SIZE = 'size'
+FULL = 'full'
+
+
+class VerificationResult():
+
+    __slots__ = ('backup', 'ok', 'method', 'reason')
+
+    def __init__(self, backup: Backup, ok: bool, method: str, reason: str = ''):
+        self.backup = backup
+        self.ok = ok
+        self.method = method
+        self.reason = reason
+
+    def __repr__(self):
+        return "VerificationResult(%s, %s, %s)" % (self.backup.formated_name, self.method, 'ok' if self.ok else self.reason)
+
+
+class RepositoryVerifier():
+
+    """
+    Check the archives stored on a repository.
+
+    In `full` mode archives are streamed and compared to the checksum
+    recorded when they were written, archives without a checksum are
+    decompressed to the end instead. In `size` mode the stored size is
+    compared to the recorded one, archives without a recorded size are
+    only checked to exist. Archives are checked by `workers` threads,
+    hashing and decompression release the GIL.
+    """
+
+    buffer_size = 1024 * 1024
+
+    def __init__(self, repository: Repository, mode: str = FULL, workers: int = 4):
+        if mode not in (SIZE, FULL):
+            raise EasyBackupException('verify_mode_not_found', mode=mode)
+
+        self.repository = repository
+        self.mode = mode
+        self.workers = max(1, workers)
+
+    @property
+    def adapter(self):
+        return self.repository.adapter
+
+    def run(self, volume: Volume = False) -> List[VerificationResult]:
+        """ verify backups of the repository, or of volume, and report them per volume """
+
+        backups = self.repository.fetch(volume=volume)
+
+        self.adapter.set_concurrency(self.workers)
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            results = list(pool.map(self.verify, backups))
+
+        volumes = {}
+        for result in results:
+            volumes.setdefault((result.backup.project, result.backup.volume), []).append(result)
+            if not result.ok:
+                Hook.plays(
+                    'on_backup_verify_failed',
+                    backup=result.backup,
+                    repository=self.repository,
+                    reason=result.reason
+                )
+
+        for (project, name), volume_results in sorted(volumes.items()):
+            Hook.plays(
+                'on_verify_volume',
+                volume=Volume(name=name, project=project),
+                repository=self.repository,
+                results=volume_results
+            )
+
+        return results
+
+    def verify(self, backup: Backup) -> VerificationResult:
+        try:
+            metadata = self.adapter.read_metadata(backup)
+            if self.mode == SIZE:
+                return self.verify_size(backup, metadata)
+            return self.verify_content(backup, metadata)
+        except Exception as error:
+            return VerificationResult(backup, False, self.mode, str(error) or type(error).__name__)
+
+    def verify_size(self, backup: Backup, metadata: dict) -> VerificationResult:
+
+        size = self.adapter.backup_size(backup)
+        expected = metadata.get('size')
+        if expected is None:
+            return VerificationResult(backup, True, 'exists')
+
+        if size != expected:
+            return VerificationResult(backup, False, 'size', 'size %s differs from recorded %s' % (size, expected))
+        return VerificationResult(backup, True, 'size')
+
+    def verify_content(self, backup: Backup, metadata: dict) -> VerificationResult:
+
+        if 'sha256' not in metadata:
+            with self.adapter.open_backup_reader(backup) as archive:
+                self.decompress(archive, backup.file_type)
+            return VerificationResult(backup, True, 'decompression')
+
+        digest = hashlib.sha256()
+        size = 0
+        with self.adapter.open_backup_reader(backup) as archive:
+            for data in iter(lambda: archive.read(self.buffer_size), b''):
+                digest.update(data)
+                size += len(data)
+
+        if size != metadata.get('size', size):
+            return VerificationResult(backup, False, 'sha256', 'size %s differs from recorded %s' % (size, metadata['size']))
+        if digest.hexdigest() != metadata['sha256']:
+            return VerificationResult(backup, False, 'sha256', 'checksum differs from recorded one')
+        return VerificationResult(backup, True, 'sha256')
+
+    def decompress(self, archive, file_type: str):
+        """ read archive to the end, codecs check their own integrity on the way """
+
+        stream = Codec.decompressed(archive)
+        if 'tar' in (file_type or '').split('.'):
+            with tarfile.open(fileobj=stream, mode='r|') as tar:
+                for member in tar:
+                    pass
+
+        while stream.read(self.buffer_size):
+            pass
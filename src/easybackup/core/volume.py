@@ -11,9 +11,15 @@ class Volume():
     def __str__(self):
         return "Volume({project}/{name})".format(name=self.name, project=self.project)
 
+    @property
+    def key(self):
+        return (self.project, self.name)
+
+    def filename_prefix(self) -> str:
+        """ prefix shared by every archive filename of the volume """
+        return Backup.format_name(volume=self.name, project=self.project, datetime='')
+
     def match(self, backups: List[Backup]) -> List[Backup]:
         """ return backup matching volume """
-        return list(filter(
-            lambda b: b.volume == self.name and b.project == self.project,
-            backups
-        ))
+        name, project = self.name, self.project
+        return [b for b in backups if b.volume == name and b.project == project]
@@ -10,6 +10,7 @@ class i18n():
         'class_init_unexpected_argument': 'Unexpected argument ({args}) initializing {base_cls}.',
         'repositories_should_be_a_dictionnary': 'repositories should be a dictionnary.',
         'time_do_not_match_time_format': '{string} do not match time format (dhms)',
+        'datetime_do_not_match_date_format': '{datetime} do not match backup datetime format (YYYYmmdd_HHMMSS)',
         'could_not_find_compatible_connector': 'Could not find compatible connector between {source} and {target}.',
         'tag_not_found': 'Could not find tag: {tag} matching class: {class_name}.',
         'missing_configuration_options': 'Missing configuration option {option} for class: {class_name}',
@@ -21,7 +22,40 @@ class i18n():
         'on_synchronize_repositories': 'Synchronizing {volume} backups from {source} to {target}, with {policy}. {count_tocopy} backup(s) to copy, and {count_todelete} backup(s) to delete.',
         'should_backup_volume_according_to_backup_policy': 'Should backup {volume} according to {policy}',
         'skip_backup_volume_according_to_backup_policy': 'Skip backup {volume} according to {policy}',
-        'on_cleanup_backup_with_policy': 'Clean-up {count_tocleanup} backup(s) for {volume} according to {policy}'
+        'on_cleanup_backup_with_policy': 'Clean-up {count_tocleanup} backup(s) for {volume} according to {policy}',
+        'on_reindex_repository': 'Catalog of {repository} rebuilt with {count} backup(s)',
+        'repository_not_found': 'Could not find repository {name}.',
+        'creator_cannot_stream': '{creator} used by {project}/{volume} can not stream backups.',
+        'compression_codec_not_found': 'Unknown compression codec {codec}.',
+        'compression_codec_unavailable': 'Compression codec {codec} requires a python package that is not installed.',
+        'docker_exec_failed': 'Command {command} exited with status {returncode} in container {container}: {stderr}',
+        'docker_api_error': 'Docker API {method} {path} failed with status {status}: {message}',
+        'backup_chain_broken': 'Backup {backup} cannot be restored, a backup it depends on is missing.',
+        'backup_mode_not_found': 'Unknown backup mode {mode}, expected full, incremental or differential.',
+        'dedup_chunk_corrupted': 'Chunk {chunk} of the dedup repository is corrupted.',
+        'dedup_chunk_missing': 'Chunk {chunk} of the dedup repository was removed while the archive was written.',
+        'source_unchanged': 'Source is unchanged since the previous backup ({fingerprint}).',
+        'backup_unchanged': 'Source of {volume} is unchanged since {backup}',
+        'verify_mode_not_found': 'Unknown verify mode {mode}, expected size or full.',
+        'on_verify_volume': 'Verified {count} backup(s) of {volume} on {repository}, {failures} failure(s)',
+        'on_backup_verify_failed': 'Backup {backup} on {repository} failed verification: {reason}',
+        'restorable_backup_not_found': 'No restorable backup of {volume} on {repository} at or before {datetime}.',
+        'creator_cannot_restore': '{creator} used by {volume} can not restore backups, restore them into a directory.',
+        'sql_backup_type_unsupported': 'Backup {backup} is a {file_type} archive, not an SQL dump, it can not be imported.',
+        'sql_backup_dump_not_found': 'Backup {backup} holds no .sql dump to import.',
+        'volume_not_found': 'Could not find volume {project}/{volume}.',
+        'on_backup_restored': 'Restored {backup} from {repository} into {destination}',
+        'gfs_counts_invalid': 'GFS cleanup policy counts must be positive integers, with at least one tier above 0 ({counts}).',
+        'cleanup_scope_not_found': 'Unknown cleanup scope {scope}, expected volume or repository.',
+        'quota_sizes_unknown': 'Quota cleanup policy needs backup sizes, the size of {count} backup(s) is unknown ({backups}).',
+        'on_transfer_budget_exhausted': 'Transfer budget to {target} exhausted after {spent} bytes, {count} backup(s) of {volume} postponed to the next run',
+        'cron_expression_invalid': 'Invalid cron expression {expression}, expected minute hour day month weekday.',
+        'cron_expression_never_fires': 'Cron expression {expression} never fires.',
+        'on_watch_sleep': 'Next backup is due at {due}, sleeping {duration}s',
+        'supervisor_failed': 'Backup of {volume} failed: {error}',
+        'backups_transfer_failed': '{count} backup(s) could not be copied to {target}: {errors}',
+        'on_backup_transferred': 'Copied {backup} from {source} to {target} in {duration:.1f}s',
+        'on_backup_transferred_with_size': 'Copied {backup} from {source} to {target} in {duration:.1f}s ({size} bytes, {throughput:.0f} bytes/s)'
     }
 
     @classmethod
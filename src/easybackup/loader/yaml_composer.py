@@ -1,11 +1,18 @@
 import re
+import time
 
 import yaml
 
 from easybackup.core.backup_supervisor import BackupSupervisor
 from easybackup.core.backup_creator import BackupCreator
 from easybackup.core.repository import Repository, RepositoryAdapter
+from easybackup.core.clock import Clock
+from easybackup.core.hook import Hook
 from easybackup.core.repository_link import RepositoryLink, Synchroniser
+from easybackup.core.restore import BackupRestorer
+from easybackup.core.runner import SupervisorRunner
+from easybackup.core.snapshot import ListingSnapshot
+from easybackup.core.verify import RepositoryVerifier
 from easybackup.core.volume import Volume
 from easybackup.policy.backup import BackupPolicy
 from easybackup.policy.cleanup import CleanupPolicy
@@ -27,6 +34,10 @@ class YamlComposerException(EasyBackupException):
 
 class YamlComposer():
 
+    # bounds of the sleep between two runs of `watch`, in seconds
+    watch_min_sleep = 60
+    watch_max_sleep = 3600
+
     def __init__(self, document):
         obj = (yaml.load(document, Loader=Loader) or {})
 
@@ -61,6 +72,137 @@ class YamlComposer():
 
         return self._composers
 
+    def run(self, jobs=1, repository_jobs=False, creator_jobs=False):
+        """
+        run every supervisor, sharing repository listings across the run,
+        and return the failing ones
+        """
+        runner = SupervisorRunner(
+            self.composers,
+            jobs=jobs,
+            repository_jobs=repository_jobs,
+            creator_jobs=creator_jobs
+        )
+        try:
+            with ListingSnapshot.run():
+                return runner.run()
+        finally:
+            self.close()
+
+    def watch(self, jobs=1, repository_jobs=False, creator_jobs=False):
+        """
+        run supervisors as their backups fall due until interrupted, sleeping in between.
+        Due times are computed after each run from that run's listings, supervisors
+        are only run again once due
+        """
+
+        dues = {}
+        try:
+            while True:
+                now = Clock.now_timestamp()
+                composers = [
+                    composer for composer in self.composers
+                    if not dues.get(composer) or dues[composer] <= now
+                ]
+
+                with ListingSnapshot.run():
+                    SupervisorRunner(
+                        composers,
+                        jobs=jobs,
+                        repository_jobs=repository_jobs,
+                        creator_jobs=creator_jobs
+                    ).run()
+                    for composer in composers:
+                        try:
+                            dues[composer] = composer.next_due()
+                        except Exception:
+                            dues[composer] = False
+
+                known = [due for due in dues.values() if due]
+                due = min(known) if known else now + self.watch_max_sleep
+                duration = min(max(due - Clock.now_timestamp(), self.watch_min_sleep), self.watch_max_sleep)
+
+                Hook.plays('on_watch_sleep', due=due, duration=duration)
+                time.sleep(duration)
+        finally:
+            self.close()
+
+    def close(self):
+        """ release adapters resources, like pooled connections """
+
+        repositories = list(self.repositories)
+        for composer in self.composers:
+            repositories.extend(composer.repositories)
+
+        for repository in repositories:
+            repository.adapter.close()
+
+    def reindex(self):
+        """ rebuild the catalog of every repository used by the configuration """
+
+        try:
+            for repository in self.used_repositories():
+                repository.reindex()
+        finally:
+            self.close()
+
+    def verify(self, mode='full', jobs=4):
+        """ check archives of every repository used by the configuration, return the failures """
+
+        failures = []
+        try:
+            for repository in self.used_repositories():
+                results = RepositoryVerifier(repository, mode=mode, workers=jobs).run()
+                failures.extend(result for result in results if not result.ok)
+        finally:
+            self.close()
+
+        return failures
+
+    def restore(self, project, volume, datetime=False, destination=False, repository=False, prefetch=8):
+        """
+        restore the last backup of project/volume taken at or before datetime,
+        from the named repository or the creator's one, into destination
+        or, without destination, back into the creator's source
+        """
+
+        composer = self.composer_by_volume(project, volume)
+        if not composer:
+            raise YamlComposerException('volume_not_found', project=project, volume=volume)
+
+        source = composer.creator.target_repository
+        if repository:
+            source = self.repository_by_name(repository)
+            if not source:
+                raise YamlComposerException('repository_not_found', name=repository)
+
+        try:
+            restorer = BackupRestorer(source, Volume(name=volume, project=project), prefetch=prefetch)
+            backup = restorer.select(datetime)
+            if destination:
+                return restorer.restore(backup, destination)
+            return [restorer.restore_into(backup, composer.creator)]
+        finally:
+            self.close()
+
+    def composer_by_volume(self, project, volume):
+        for composer in self.composers:
+            if composer.project == project and composer.volume == volume:
+                return composer
+        return False
+
+    def used_repositories(self):
+        """ return volumes and named repositories, once per storage """
+
+        repositories = {}
+        for composer in self.composers:
+            for repository in composer.repositories:
+                repositories.setdefault(repository.adapter.identity, repository)
+        for repository in self.repositories:
+            repositories.setdefault(repository.adapter.identity, repository)
+
+        return list(repositories.values())
+
     def check_version_number(self):
         version = self.obj.get('version')
         if (not version) or (type(version) is not str) or (not is_number_version(version)):
@@ -88,14 +230,24 @@ class YamlComposer():
         if conf['cleanup_policy']:
             cleanup_policy = self.build_object(CleanupPolicy, conf['cleanup_policy'], type_tag_name='policy')
 
+        stream_repository = False
+        if conf['stream_to']:
+            stream_repository = self.repository_by_name(conf['stream_to'])
+            if not stream_repository:
+                raise YamlComposerException('repository_not_found', name=conf['stream_to'])
+            if not creator.streamable:
+                raise YamlComposerException(
+                    'creator_cannot_stream',
+                    creator=str(creator),
+                    project=conf.get('project'),
+                    volume=conf.get('volume')
+                )
+
         synchronizers = []
         if conf['synchronizers']:
             for name_repo, sync_conf in conf['synchronizers'].items():
 
-                repository = False
-                for rep in self.repositories:
-                    if rep.name == name_repo:
-                        repository = rep
+                repository = self.repository_by_name(name_repo)
 
                 policy = False
                 if sync_conf.get('policy'):
@@ -110,7 +262,11 @@ class YamlComposer():
                     target=target_adapter.type_tag
                 )
 
-                link = link_self(source=source_adapter, target=target_adapter)
+                link = link_self(
+                    source=source_adapter,
+                    target=target_adapter,
+                    workers=sync_conf.get('workers', 1)
+                )
                 synchronizers.append(Synchroniser(link=link, sync_policy=policy))
 
         return BackupSupervisor(
@@ -119,9 +275,18 @@ class YamlComposer():
             creator=creator,
             backup_policy=backup_policy,
             cleanup_policy=cleanup_policy,
-            synchronizers=synchronizers
+            synchronizers=synchronizers,
+            stream_repository=stream_repository,
+            stream_tee=conf['stream_tee'],
+            skip_unchanged=conf['skip_unchanged']
         )
 
+    def repository_by_name(self, name):
+        for repository in self.repositories:
+            if repository.name == name:
+                return repository
+        return False
+
     @property
     def volumes(self):
         projects = self.obj.get('projects')
@@ -145,7 +310,10 @@ class YamlComposer():
                     'creator': volume_conf,
                     'backup_policy': backup_policy,
                     'cleanup_policy': cleanup_policy,
-                    'synchronizers': dispatchers
+                    'synchronizers': dispatchers,
+                    'stream_to': volume_conf.get('stream_to', False),
+                    'stream_tee': volume_conf.get('stream_tee', False),
+                    'skip_unchanged': volume_conf.get('skip_unchanged', False)
                 }
                 yield volume
 
@@ -209,7 +377,8 @@ class YamlComposer():
 
     @classmethod
     def get_setup_kwargs(cls, conf):
-        keywords = ['type', 'backup_policy', 'cleanup_policy', 'dispatchers', 'policy']
+        keywords = ['type', 'backup_policy', 'cleanup_policy', 'dispatchers', 'policy', 'workers',
+                    'stream_to', 'stream_tee', 'skip_unchanged']
         return {key: value for key, value in conf.items() if key not in keywords}
 
     @classmethod
@@ -1,3 +1,7 @@
+import threading
+from contextlib import contextmanager
+
+from easybackup.core.clock import Clock
 from easybackup.core.hook import Hook
 from easybackup.core.lexique import human_dt
 from .i18n import i18n
@@ -7,6 +11,9 @@ class Logger():
 
     loggers = []
 
+    _buffer = threading.local()
+    _lock = threading.Lock()
+
     # see level here https://docs.python.org/3/library/logging.html#logging-levels
     map_lvl = {
         'CRITICAL': 50,
@@ -33,7 +40,26 @@ class Logger():
             if type(lvl) is str:
                 lvl = cls.map_lvl.get(lvl)
 
-            logger.log(lvl, message)
+            records = getattr(cls._buffer, 'records', False)
+            if records is not False:
+                records.append((logger, lvl, message))
+            else:
+                with cls._lock:
+                    logger.log(lvl, message)
+
+    @classmethod
+    @contextmanager
+    def buffered(cls):
+        """ hold back the current thread's logs and emit them in one block """
+
+        cls._buffer.records = []
+        try:
+            yield
+        finally:
+            records, cls._buffer.records = cls._buffer.records, False
+            with cls._lock:
+                for logger, lvl, message in records:
+                    logger.log(lvl, message)
 
     def log(self, lvl, message):
         raise NotImplementedError
@@ -55,7 +81,7 @@ class TextualLogger(Logger):
         if len(backups) == 0:
             return i18n.t('repository_fetch_backups_empty_results', repository=str(repository), volume=str(volume))
 
-        lastone = sorted(backups, key=lambda b: b.datetime)[-1]
+        lastone = max(backups, key=lambda b: b.epoch)
 
         return i18n.t(
             'repository_fetch_backups_results',
@@ -101,6 +127,63 @@ class TextualLogger(Logger):
             policy=policy
         )
 
+    def on_backup_transferred_message(self, backup, source, target, size, duration):
+
+        if not size:
+            return i18n.t(
+                'on_backup_transferred',
+                backup=backup.formated_name,
+                source=str(source),
+                target=str(target),
+                duration=duration
+            )
+
+        return i18n.t(
+            'on_backup_transferred_with_size',
+            backup=backup.formated_name,
+            source=str(source),
+            target=str(target),
+            duration=duration,
+            size=size,
+            throughput=size / max(duration, 0.001)
+        )
+
+    def on_transfer_budget_exhausted_message(self, volume, target, postponed, budget):
+        return i18n.t(
+            'on_transfer_budget_exhausted',
+            volume=str(volume),
+            target=str(target),
+            spent=budget.spent,
+            count=len(postponed)
+        )
+
+    def on_watch_sleep_message(self, due, duration):
+        return i18n.t('on_watch_sleep', due=human_dt(Clock.from_timestamp(due)), duration=duration)
+
+    def on_supervisor_failure_message(self, volume, error):
+        return i18n.t('supervisor_failed', volume=str(volume), error=str(error))
+
+    def on_reindex_repository_message(self, repository, count):
+        return i18n.t('on_reindex_repository', repository=str(repository), count=count)
+
+    def on_verify_volume_message(self, volume, repository, results):
+        return i18n.t(
+            'on_verify_volume',
+            volume=str(volume),
+            repository=str(repository),
+            count=len(results),
+            failures=len([result for result in results if not result.ok])
+        )
+
+    def on_backup_verify_failed_message(self, backup, repository, reason):
+        return i18n.t('on_backup_verify_failed', backup=backup.formated_name, repository=str(repository), reason=reason)
+
+    def on_backup_restored_message(self, backup, repository, destination):
+        return i18n.t('on_backup_restored', backup=backup.formated_name, repository=str(repository), destination=destination)
+
+    def on_backup_unchanged_message(self, volume, backup, fingerprint):
+        return i18n.t('backup_unchanged', volume=str(volume), backup=backup.formated_name)
+
 
 @Hook.register('before_build_backup')
 def hook_before_build_backup(*args, **kwargs):
@@ -135,3 +218,48 @@ def hook_on_checking_volume_backup_policy(*args, **kwargs):
 @Hook.register('on_cleanup_backups')
 def hook_on_cleanup_backups(*args, **kwargs):
     Logger.log_event('INFO', 'on_cleanup_backups', *args, **kwargs)
+
+
+@Hook.register('on_reindex_repository')
+def hook_on_reindex_repository(*args, **kwargs):
+    Logger.log_event('INFO', 'on_reindex_repository', *args, **kwargs)
+
+
+@Hook.register('on_backup_unchanged')
+def hook_on_backup_unchanged(*args, **kwargs):
+    Logger.log_event('INFO', 'on_backup_unchanged', *args, **kwargs)
+
+
+@Hook.register('on_verify_volume')
+def hook_on_verify_volume(*args, **kwargs):
+    Logger.log_event('INFO', 'on_verify_volume', *args, **kwargs)
+
+
+@Hook.register('on_backup_verify_failed')
+def hook_on_backup_verify_failed(*args, **kwargs):
+    Logger.log_event('ERROR', 'on_backup_verify_failed', *args, **kwargs)
+
+
+@Hook.register('on_backup_restored')
+def hook_on_backup_restored(*args, **kwargs):
+    Logger.log_event('INFO', 'on_backup_restored', *args, **kwargs)
+
+
+@Hook.register('on_transfer_budget_exhausted')
+def hook_on_transfer_budget_exhausted(*args, **kwargs):
+    Logger.log_event('WARNING', 'on_transfer_budget_exhausted', *args, **kwargs)
+
+
+@Hook.register('on_watch_sleep')
+def hook_on_watch_sleep(*args, **kwargs):
+    Logger.log_event('INFO', 'on_watch_sleep', *args, **kwargs)
+
+
+@Hook.register('on_supervisor_failure')
+def hook_on_supervisor_failure(*args, **kwargs):
+    Logger.log_event('ERROR', 'on_supervisor_failure', *args, **kwargs)
+
+
+@Hook.register('on_backup_transferred')
+def hook_on_backup_transferred(*args, **kwargs):
+    Logger.log_event('INFO', 'on_backup_transferred', *args, **kwargs)
@@ -1,7 +1,9 @@
 from typing import List
 
 from ..core.backup import Backup
+from ..core.chain import BackupChain
 from ..core.clock import Clock
+from ..core.cron import CronExpression
 from ..utils.taggable import Taggable
 
 
@@ -13,6 +15,10 @@ class BackupPolicy(Taggable):
     def should_backup(self, backups: List[Backup]) -> bool:
         """ Determine if a new backup should be done according to existing backups """
 
+    def next_due(self, backups: List[Backup]) -> int:
+        """ epoch of the next backup according to existing backups, False when unknown """
+        return False
+
 
 class TimeIntervalBackupPolicy(BackupPolicy):
 
@@ -27,15 +33,62 @@ class TimeIntervalBackupPolicy(BackupPolicy):
 
     def should_backup(self, backups: List[Backup]) -> bool:
 
+        # backups whose base is missing cannot be restored, they do not count
+        backups = BackupChain.restorable(backups)
         if not backups:
             return True
 
-        ordered = list(sorted(
-            backups,
-            key=lambda backup: backup.datetime
-        ))
-
-        lastdatetime = ordered[-1].datetime
-        delta_without_backup = Clock.delta_from(lastdatetime)
+        last = max(backups, key=lambda backup: backup.epoch)
+        delta_without_backup = Clock.now_timestamp() - last.epoch
 
         return delta_without_backup >= self.interval
+
+    def next_due(self, backups: List[Backup]) -> int:
+        backups = BackupChain.restorable(backups)
+        if not backups:
+            return Clock.now_timestamp()
+        return max(backup.epoch for backup in backups) + self.interval
+
+
+class CronBackupPolicy(BackupPolicy):
+
+    type_tag = 'cron'
+
+    """
+    Backup at the times of a cron `schedule`, like `30 2 * * *`.
+
+    The next due time is computed from the last restorable backup, a
+    schedule missed while nothing was running is caught up at once or,
+    with a `window` in seconds, only until `window` after the missed time.
+    """
+
+    def __init__(self, schedule: str, window: int = False):
+        self._cron = CronExpression(schedule)
+        self._window = window
+
+    def __str__(self):
+        return "[%s backup policy (%s)]" % (self.type_tag, self._cron)
+
+    @property
+    def schedule(self) -> str:
+        return self._cron.expression
+
+    @property
+    def window(self) -> int:
+        return self._window
+
+    def should_backup(self, backups: List[Backup]) -> bool:
+        return self.next_due(backups) <= Clock.now_timestamp()
+
+    def next_due(self, backups: List[Backup]) -> int:
+
+        now = Clock.now_timestamp()
+        backups = BackupChain.restorable(backups)
+        if not backups:
+            return now
+
+        start = max(backup.epoch for backup in backups)
+        if self._window:
+            # fire times older than the window are skipped
+            start = max(start, now - self._window - 1)
+        return self._cron.next_after(start)
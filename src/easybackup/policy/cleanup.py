@@ -1,12 +1,25 @@
+import datetime
 from typing import List
 
 from ..core.backup import Backup
+from ..core.chain import BackupChain
 from ..core.clock import Clock
+from ..core.exceptions import EasyBackupException
 from ..utils.taggable import Taggable
 
 
+VOLUME_SCOPE = 'volume'
+REPOSITORY_SCOPE = 'repository'
+
+
 class CleanupPolicy(Taggable):
 
+    # backups given to the policy, the volume's ones or the whole repository's ones
+    scope = VOLUME_SCOPE
+
+    # policies reading backup sizes get them read one by one when the listing has none
+    needs_sizes = False
+
     def __str__(self):
         return "[%s cleanup policy]" % (self.type_tag or "")
 
@@ -39,21 +52,16 @@ class LifetimeCleanupPolicy(CleanupPolicy):
         self._minimum = minimum
 
     def filter_backups_to_cleanup(self, backups: List[Backup]) -> List[Backup]:
-        tokeep = self.filter_backups_to_keep(backups)
-        return list(filter(
-            lambda backup: backup not in tokeep,
-            backups
-        ))
+        tokeep = set(self.filter_backups_to_keep(backups))
+        return [backup for backup in backups if backup not in tokeep]
 
     def filter_backups_to_keep(self, backups: List[Backup]) -> List[Backup]:
 
         minimal = self.minimal_backups(backups)
         valids = self.filter_valid_backups(backups)
 
-        if len(valids) > len(minimal):
-            return valids
-        else:
-            return minimal
+        tokeep = valids if len(valids) > len(minimal) else minimal
+        return BackupChain.with_dependencies(backups, tokeep)
 
     @property
     def max_age(self) -> int:
@@ -64,11 +72,8 @@ class LifetimeCleanupPolicy(CleanupPolicy):
         return self._minimum
 
     def filter_valid_backups(self, backups: List[Backup]) -> List[Backup]:
-        valids = list(filter(
-            lambda backup: not self.outdated(backup.datetime),
-            backups
-        ))
-        return valids
+        oldest = Clock.now_timestamp() - self.max_age
+        return [backup for backup in backups if backup.epoch >= oldest]
 
     def minimal_backups(self, backups: List[Backup]) -> List[Backup]:
         if self._minimum <= 0:
@@ -76,10 +81,175 @@ class LifetimeCleanupPolicy(CleanupPolicy):
         else:
             backups = sorted(
                 backups,
-                key=lambda backup: backup.datetime
+                key=lambda backup: backup.epoch
             )
             return backups[-self.minimum:]
 
     def outdated(self, date: str) -> bool:
         backup_age = Clock.delta_from(date)
         return backup_age > self.max_age
+
+
+class GrandfatherFatherSonCleanupPolicy(CleanupPolicy):
+
+    """
+    Keep the newest backup of each of the last `hourly` hours, `daily` days,
+    `weekly` weeks, `monthly` months and `yearly` years holding backups,
+    and at least the last `minimum` backups of each volume.
+
+    Backups are sorted once, newest first, and bucketed on their integer
+    epoch, a backup is kept by every tier whose period it opens. Weeks start
+    on monday, months and years are derived from the day number, once per day.
+    """
+
+    type_tag = 'gfs'
+
+    tiers = ('hourly', 'daily', 'weekly', 'monthly', 'yearly')
+
+    def __init__(
+        self,
+        hourly: int = 0,
+        daily: int = 0,
+        weekly: int = 0,
+        monthly: int = 0,
+        yearly: int = 0,
+        minimum: int = 1
+    ):
+        counts = (hourly, daily, weekly, monthly, yearly)
+        if any(type(count) is not int or count < 0 for count in counts + (minimum,)) or not any(counts):
+            raise EasyBackupException(
+                'gfs_counts_invalid',
+                counts=', '.join('%s=%s' % item for item in zip(self.tiers + ('minimum',), counts + (minimum,)))
+            )
+
+        self._counts = dict(zip(self.tiers, counts))
+        self._minimum = minimum
+
+    @property
+    def minimum(self) -> int:
+        return self._minimum
+
+    def __str__(self):
+        counts = ', '.join('%s=%s' % (tier, self._counts[tier]) for tier in self.tiers if self._counts[tier])
+        return "[%s cleanup policy (%s)]" % (self.type_tag, counts)
+
+    def filter_backups_to_cleanup(self, backups: List[Backup]) -> List[Backup]:
+        tokeep = set(self.filter_backups_to_keep(backups))
+        return [backup for backup in backups if backup not in tokeep]
+
+    def filter_backups_to_keep(self, backups: List[Backup]) -> List[Backup]:
+
+        volumes = {}
+        for backup in sorted(backups, key=lambda backup: backup.epoch, reverse=True):
+            volumes.setdefault((backup.project, backup.volume), []).append(backup)
+
+        tokeep = []
+        for volume_backups in volumes.values():
+            # the last `minimum` backups are kept whatever their periods
+            tokeep.extend(volume_backups[:self._minimum])
+            tokeep.extend(self.bucket(volume_backups))
+
+        return BackupChain.with_dependencies(backups, tokeep)
+
+    def bucket(self, backups: List[Backup]) -> List[Backup]:
+        """ return backups opening a period of a tier, backups are sorted newest first """
+
+        remaining = [self._counts[tier] for tier in self.tiers]
+        last_periods = [None] * len(self.tiers)
+        months = {}
+
+        tokeep = []
+        for backup in backups:
+            if not any(remaining):
+                break
+
+            hour = backup.epoch // 3600
+            day = hour // 24
+            if day not in months:
+                date = EPOCH_DATE + datetime.timedelta(days=day)
+                months[day] = date.year * 12 + date.month - 1
+            month = months[day]
+
+            periods = (hour, day, (day + 3) // 7, month, month // 12)
+
+            kept = False
+            for tier, period in enumerate(periods):
+                if remaining[tier] and period != last_periods[tier]:
+                    last_periods[tier] = period
+                    remaining[tier] -= 1
+                    kept = True
+
+            if kept:
+                tokeep.append(backup)
+
+        return tokeep
+
+
+class QuotaCleanupPolicy(CleanupPolicy):
+
+    """
+    Delete the oldest backups until the volume, or the whole repository
+    with `scope: repository`, fits in `max_bytes`. The last `minimum` backups
+    of each volume are always kept.
+
+    Sizes come from the repository listing or its catalog, in a single
+    pass over the backups sorted newest first. Sizes missing from the
+    listing are read one by one by the repository, a backup whose size
+    is still unknown raises instead of counting for nothing.
+    """
+
+    type_tag = 'quota'
+    needs_sizes = True
+
+    def __init__(self, max_bytes: int, minimum: int = 1, scope: str = VOLUME_SCOPE):
+        if scope not in (VOLUME_SCOPE, REPOSITORY_SCOPE):
+            raise EasyBackupException('cleanup_scope_not_found', scope=scope)
+
+        self._max_bytes = max_bytes
+        self._minimum = minimum
+        self.scope = scope
+
+    def __str__(self):
+        return "[%s cleanup policy (%s bytes per %s)]" % (self.type_tag, self._max_bytes, self.scope)
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @property
+    def minimum(self) -> int:
+        return self._minimum
+
+    def filter_backups_to_cleanup(self, backups: List[Backup]) -> List[Backup]:
+        tokeep = set(self.filter_backups_to_keep(backups))
+        return [backup for backup in backups if backup not in tokeep]
+
+    def filter_backups_to_keep(self, backups: List[Backup]) -> List[Backup]:
+
+        unsized = [backup.formated_name for backup in backups if backup.size is None]
+        if unsized:
+            raise EasyBackupException('quota_sizes_unknown', count=len(unsized), backups=', '.join(unsized))
+
+        total = 0
+        full = False
+        counts = {}
+        tokeep = []
+        for backup in sorted(backups, key=lambda backup: backup.epoch, reverse=True):
+            volume = (backup.project, backup.volume)
+            size = backup.size
+
+            if not full and total + size > self._max_bytes:
+                # older backups are deleted even if they would fit
+                full = True
+
+            if full and counts.get(volume, 0) >= self._minimum:
+                continue
+
+            counts[volume] = counts.get(volume, 0) + 1
+            total += size
+            tokeep.append(backup)
+
+        return BackupChain.with_dependencies(backups, tokeep)
+
+
+EPOCH_DATE = datetime.date(1970, 1, 1)
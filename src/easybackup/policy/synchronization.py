@@ -1,9 +1,97 @@
+import threading
+import time
+from typing import List
+
+from ..core.backup import Backup
 from ..core.repository import Repository
 from ..core.clock import Clock
 from ..core.volume import Volume
 from ..utils.taggable import Taggable
 
 
+class BackupDiff():
+
+    """
+    Compare a source and a target listing once.
+
+    `missing` backups are only on the source, `extra` backups only on
+    the target and `common` backups on both. Every list, as well as
+    `source` and `target`, is ordered from the oldest to the most
+    recent backup.
+    """
+
+    def __init__(self, source_backups: List[Backup], target_backups: List[Backup]):
+
+        self.source = sorted(set(source_backups), key=self.order)
+        self.target = sorted(set(target_backups), key=self.order)
+        self.missing = []
+        self.extra = []
+        self.common = []
+
+        source, target = self.source, self.target
+        i, j = 0, 0
+        while i < len(source) and j < len(target):
+            source_key, target_key = self.order(source[i]), self.order(target[j])
+            if source_key == target_key:
+                self.common.append(source[i])
+                i += 1
+                j += 1
+            elif source_key < target_key:
+                self.missing.append(source[i])
+                i += 1
+            else:
+                self.extra.append(target[j])
+                j += 1
+
+        self.missing.extend(source[i:])
+        self.extra.extend(target[j:])
+
+    @staticmethod
+    def order(backup: Backup):
+        return (backup.epoch, backup.formated_name)
+
+
+class TransferBudget():
+
+    """
+    Bytes and seconds a synchronization run may spend.
+
+    Transfers are admitted in the policy's order until the budget is
+    exhausted, transfers in flight are completed and the following ones
+    are left to the next run. The first transfer of a run is always
+    admitted, so a backup larger than the budget does not block the others.
+    """
+
+    def __init__(self, max_bytes: int = False, max_duration: int = False):
+        self.max_bytes = max_bytes
+        self.deadline = time.monotonic() + max_duration if max_duration else False
+        self.spent = 0
+        self.admitted = 0
+        self.exhausted = False
+        self._lock = threading.Lock()
+
+    def admit(self, size: int = None) -> bool:
+        """ reserve size bytes for a transfer, False once the budget is exhausted """
+
+        with self._lock:
+            if not self.exhausted and self.admitted:
+                over_time = self.deadline and time.monotonic() >= self.deadline
+                over_size = self.max_bytes and self.spent + (size or 0) > self.max_bytes
+                self.exhausted = bool(over_time or over_size)
+
+            if self.exhausted:
+                return False
+
+            self.admitted += 1
+            self.spent += size or 0
+            return True
+
+    def spend(self, size: int):
+        """ account bytes of a transfer admitted without a known size """
+        with self._lock:
+            self.spent += size or 0
+
+
 class SynchronizationPolicy(Taggable):
 
     type_tag = False
@@ -18,12 +106,34 @@ class SynchronizationPolicy(Taggable):
     def setup(self, **conf):
         pass
 
+    def diff(self, source: Repository, target: Repository) -> BackupDiff:
+        """ fetch both repositories once and compare them """
+        return BackupDiff(
+            source.fetch(volume=self.volume),
+            target.fetch(volume=self.volume)
+        )
+
+    def plan(self, source: Repository, target: Repository):
+        """ Determine backups to copy and to delete from a single diff """
+        diff = self.diff(source, target)
+        return self.copies(diff), self.deletes(diff)
+
     def to_copy(self, source: Repository, target: Repository):
         """ Determine backups that should be copy from source to target """
-        raise NotImplementedError
+        return self.copies(self.diff(source, target))
 
     def to_delete(self, source: Repository, target: Repository):
         """ Determine backups that should be delete on target """
+        return self.deletes(self.diff(source, target))
+
+    def budget(self) -> TransferBudget:
+        """ budget of a synchronization run, False when unlimited """
+        return False
+
+    def copies(self, diff: BackupDiff) -> List[Backup]:
+        raise NotImplementedError
+
+    def deletes(self, diff: BackupDiff) -> List[Backup]:
         raise NotImplementedError
 
 
@@ -36,26 +146,29 @@ class CopyPastePolicy(SynchronizationPolicy):
     to the target repository.
     """
 
-    def to_copy(self, source: Repository, target: Repository):
-        source_backups = source.fetch(volume=self.volume)
-        target_backups = target.fetch(volume=self.volume)
+    def copies(self, diff):
+        return diff.missing
 
-        return list(filter(
-            lambda backup: backup.formated_name not in [b.formated_name for b in target_backups],
-            source_backups
-        ))
-
-    def to_delete(self, source: Repository, target: Repository):
+    def deletes(self, diff):
         return []
 
 
 class ClonePolicy(SynchronizationPolicy):
 
+    type_tag = 'clone'
+
     """
     It Guarantee that target repository is a clone
-    of source repository
+    of source repository. Missing backups are copied from
+    the most recent one, so that a time-boxed run transfers
+    the most valuable backups first, extra ones are deleted.
     """
-    pass
+
+    def copies(self, diff):
+        return diff.missing[::-1]
+
+    def deletes(self, diff):
+        return diff.extra
 
 
 class SynchronizeRecentPolicy(SynchronizationPolicy):
@@ -70,36 +183,38 @@ class SynchronizeRecentPolicy(SynchronizationPolicy):
     def setup(self, minimum: int):
         self.minimum = minimum
 
-    def to_copy(self, source, target):
-
-        source_backups = self.order_backups(source.fetch(volume=self.volume))
-        target_backups = target.fetch(volume=self.volume)
-        notsync = self.notsync(source_backups, target_backups)
+    def copies(self, diff):
+        return diff.missing[-self.minimum:]
 
-        return notsync[-self.minimum:]
+    def deletes(self, diff):
+        tocopy = self.copies(diff)
 
-    def to_delete(self, source, target):
-        target_backups = self.order_backups(target.fetch(volume=self.volume))
-        target_backups = sorted(
-            target_backups,
-            key=lambda backup: backup.datetime
-        )
-        tocopy = self.to_copy(source, target)
-
-        overflow = (len(target_backups) + len(tocopy)) - self.minimum
+        overflow = (len(diff.target) + len(tocopy)) - self.minimum
         if overflow > 0:
-            return target_backups[:overflow]
+            return diff.target[:overflow]
         else:
             return []
 
-    def notsync(self, source_backups, target_backups):
-        return list(filter(
-            lambda backup: backup.formated_name not in [b.formated_name for b in target_backups],
-            source_backups
-        ))
 
-    def order_backups(self, backups):
-        return sorted(
-            backups,
-            key=lambda backup: backup.datetime
-        )
+class BudgetSynchronizationPolicy(SynchronizationPolicy):
+
+    type_tag = 'budget'
+
+    """
+    Copy missing backups within a byte and/or time budget per run,
+    the most recent first. Backups left over are copied by the next
+    runs, nothing is deleted on the target.
+    """
+
+    def setup(self, max_bytes: int = False, max_duration: int = False):
+        self.max_bytes = max_bytes
+        self.max_duration = max_duration
+
+    def budget(self):
+        return TransferBudget(max_bytes=self.max_bytes, max_duration=self.max_duration)
+
+    def copies(self, diff):
+        return sorted(diff.missing, key=lambda backup: backup.epoch, reverse=True)
+
+    def deletes(self, diff):
+        return []
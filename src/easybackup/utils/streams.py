@@ -0,0 +1,152 @@
+import hashlib
+import io
+import queue
+import threading
+
+
+class TeeWriter():
+
+    """ Binary writer duplicating every write to several file objects """
+
+    def __init__(self, *fileobjs):
+        self._fileobjs = fileobjs
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        for fileobj in self._fileobjs:
+            fileobj.write(data)
+        return len(data)
+
+    def flush(self):
+        for fileobj in self._fileobjs:
+            fileobj.flush()
+
+
+class NonClosingWriter():
+
+    """ Binary writer leaving the wrapped file object open when closed """
+
+    def __init__(self, fileobj):
+        self._fileobj = fileobj
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self._fileobj.write(data)
+
+    def flush(self):
+        self._fileobj.flush()
+
+    def close(self):
+        self.flush()
+
+
+class HashingWriter():
+
+    """ Binary writer hashing and counting the bytes written through it """
+
+    def __init__(self, fileobj=False, algorithm='sha256'):
+        self._fileobj = fileobj
+        self._hash = hashlib.new(algorithm)
+        self.size = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._hash.update(data)
+        self.size += len(data)
+        if self._fileobj:
+            self._fileobj.write(data)
+        return len(data)
+
+    def flush(self):
+        if self._fileobj:
+            self._fileobj.flush()
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+
+class PrefetchReader(io.RawIOBase):
+
+    """
+    Binary reader filled by a thread reading `fileobj` ahead.
+
+    Up to `depth` blocks are read in advance, so the producer (a network
+    download, a decompressor) runs while the consumer processes previous
+    blocks. Errors of the producer are raised to the consumer. Closing
+    the reader stops the thread, the wrapped file object is left open.
+    """
+
+    def __init__(self, fileobj, block_size=1024 * 1024, depth=8):
+        self._fileobj = fileobj
+        self._block_size = block_size
+        self._queue = queue.Queue(maxsize=max(1, depth))
+        self._stopped = threading.Event()
+        self._pending = memoryview(b'')
+        self._eof = False
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+
+        while not self._pending:
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if isinstance(item, BaseException):
+                self._eof = True
+                raise item
+            if not item:
+                self._eof = True
+                return 0
+            self._pending = memoryview(item)
+
+        count = min(len(buffer), len(self._pending))
+        buffer[:count] = self._pending[:count]
+        self._pending = self._pending[count:]
+        return count
+
+    def close(self):
+        if not self.closed:
+            self._stopped.set()
+            self._drain()
+            self._thread.join()
+        super().close()
+
+    def _produce(self):
+        try:
+            while not self._stopped.is_set():
+                data = self._fileobj.read(self._block_size)
+                self._put(data)
+                if not data:
+                    return
+        except BaseException as error:
+            self._put(error)
+
+    def _put(self, item):
+        while not self._stopped.is_set():
+            try:
+                return self._queue.put(item, timeout=0.1)
+            except queue.Full:
+                pass
+
+    def _drain(self):
+        try:
+            while True:
+                self._queue.get_nowait()
+        except queue.Empty:
+            pass
@@ -0,0 +1,151 @@
+import os
+import random
+
+import pytest
+
+from easybackup.adapters.dedup import DedupRepositoryAdapter, CdcChunker
+from easybackup.adapters.local import LocalRepositoryAdapter
+from easybackup.core.backup import Backup
+from easybackup.core.repository_link import RepositoryLink
+from easybackup.core.volume import Volume
+
+from .utils import temp_directory
+
+
+def archive(seed, size=256*1024):
+    return random.Random(seed).randbytes(size)
+
+
+def backup(datetime, volume='db'):
+    return Backup(project='myproject', volume=volume, datetime=datetime, file_type='tar')
+
+
+def write(adapter, backup, data):
+    with adapter.open_backup_writer(backup) as writer:
+        for start in range(0, len(data), 10000):
+            writer.write(data[start:start+10000])
+
+
+def read(adapter, backup):
+    with adapter.open_backup_reader(backup) as reader:
+        return reader.read()
+
+
+def chunk_files(directory):
+    return {name for _, _, names in os.walk(os.path.join(directory, 'chunks')) for name in names if '.' not in name}
+
+
+@pytest.fixture
+def adapter(temp_directory):
+    return DedupRepositoryAdapter(directory=temp_directory('dedup'), chunk_size=4096)
+
+
+def test_chunker_cut_points_are_content_defined():
+
+    chunker = CdcChunker(4096)
+    data = archive(1)
+
+    def cuts(data):
+        offsets, offset = set(), 0
+        while offset < len(data):
+            offset += chunker.cut(data[offset:offset+chunker.max_size])
+            offsets.add(offset)
+        return offsets
+
+    original = cuts(data)
+    shifted = {offset - 10 for offset in cuts(b'X'*10 + data)}
+
+    assert chunker.min_size <= chunker.cut(data) <= chunker.max_size
+    assert len(original & shifted) > len(original) * 0.9
+
+
+def test_similar_archives_share_chunks(temp_directory, adapter):
+
+    first = archive(1)
+    second = b'new header' + first[:100000] + archive(2, 5000) + first[100000:]
+
+    write(adapter, backup('20200420_130000'), first)
+    chunks = len(chunk_files(temp_directory('dedup')))
+    write(adapter, backup('20200421_130000'), second)
+    new_chunks = len(chunk_files(temp_directory('dedup'))) - chunks
+
+    assert [b.datetime for b in adapter.fetch_backups()] == ['20200420_130000', '20200421_130000']
+    assert adapter.fetch_backups(volume=Volume('app', 'myproject')) == []
+    assert new_chunks < chunks * 0.2
+    assert read(adapter, backup('20200420_130000')) == first
+    assert read(adapter, backup('20200421_130000')) == second
+
+
+def test_cleanup_collects_unreferenced_chunks(temp_directory, adapter):
+
+    first, second = archive(1), archive(2)
+    write(adapter, backup('20200420_130000'), first)
+    write(adapter, backup('20200421_130000'), first + second)
+    write(adapter, backup('20200422_130000'), second)
+
+    adapter.cleanup_backups([backup('20200420_130000'), backup('20200421_130000')])
+
+    assert adapter.fetch_backups() == [backup('20200422_130000')]
+    assert read(adapter, backup('20200422_130000')) == second
+
+    adapter.cleanup_backups([backup('20200422_130000')])
+    assert chunk_files(temp_directory('dedup')) == set()
+
+
+def test_failed_write_leaves_no_backup(temp_directory, adapter):
+
+    with pytest.raises(RuntimeError):
+        with adapter.open_backup_writer(backup('20200420_130000')) as writer:
+            writer.write(archive(1))
+            raise RuntimeError('source vanished')
+
+    assert adapter.fetch_backups() == []
+    assert chunk_files(temp_directory('dedup')) == set()
+
+
+def test_cleanup_only_removes_chunks_it_dereferences(temp_directory, adapter):
+
+    first, second = archive(1), archive(2)
+    write(adapter, backup('20200420_130000'), first)
+    write(adapter, backup('20200421_130000'), first + second)
+    assert adapter.store.read_refcounts()[adapter.read_recipe(adapter.backup_to_filename(backup('20200420_130000')))['chunks'][0][0]] == 2
+
+    # a chunk left by a crashed process is not referenced by any recipe
+    stray = 'f' * 64
+    adapter.store.put(stray, b'stray', 0)
+    adapter.store.release([stray])
+
+    adapter.cleanup_backups([])
+    adapter.cleanup_backups([backup('20200420_130000')])
+    assert stray in chunk_files(temp_directory('dedup'))
+    assert read(adapter, backup('20200421_130000')) == first + second
+
+    assert adapter.collect_garbage() == 1
+    assert stray not in chunk_files(temp_directory('dedup'))
+
+
+def test_missing_reference_counts_are_rebuilt_from_recipes(temp_directory, adapter):
+
+    first, second = archive(1), archive(2)
+    write(adapter, backup('20200420_130000'), first)
+    write(adapter, backup('20200421_130000'), first + second)
+    os.remove(os.path.join(temp_directory('dedup'), 'chunks', 'refcounts.json'))
+
+    adapter.cleanup_backups([backup('20200421_130000')])
+
+    assert read(adapter, backup('20200420_130000')) == first
+    adapter.cleanup_backups([backup('20200420_130000')])
+    assert chunk_files(temp_directory('dedup')) == set()
+
+
+def test_links_copy_archives_to_and_from_dedup(temp_directory, adapter):
+
+    local = LocalRepositoryAdapter(directory=temp_directory('backups'))
+    restored = LocalRepositoryAdapter(directory=temp_directory('restore'))
+    data = archive(1)
+    write(local, backup('20200420_130000'), data)
+
+    RepositoryLink.get_source_target_compatible('local', 'dedup')(local, adapter).synchronize()
+    RepositoryLink.get_source_target_compatible('dedup', 'local')(adapter, restored).synchronize()
+
+    assert read(restored, backup('20200420_130000')) == data
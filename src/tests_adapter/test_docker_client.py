@@ -0,0 +1,234 @@
+import gzip
+import io
+import json
+import os
+import socketserver
+import tarfile
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+
+import pytest
+
+from easybackup.adapters.docker_client import DockerClient
+from easybackup.adapters.docker_container_directory import DockerContainerDirectory
+from easybackup.adapters.docker_container_sql import DockerContainerSql
+from easybackup.core.backup import Backup
+from easybackup.core.exceptions import DockerApiError, DockerExecError
+
+from .utils import temp_directory
+
+
+def frame(stream, data):
+    return bytes([stream, 0, 0, 0]) + len(data).to_bytes(4, 'big') + data
+
+
+def tar_of(files):
+    output = io.BytesIO()
+    with tarfile.open(fileobj=output, mode='w') as tar:
+        for name, data in files.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return output.getvalue()
+
+
+class FakeDockerHandler(BaseHTTPRequestHandler):
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        daemon = self.server.daemon
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])) or b'{}')
+
+        if self.path in ('/containers/db/exec', '/containers/app/exec'):
+            daemon.execs['e1'] = body
+            return self.send_json(201, {'Id': 'e1'})
+
+        if self.path == '/exec/e1/start':
+            self.send_response(101)
+            self.send_header('Content-Type', 'application/vnd.docker.raw-stream')
+            self.send_header('Connection', 'Upgrade')
+            self.send_header('Upgrade', 'tcp')
+            self.end_headers()
+            if daemon.execs['e1'].get('AttachStdin'):
+                # like psql, print a line for every chunk of input read
+                stdin = bytearray()
+                for data in iter(lambda: self.rfile.read1(64 * 1024), b''):
+                    stdin += data
+                    self.wfile.write(frame(1, b'INSERT 0 1\n' * (len(data) // 16 + 1)))
+                daemon.stdin = bytes(stdin)
+            for stream, data in daemon.frames:
+                self.wfile.write(frame(stream, data))
+            self.close_connection = True
+            return
+
+        self.send_json(404, {'message': 'No such container'})
+
+    def do_GET(self):
+        daemon = self.server.daemon
+
+        if self.path == '/exec/e1/json':
+            # the daemon may stream json bodies in chunks
+            payload = json.dumps({'Running': False, 'ExitCode': daemon.exit_code}).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for start in range(0, len(payload), 7):
+                chunk = payload[start:start+7]
+                self.wfile.write(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+            self.wfile.write(b'0\r\n\r\n')
+            return
+
+        self.send_json(404, {'message': 'No such container: '+self.path})
+
+
+class FakeDockerDaemon():
+
+    def __init__(self):
+        self.execs = {}
+        self.frames = []
+        self.exit_code = 0
+        self.stdin = b''
+        self.directory = tempfile.mkdtemp()
+        self.socket_path = os.path.join(self.directory, 'docker.sock')
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, FakeDockerHandler)
+        self.server.daemon = self
+        self.thread = threading.Thread(target=self.server.serve_forever, args=(0.01,), daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.remove(self.socket_path)
+        os.rmdir(self.directory)
+
+
+@pytest.fixture
+def daemon():
+    daemon = FakeDockerDaemon()
+    yield daemon
+    daemon.stop()
+
+
+def test_exec_stream_demultiplexes_stdout(daemon):
+
+    daemon.frames = [(1, b'hello '), (2, b'warning\n'), (1, b'world')]
+    client = DockerClient(daemon.socket_path)
+
+    with client.exec_stream('db', ['mysqldump', 'mydb'], user='mysql') as stream:
+        assert stream.read() == b'hello world'
+
+    assert daemon.execs['e1']['Cmd'] == ['mysqldump', 'mydb']
+    assert daemon.execs['e1']['User'] == 'mysql'
+
+
+def test_exec_stream_raises_on_non_zero_exit_code(daemon):
+
+    daemon.frames = [(1, b'partial'), (2, b'access denied')]
+    daemon.exit_code = 2
+    client = DockerClient(daemon.socket_path)
+
+    with pytest.raises(DockerExecError) as error:
+        with client.exec_stream('db', ['mysqldump', 'mydb']) as stream:
+            stream.read()
+
+    assert 'access denied' in str(error.value)
+
+
+def test_api_errors_are_raised(daemon):
+
+    with pytest.raises(DockerApiError) as error:
+        DockerClient(daemon.socket_path).exec_create('missing', ['ls'])
+
+    assert error.value.kwargs['status'] == 404
+
+
+def test_stream_docker_container_directory_over_socket(temp_directory, daemon):
+
+    archive = tar_of({'data/random.txt': b'A'*1000})
+    daemon.frames = [(1, archive[start:start+700]) for start in range(0, len(archive), 700)]
+    creator = DockerContainerDirectory(
+        container_name='app',
+        container_user='www-data',
+        directory='/data',
+        backup_directory=temp_directory('backups'),
+        docker_socket=daemon.socket_path
+    )
+    creator.build_backup(Backup(project='myproject', volume='directory', datetime='20200420_130000'))
+
+    # the same tar command as without socket, members keep the full directory path
+    assert daemon.execs['e1']['Cmd'] == creator.tar_cmd() == ['tar', '-c', '/data']
+    assert daemon.execs['e1']['User'] == 'www-data'
+
+    adapter = creator.target_adapter()
+    backup = adapter.fetch_backups()[0]
+    with tarfile.open(adapter.backup_path(backup)) as tar:
+        assert tar.extractfile('data/random.txt').read() == b'A'*1000
+
+
+def test_stream_docker_container_sql_over_socket(temp_directory, daemon):
+
+    daemon.frames = [(1, b'CREATE TABLE '), (1, b'users;\n')]
+    creator = DockerContainerSql(
+        container_name='db',
+        container_user='mysql',
+        database='mydb',
+        dump_cmd='mysqldump --single-transaction',
+        backup_directory=temp_directory('backups'),
+        docker_socket=daemon.socket_path
+    )
+    creator.build_backup(Backup(project='myproject', volume='db', datetime='20200420_130000'))
+
+    adapter = creator.target_adapter()
+    with gzip.open(adapter.backup_path(adapter.fetch_backups()[0])) as dump:
+        assert dump.read() == b'CREATE TABLE users;\n'
+    assert daemon.execs['e1']['Cmd'] == ['mysqldump', '--single-transaction', 'mydb']
+
+
+def test_exec_input_feeds_stdin(daemon):
+
+    daemon.frames = [(2, b'warning\n')]
+    client = DockerClient(daemon.socket_path)
+
+    with client.exec_input('db', ['mysql', 'mydb'], user='mysql') as stdin:
+        stdin.write(b'INSERT INTO users;\n')
+
+    assert daemon.stdin == b'INSERT INTO users;\n'
+    assert daemon.execs['e1']['AttachStdin'] is True
+
+
+def test_exec_input_raises_on_non_zero_exit_code(daemon):
+
+    daemon.frames = [(2, b'syntax error')]
+    daemon.exit_code = 1
+    client = DockerClient(daemon.socket_path)
+
+    with pytest.raises(DockerExecError) as error:
+        with client.exec_input('db', ['mysql', 'mydb']) as stdin:
+            stdin.write(b'garbage')
+
+    assert 'syntax error' in str(error.value)
+
+
+def test_exec_input_reads_output_while_writing(daemon):
+
+    client = DockerClient(daemon.socket_path)
+    dump = b'INSERT INTO users;\n' * (1024 * 1024)
+
+    with client.exec_input('db', ['psql', 'mydb']) as stdin:
+        stdin.write(dump)
+
+    assert daemon.stdin == dump
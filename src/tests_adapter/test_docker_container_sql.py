@@ -4,7 +4,7 @@ from easybackup.adapters.docker_container_sql import DockerContainerSql
 
 from tests_core.mock import clock
 from .utils import temp_directory
-import tarfile
+import gzip
 
 # source env
 SQL_DOCKER_CONTAINER_NAME = ''
@@ -36,14 +36,9 @@ def test_backup_docker_container_sql_database_to_local_repository(temp_directory
     assert len(backups) == 1
     assert backups[0].datetime == '20200420_130000'
 
-    # Test backup extraction
-    tar_file = adapter.backup_to_filename(backups[0])
-    assert tar_file == 'easybackup-myproject-db-20200420_130000.tar'
-
-    backups[0].file_type = 'sql'
+    # Test dump decompression
     dump_file = adapter.backup_to_filename(backups[0])
+    assert dump_file == 'easybackup-myproject-db-20200420_130000.sql.gz'
 
-    tar = tarfile.open(adapter.path(tar_file))
-    tar.extractall(temp_directory('backups'))
-    extract_file = open(temp_directory('backups/'+dump_file), "r").read()
-    assert len(extract_file) > 0
+    with gzip.open(adapter.path(dump_file), 'rb') as dump:
+        assert len(dump.read()) > 0
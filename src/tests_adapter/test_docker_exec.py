@@ -0,0 +1,206 @@
+import gzip
+import io
+import os
+import stat
+import tarfile
+
+import pytest
+
+from easybackup.adapters.docker_container_directory import DockerContainerDirectory
+from easybackup.adapters.docker_container_sql import DockerContainerSql
+from easybackup.core.backup import Backup
+from easybackup.core.exceptions import BackupUnchanged, DockerExecError, EasyBackupException
+
+from .utils import temp_directory
+
+FAKE_DOCKER = """#!/bin/sh
+# docker exec [-i] [-u user] container command...
+shift
+if [ "$1" = "-i" ]; then shift; fi
+if [ "$1" = "-u" ]; then shift 2; fi
+shift
+exec "$@"
+"""
+
+
+@pytest.fixture
+def fake_docker(tmp_path, monkeypatch):
+    docker = tmp_path / 'docker'
+    docker.write_text(FAKE_DOCKER)
+    docker.chmod(docker.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setattr(DockerContainerDirectory, 'docker_bin', str(docker))
+    return str(docker)
+
+
+def test_stream_docker_container_directory(temp_directory, fake_docker):
+
+    os.mkdir(temp_directory('production'))
+    with open(temp_directory('production/random.txt'), 'w+') as random_file:
+        random_file.write('A'*1000)
+
+    directory = os.path.abspath(temp_directory('production'))
+    creator = DockerContainerDirectory(
+        container_name='app',
+        container_user='www-data',
+        directory=directory,
+        backup_directory=temp_directory('backups')
+    )
+    creator.build_backup(Backup(project='myproject', volume='directory', datetime='20200420_130000'))
+
+    adapter = creator.target_adapter()
+    backups = adapter.fetch_backups()
+    assert len(backups) == 1
+    assert backups[0].file_type == 'tar'
+
+    with tarfile.open(adapter.backup_path(backups[0])) as tar:
+        member = directory.lstrip('/')+'/random.txt'
+        assert tar.extractfile(member).read() == b'A'*1000
+
+
+def test_failed_docker_exec_removes_partial_archive(temp_directory, fake_docker):
+
+    creator = DockerContainerDirectory(
+        container_name='app',
+        container_user='www-data',
+        directory=os.path.abspath(temp_directory('missing')),
+        backup_directory=temp_directory('backups')
+    )
+
+    with pytest.raises(DockerExecError):
+        creator.build_backup(Backup(project='myproject', volume='directory', datetime='20200420_130000'))
+
+    assert creator.target_adapter().fetch_backups() == []
+
+
+@pytest.fixture
+def fake_docker_sql(fake_docker, monkeypatch):
+    monkeypatch.setattr(DockerContainerSql, 'docker_bin', fake_docker)
+    return fake_docker
+
+
+def test_stream_docker_container_sql_dump(temp_directory, fake_docker_sql):
+
+    creator = DockerContainerSql(
+        container_name='db',
+        container_user='mysql',
+        database='mydb',
+        dump_cmd='echo dump of',
+        backup_directory=temp_directory('backups')
+    )
+    creator.build_backup(Backup(project='myproject', volume='db', datetime='20200420_130000'))
+
+    adapter = creator.target_adapter()
+    backups = adapter.fetch_backups()
+    assert backups[0].file_type == 'sql.gz'
+    with gzip.open(adapter.backup_path(backups[0])) as dump:
+        assert dump.read() == b'dump of mydb\n'
+
+
+def test_failed_sql_dump_removes_partial_archive(temp_directory, fake_docker_sql):
+
+    creator = DockerContainerSql(
+        container_name='db',
+        container_user='mysql',
+        database='mydb',
+        dump_cmd="sh -c 'echo partial; exit 2' --",
+        backup_directory=temp_directory('backups')
+    )
+
+    with pytest.raises(DockerExecError):
+        creator.build_backup(Backup(project='myproject', volume='db', datetime='20200420_130000'))
+
+    assert creator.target_adapter().fetch_backups() == []
+
+
+def test_unchanged_sql_dump_is_discarded(temp_directory, fake_docker_sql):
+
+    creator = DockerContainerSql(
+        container_name='db',
+        container_user='mysql',
+        database='mydb',
+        dump_cmd='echo dump of',
+        backup_directory=temp_directory('backups')
+    )
+    adapter = creator.target_adapter()
+
+    creator.do_build_backup(Backup(project='myproject', volume='db', datetime='20200420_130000'))
+    first = adapter.fetch_backups()[0]
+    fingerprint = adapter.read_metadata(first)['fingerprint']
+
+    with pytest.raises(BackupUnchanged):
+        creator.do_build_backup(
+            Backup(project='myproject', volume='db', datetime='20200421_130000'),
+            previous_fingerprint=fingerprint
+        )
+
+    assert adapter.fetch_backups() == [first]
+
+
+def test_restore_docker_container_sql_dump_into_import_command(temp_directory, fake_docker_sql):
+
+    imported = os.path.abspath(temp_directory('imported.sql'))
+    creator = DockerContainerSql(
+        container_name='db',
+        container_user='mysql',
+        database=imported,
+        dump_cmd='echo dump of',
+        import_cmd='tee',
+        backup_directory=temp_directory('backups')
+    )
+    assert creator.restorable
+
+    with open(temp_directory('dump.sql'), 'wb') as dump:
+        dump.write(b'INSERT INTO users;\n'*100000)
+    with open(temp_directory('dump.sql'), 'rb') as content:
+        creator.restore_backup(Backup(project='myproject', volume='db', datetime='20200420_130000', file_type='sql'), content)
+
+    with open(imported, 'rb') as restored:
+        assert restored.read() == b'INSERT INTO users;\n'*100000
+
+
+def test_restore_sql_dump_from_legacy_tar_archive(temp_directory, fake_docker_sql):
+
+    imported = os.path.abspath(temp_directory('imported.sql'))
+    creator = DockerContainerSql(
+        container_name='db',
+        container_user='mysql',
+        database=imported,
+        dump_cmd='echo dump of',
+        import_cmd='tee',
+        backup_directory=temp_directory('backups')
+    )
+
+    # backups written before dumps were streamed are tars of the dump file
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode='w') as tar:
+        info = tarfile.TarInfo('easybackup-myproject-db-20200420_130000.sql')
+        info.size = 18
+        tar.addfile(info, io.BytesIO(b'INSERT INTO users;'))
+    archive.seek(0)
+
+    creator.restore_backup(Backup(project='myproject', volume='db', datetime='20200420_130000', file_type='tar.gz'), archive)
+    with open(imported, 'rb') as restored:
+        assert restored.read() == b'INSERT INTO users;'
+
+    with pytest.raises(EasyBackupException):
+        creator.restore_backup(Backup(project='myproject', volume='db', datetime='20200420_130000', file_type='zip'), archive)
+
+
+def test_failed_import_command_raises(temp_directory, fake_docker_sql):
+
+    creator = DockerContainerSql(
+        container_name='db',
+        container_user='mysql',
+        database='mydb',
+        dump_cmd='echo dump of',
+        import_cmd="sh -c 'echo access denied >&2; exit 3' --",
+        backup_directory=temp_directory('backups')
+    )
+
+    with pytest.raises(DockerExecError) as error:
+        creator.restore_backup(
+            Backup(project='myproject', volume='db', datetime='20200420_130000', file_type='sql'),
+            io.BytesIO(b'x'*(8*1024*1024))
+        )
+
+    assert 'access denied' in str(error.value)
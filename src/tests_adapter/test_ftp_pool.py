@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+from ftplib import error_perm, error_temp
+
+import pytest
+
+from easybackup.adapters import ftp as ftp_module
+from easybackup.adapters.ftp import FtpRepositoryAdapter, LocalToFtp
+from easybackup.adapters.local import LocalRepositoryAdapter
+from easybackup.core.repository import Repository
+from easybackup.core.volume import Volume
+from easybackup.policy.cleanup import QuotaCleanupPolicy
+
+
+class FakeFTP():
+
+    connections = []
+    mlsd_entries = []
+    listings = []
+
+    def __init__(self, host, user, passwd):
+        self.alive = True
+        self.commands = []
+        self.closed = False
+        FakeFTP.connections.append(self)
+
+    def cwd(self, directory):
+        self.commands.append('CWD '+directory)
+
+    def voidcmd(self, cmd):
+        if not self.alive:
+            raise error_temp('421 Timeout')
+        self.commands.append(cmd)
+
+    def nlst(self, *args):
+        time.sleep(0.02)
+        FakeFTP.listings.append(args)
+        return ['easybackup-myproject-db-20200420_130000.tar']
+
+    def size(self, path):
+        self.commands.append('SIZE '+path)
+        return 1234
+
+    def mlsd(self, path='', facts=[]):
+        if not FakeFTP.mlsd_entries:
+            raise error_perm('500 Unknown command')
+        self.commands.append('MLSD')
+        return iter(FakeFTP.mlsd_entries)
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_ftp(monkeypatch):
+    FakeFTP.connections = []
+    FakeFTP.mlsd_entries = []
+    FakeFTP.listings = []
+    monkeypatch.setattr(ftp_module, 'FTP', FakeFTP)
+    return FakeFTP
+
+
+def ftp_adapter(**conf):
+    return FtpRepositoryAdapter(host='localhost', user='user', password='secret', directory='/backups', **conf)
+
+
+def test_ftp_sessions_are_reused(fake_ftp):
+
+    adapter = ftp_adapter()
+    assert len(adapter.fetch_backups()) == 1
+    assert len(adapter.fetch_backups()) == 1
+
+    assert len(fake_ftp.connections) == 1
+    assert fake_ftp.connections[0].commands == ['CWD /backups', 'NOOP']
+
+    adapter.close()
+    assert fake_ftp.connections[0].closed
+
+
+def test_ftp_session_reconnect_when_health_check_fails(fake_ftp):
+
+    adapter = ftp_adapter()
+    adapter.fetch_backups()
+    fake_ftp.connections[0].alive = False
+
+    adapter.fetch_backups()
+    assert len(fake_ftp.connections) == 2
+    assert fake_ftp.connections[0].closed
+
+
+def test_ftp_session_is_dropped_after_a_failure(fake_ftp):
+
+    adapter = ftp_adapter()
+    with pytest.raises(RuntimeError):
+        with adapter.ftp():
+            raise RuntimeError('transfer aborted')
+
+    adapter.fetch_backups()
+    assert len(fake_ftp.connections) == 2
+
+
+def test_ftp_pool_is_sized_to_link_concurrency(fake_ftp):
+
+    adapter = ftp_adapter()
+    LocalToFtp(source=LocalRepositoryAdapter(directory='.'), target=adapter, workers=3)
+
+    threads = [threading.Thread(target=adapter.fetch_backups) for _ in range(6)]
+    list(map(lambda thread: thread.start(), threads))
+    list(map(lambda thread: thread.join(), threads))
+
+    assert len(fake_ftp.connections) <= 3
+    assert len(fake_ftp.connections) > 1
+
+
+def test_ftp_listing_reads_sizes_from_mlsd(fake_ftp):
+
+    # servers list in any order, newest first here
+    fake_ftp.mlsd_entries = [
+        ('.', {'type': 'cdir'}),
+        ('easybackup-myproject-db-20200421_130000.tar.gz', {'type': 'file'}),
+        ('easybackup-myproject-db-20200420_130000.tar.gz', {'type': 'file', 'size': '1234'}),
+        ('easybackup-myproject-db-20200420_130000.tar.gz.meta', {'type': 'file', 'size': '80'}),
+    ]
+    adapter = ftp_adapter()
+
+    backups = adapter.fetch_backups()
+
+    assert [(backup.datetime, backup.size) for backup in backups] == [
+        ('20200420_130000', 1234),
+        ('20200421_130000', None),
+    ]
+
+
+def test_ftp_pattern_listing_does_not_list_the_directory(fake_ftp):
+
+    fake_ftp.mlsd_entries = [
+        ('easybackup-myproject-db-20200420_130000.tar', {'type': 'file', 'size': '1234'}),
+    ]
+    repository = Repository(adapter=ftp_adapter(pattern_listing=True))
+    db = Volume(name='db', project='myproject')
+
+    assert [backup.size for backup in repository.fetch(volume=db)] == [None]
+    repository.tocleanup(QuotaCleanupPolicy(max_bytes=100), db)
+
+    commands = [command for ftp in fake_ftp.connections for command in ftp.commands]
+    assert 'MLSD' not in commands
+    assert set(fake_ftp.listings) == {('easybackup-myproject-db-*',)}
+    assert 'SIZE /backups/easybackup-myproject-db-20200420_130000.tar' in commands
+
+
+def test_ftp_listing_falls_back_to_nlst_without_mlsd(fake_ftp):
+
+    adapter = ftp_adapter()
+
+    assert [backup.size for backup in adapter.fetch_backups()] == [None]
+    assert [backup.size for backup in adapter.fetch_backups()] == [None]
+    assert adapter._mlsd is False
@@ -10,6 +10,20 @@ from easybackup.adapters.local import (LocalBackupCreator,
                                        LocalToLocal)
 from tests_core.mock import clock
 from easybackup.core.backup import Backup
+from easybackup.core.backup_supervisor import BackupSupervisor
+from easybackup.core.catalog import Catalog
+from easybackup.core.chain import BackupChain
+from easybackup.core.clock import Clock
+from easybackup.core.exceptions import EasyBackupException
+from easybackup.core.hook import Hook
+from easybackup.core.repository import Repository
+from easybackup.core.restore import BackupRestorer
+from easybackup.core.snapshot import ListingSnapshot
+from easybackup.core.verify import RepositoryVerifier
+from easybackup.core.volume import Volume
+from easybackup.policy.backup import TimeIntervalBackupPolicy
+from easybackup.policy.cleanup import QuotaCleanupPolicy
+from easybackup.policy.synchronization import BudgetSynchronizationPolicy
 
 from .utils import temp_directory
 
@@ -133,6 +147,26 @@ def test_backup_local_directory_to_backup_repository(temp_directory):
     assert extract_file == 'A'*1000
 
 
+def test_failed_copy_leaves_no_partial_archive(temp_directory, monkeypatch):
+
+    write_file(temp_directory('backups/easybackup-myproject-db-20200420_130000.tar'), 'A'*1000)
+    source = LocalRepositoryAdapter(directory=temp_directory('backups'))
+    target = LocalRepositoryAdapter(directory=temp_directory('restore'))
+
+    def interrupted(source, target, length):
+        target.write(source.read(10))
+        raise OSError('disk full')
+
+    monkeypatch.setattr('easybackup.adapters.local.shutil.copyfileobj', interrupted)
+    with pytest.raises(EasyBackupException):
+        LocalToLocal(source=source, target=target).synchronize()
+    assert os.listdir(temp_directory('restore')) == []
+
+    monkeypatch.undo()
+    LocalToLocal(source=source, target=target).synchronize()
+    assert target.fetch_backups() == source.fetch_backups()
+
+
 def test_copy_backup_from_folder_to_an_other(temp_directory):
 
     random_file = open(temp_directory('random.txt'), "w+")
@@ -172,3 +206,546 @@ def test_copy_backup_from_folder_to_an_other(temp_directory):
     extract_file = open(temp_directory('backups/random.txt'), "r").read()
 
     assert extract_file == 'A'*1000
+
+
+def test_local_repository_catalog(temp_directory):
+
+    for backup in mockbackups:
+        file = open(temp_directory(backup), 'w+')
+        file.write('A'*1000)
+        file.close()
+
+    adapter = LocalRepositoryAdapter(directory=temp_directory(), catalog=True)
+    assert len(adapter.fetch_backups()) == 4
+    assert os.path.isfile(temp_directory(Catalog.filename))
+
+    # The catalog is detected and read instead of the directory listing
+    adapter = LocalRepositoryAdapter(directory=temp_directory())
+    os.remove(temp_directory(mockbackups[0]))
+    assert len(adapter.fetch_backups()) == 4
+
+    adapter.cleanup_backups(adapter.fetch_backups()[1:2])
+    backups = adapter.fetch_backups()
+    assert len(backups) == 3
+    assert backups[1].datetime == '20200421_130000'
+
+    # Reindex after drift
+    assert adapter.reindex() == 2
+    backups = adapter.fetch_backups()
+    assert len(backups) == 2
+    assert backups[0].datetime == '20200421_130000'
+
+
+def test_parse_catalog_ignore_interrupted_append():
+
+    content = (
+        '+ easybackup-myproject-db-20200420_130000.tar\n'
+        '+ easybackup-myproject-db-20200421_130000.tar\n'
+        '- easybackup-myproject-db-20200420_130000.tar\n'
+        '+ easybackup-myproject-db-2020042'
+    )
+    assert Catalog.parse(content) == ['easybackup-myproject-db-20200421_130000.tar']
+
+
+def test_parse_catalog_sizes():
+
+    content = (
+        '+ easybackup-myproject-db-20200420_130000.tar\n'
+        '+ easybackup-myproject-db-20200421_130000.tar\t1024\n'
+    )
+    assert Catalog.parse_entries(content) == {
+        'easybackup-myproject-db-20200420_130000.tar': None,
+        'easybackup-myproject-db-20200421_130000.tar': 1024,
+    }
+    assert Catalog.parse_entries(Catalog.format('+', Catalog.parse_entries(content))) == Catalog.parse_entries(content)
+
+
+def test_fetch_volume_backups_from_local_repository(temp_directory):
+
+    backups = mockbackups + [
+        'easybackup-myproject-app-20200420_130000.tar',
+        'easybackup-otherproject-db-20200420_130000.tar',
+    ]
+    for backup in backups:
+        file = open(temp_directory(backup), 'w+')
+        file.write('A'*1000)
+        file.close()
+
+    adapter = LocalRepositoryAdapter(directory=temp_directory())
+    assert len(adapter.fetch_backups()) == 6
+    assert len(adapter.fetch_backups(volume=Volume('app', 'myproject'))) == 1
+    assert len(adapter.fetch_backups(volume=Volume('db', 'myproject'))) == 4
+
+    repository = Repository(adapter=adapter)
+    with ListingSnapshot.run():
+        assert len(repository.fetch(volume=Volume('db', 'otherproject'))) == 1
+        os.remove(temp_directory(backups[-1]))
+        assert len(repository.fetch(volume=Volume('db', 'otherproject'))) == 1
+        assert len(repository.fetch()) == 5
+
+
+@clock('20200420_130000')
+def test_stream_backup_to_an_other_repository(temp_directory):
+
+    os.mkdir(temp_directory('production'))
+    random_file = open(temp_directory('production/random.txt'), "w+")
+    random_file.write('A'*1000)
+    random_file.close()
+    os.mkdir(temp_directory('remote'))
+
+    creator = LocalBackupCreator(
+        source=temp_directory('production'),
+        backup_directory=temp_directory('backups')
+    )
+    remote = Repository(adapter=LocalRepositoryAdapter(directory=temp_directory('remote')))
+
+    supervisor = BackupSupervisor(
+        project='myproject',
+        volume='db',
+        creator=creator,
+        backup_policy=TimeIntervalBackupPolicy(10),
+        stream_repository=remote
+    )
+    supervisor.run()
+
+    assert len(creator.target_repository.fetch()) == 0
+    backups = remote.fetch()
+    assert len(backups) == 1
+
+    tar = tarfile.open(remote.adapter.backup_path(backups[0]))
+    assert tar.extractfile('production/random.txt').read() == b'A'*1000
+
+    # With a local copy
+    Clock.monkey_now('20200421_130000')
+    supervisor = BackupSupervisor(
+        project='myproject',
+        volume='db',
+        creator=creator,
+        backup_policy=TimeIntervalBackupPolicy(10),
+        stream_repository=remote,
+        stream_tee=True
+    )
+    supervisor.run()
+
+    assert len(remote.fetch()) == 2
+    local = creator.target_adapter()
+    backups = local.fetch_backups()
+    assert len(backups) == 1
+    with open(local.backup_path(backups[0]), 'rb') as copy, open(remote.adapter.backup_path(backups[0]), 'rb') as origin:
+        assert copy.read() == origin.read()
+
+
+def test_partial_archive_is_removed_on_failure(temp_directory):
+
+    adapter = LocalRepositoryAdapter(directory=temp_directory('backups'))
+    backup = Backup(project='myproject', volume='db', datetime='20200420_130000', file_type='tar')
+
+    with pytest.raises(RuntimeError):
+        with adapter.open_backup_writer(backup) as archive:
+            archive.write(b'partial')
+            raise RuntimeError('source vanished')
+
+    assert adapter.fetch_backups() == []
+
+
+@pytest.mark.parametrize('compression, file_type', [
+    ('none', 'tar'),
+    ('gzip', 'tar'),
+    ('bz2', 'tar.bz2'),
+    ('xz', 'tar.xz'),
+])
+def test_backup_local_directory_with_compression_codec(temp_directory, compression, file_type):
+
+    os.mkdir(temp_directory('production'))
+    with open(temp_directory('production/random.txt'), 'w+') as random_file:
+        random_file.write('A'*1000)
+
+    creator = LocalBackupCreator(
+        source=temp_directory('production'),
+        backup_directory=temp_directory('backups'),
+        compression=compression,
+        compression_level=1
+    )
+    creator.build_backup(Backup(project='myproject', volume='db', datetime='20200420_130000'))
+
+    adapter = creator.target_adapter()
+    backups = adapter.fetch_backups()
+    assert len(backups) == 1
+    assert backups[0].file_type == file_type
+
+    with tarfile.open(adapter.backup_path(backups[0]), 'r:*') as tar:
+        assert tar.extractfile('production/random.txt').read() == b'A'*1000
+
+
+def test_unknown_compression_codec_is_rejected(temp_directory):
+
+    with pytest.raises(EasyBackupException):
+        LocalBackupCreator(
+            source=temp_directory(),
+            backup_directory=temp_directory('backups'),
+            compression='rar'
+        )
+
+
+def test_compressed_filenames_are_parsed(temp_directory):
+
+    for filename in [
+        'easybackup-myproject-db-20200420_130000.tar.xz',
+        'easybackup-myproject-db-20200421_130000.sql.gz',
+        'easybackup-myproject-db-20200422_130000.tar.meta',
+    ]:
+        open(temp_directory(filename), 'w').close()
+
+    adapter = LocalRepositoryAdapter(directory=temp_directory())
+    backups = adapter.fetch_backups()
+
+    assert [backup.file_type for backup in backups] == ['tar.xz', 'sql.gz']
+
+
+def test_parallel_gzip_archive_is_readable_by_tar(temp_directory):
+
+    os.mkdir(temp_directory('production'))
+    with open(temp_directory('production/random.bin'), 'wb') as random_file:
+        random_file.write(os.urandom(3 * 1024 * 1024))
+
+    creator = LocalBackupCreator(
+        source=temp_directory('production'),
+        backup_directory=temp_directory('backups'),
+        compression_threads=4
+    )
+    creator.build_backup(Backup(project='myproject', volume='db', datetime='20200420_130000'))
+
+    adapter = creator.target_adapter()
+    backup = adapter.fetch_backups()[0]
+    assert backup.file_type == 'tar'
+
+    subprocess.run(['tar', '-xzf', adapter.backup_path(backup), '-C', temp_directory('restore')], check=True)
+
+    with open(temp_directory('production/random.bin'), 'rb') as origin, open(temp_directory('restore/production/random.bin'), 'rb') as copy:
+        assert origin.read() == copy.read()
+
+
+def write_file(path, content):
+    with open(path, 'w+') as file:
+        file.write(content)
+
+
+def read_tree(directory):
+    tree = {}
+    for path, _, filenames in os.walk(directory):
+        for filename in filenames:
+            with open(os.path.join(path, filename)) as file:
+                tree[os.path.relpath(os.path.join(path, filename), directory)] = file.read()
+    return tree
+
+
+@pytest.mark.parametrize('mode, level', [
+    ('incremental', 'inc'),
+    ('differential', 'diff'),
+])
+def test_incremental_backups_restore_their_chain(temp_directory, mode, level):
+
+    os.makedirs(temp_directory('production/static'))
+    write_file(temp_directory('production/static/logo.png'), 'L'*1000)
+    write_file(temp_directory('production/removed.txt'), 'R')
+    write_file(temp_directory('production/changed.txt'), 'v1')
+
+    creator = LocalBackupCreator(
+        source=temp_directory('production'),
+        backup_directory=temp_directory('backups'),
+        mode=mode
+    )
+    adapter = creator.target_adapter()
+
+    creator.build_backup(Backup(project='myproject', volume='uploads', datetime='20200420_130000'))
+
+    os.remove(temp_directory('production/removed.txt'))
+    write_file(temp_directory('production/changed.txt'), 'version 2')
+    os.mkdir(temp_directory('production/new'))
+    write_file(temp_directory('production/new/added.txt'), 'A')
+    creator.build_backup(Backup(project='myproject', volume='uploads', datetime='20200421_130000'))
+
+    write_file(temp_directory('production/new/later.txt'), 'B')
+    creator.build_backup(Backup(project='myproject', volume='uploads', datetime='20200422_130000'))
+
+    backups = adapter.fetch_backups()
+    assert [backup.file_type for backup in backups] == ['tar', level+'.tar', level+'.tar']
+
+    with tarfile.open(adapter.backup_path(backups[1])) as tar:
+        names = tar.getnames()
+    assert 'production/static/logo.png' not in names
+    assert 'production/changed.txt' in names
+
+    chain = BackupChain.restore(adapter, backups, backups[-1], temp_directory('restore'))
+    assert len(chain) == (3 if level == 'inc' else 2)
+    assert read_tree(temp_directory('restore/production')) == read_tree(temp_directory('production'))
+
+
+def test_incremental_backup_records_its_base(temp_directory):
+
+    os.mkdir(temp_directory('production'))
+    creator = LocalBackupCreator(
+        source=temp_directory('production'),
+        backup_directory=temp_directory('backups'),
+        mode='incremental'
+    )
+    adapter = creator.target_adapter()
+
+    for day in range(3):
+        write_file(temp_directory('production/day%d.txt' % day), 'A')
+        creator.do_build_backup(Backup(project='myproject', volume='uploads', datetime='2020042%d_130000' % day))
+
+    backups = adapter.fetch_backups()
+    BackupChain.load_bases(adapter, backups)
+    assert [backup.base for backup in backups] == [None, backups[0].formated_name, backups[1].formated_name]
+
+    # a missing middle link breaks the chain instead of restoring a wrong tree
+    adapter.cleanup_backups([backups[1]])
+    backups = adapter.fetch_backups()
+    BackupChain.load_bases(adapter, backups)
+    assert BackupChain.restorable(backups) == [backups[0]]
+
+
+def test_incremental_backup_falls_back_to_full_without_base(temp_directory):
+
+    os.mkdir(temp_directory('production'))
+    write_file(temp_directory('production/random.txt'), 'A')
+
+    creator = LocalBackupCreator(
+        source=temp_directory('production'),
+        backup_directory=temp_directory('backups'),
+        mode='incremental'
+    )
+    adapter = creator.target_adapter()
+
+    creator.build_backup(Backup(project='myproject', volume='uploads', datetime='20200420_130000'))
+    adapter.cleanup_backups(adapter.fetch_backups())
+    creator.build_backup(Backup(project='myproject', volume='uploads', datetime='20200421_130000'))
+
+    assert [backup.file_type for backup in adapter.fetch_backups()] == ['tar']
+
+
+def test_skip_unchanged_source(temp_directory, monkeypatch):
+
+    os.mkdir(temp_directory('production'))
+    write_file(temp_directory('production/random.txt'), 'A')
+
+    creator = LocalBackupCreator(
+        source=temp_directory('production'),
+        backup_directory=temp_directory('backups')
+    )
+    supervisor = BackupSupervisor(
+        project='myproject',
+        volume='uploads',
+        creator=creator,
+        backup_policy=TimeIntervalBackupPolicy(10),
+        skip_unchanged=True
+    )
+    adapter = creator.target_adapter()
+    unchanged = []
+    monkeypatch.setitem(Hook.registery, 'on_backup_unchanged', [lambda **kwargs: unchanged.append(kwargs['backup'])])
+
+    for datetime in ['20200420_130000', '20200421_130000']:
+        Clock.monkey_now(datetime)
+        supervisor.run()
+
+    backups = adapter.fetch_backups()
+    assert len(backups) == 1
+    assert unchanged == backups
+    assert adapter.read_metadata(backups[0])['fingerprint'].startswith('tree:')
+
+    write_file(temp_directory('production/random.txt'), 'B')
+    Clock.monkey_now('20200422_130000')
+    supervisor.run()
+    Clock.monkey_now(False)
+
+    assert len(adapter.fetch_backups()) == 2
+
+    adapter.cleanup_backups(adapter.fetch_backups())
+    assert os.listdir(temp_directory('backups')) == []
+
+
+def test_archive_checksum_is_recorded_and_propagated(temp_directory):
+
+    import hashlib
+
+    os.mkdir(temp_directory('production'))
+    write_file(temp_directory('production/random.txt'), 'A'*1000)
+
+    creator = LocalBackupCreator(
+        source=temp_directory('production'),
+        backup_directory=temp_directory('backups')
+    )
+    creator.do_build_backup(Backup(project='myproject', volume='db', datetime='20200420_130000'))
+
+    local = creator.target_adapter()
+    backup = local.fetch_backups()[0]
+    with open(local.backup_path(backup), 'rb') as archive:
+        content = archive.read()
+
+    metadata = local.read_metadata(backup)
+    assert metadata['sha256'] == hashlib.sha256(content).hexdigest()
+    assert metadata['size'] == len(content)
+
+    copy = LocalRepositoryAdapter(directory=temp_directory('backups-twine'))
+    LocalToLocal(source=local, target=copy).synchronize()
+
+    assert copy.read_metadata(backup) == metadata
+
+
+def build_backups(temp_directory, datetimes):
+
+    os.mkdir(temp_directory('production'))
+    write_file(temp_directory('production/random.txt'), 'A'*10000)
+
+    creator = LocalBackupCreator(
+        source=temp_directory('production'),
+        backup_directory=temp_directory('backups')
+    )
+    for datetime in datetimes:
+        creator.do_build_backup(Backup(project='myproject', volume='db', datetime=datetime))
+
+    return Repository(adapter=creator.target_adapter())
+
+
+def corrupt(path, truncate=False):
+    with open(path, 'r+b') as archive:
+        if truncate:
+            archive.truncate(os.path.getsize(path) // 2)
+        else:
+            archive.seek(os.path.getsize(path) // 2)
+            archive.write(b'\0\1\2\3')
+
+
+def test_verify_detects_corrupted_archives(temp_directory):
+
+    repository = build_backups(temp_directory, ['20200420_130000', '20200421_130000', '20200422_130000'])
+    adapter = repository.adapter
+    backups = adapter.fetch_backups()
+    corrupt(adapter.backup_path(backups[0]))
+    corrupt(adapter.backup_path(backups[1]), truncate=True)
+
+    results = RepositoryVerifier(repository, mode='full', workers=2).run()
+    assert [result.ok for result in results] == [False, False, True]
+    assert [result.method for result in results] == ['sha256']*3
+
+    results = RepositoryVerifier(repository, mode='size').run()
+    assert [result.ok for result in results] == [True, False, True]
+
+
+def test_verify_decompresses_archives_without_checksum(temp_directory):
+
+    repository = build_backups(temp_directory, ['20200420_130000', '20200421_130000'])
+    adapter = repository.adapter
+    backups = adapter.fetch_backups()
+    for backup in backups:
+        os.remove(adapter.path(adapter.metadata_filename(backup)))
+    corrupt(adapter.backup_path(backups[0]))
+
+    results = RepositoryVerifier(repository).run()
+    assert [result.ok for result in results] == [False, True]
+    assert results[1].method == 'decompression'
+
+
+def test_restore_volume_at_datetime(temp_directory):
+
+    os.mkdir(temp_directory('production'))
+    write_file(temp_directory('production/changed.txt'), 'v1')
+    creator = LocalBackupCreator(
+        source=temp_directory('production'),
+        backup_directory=temp_directory('backups'),
+        compression='xz',
+        mode='incremental'
+    )
+    creator.build_backup(Backup(project='myproject', volume='uploads', datetime='20200420_130000'))
+    write_file(temp_directory('production/changed.txt'), 'v2')
+    write_file(temp_directory('production/added.txt'), 'A'*100000)
+    creator.build_backup(Backup(project='myproject', volume='uploads', datetime='20200421_130000'))
+    write_file(temp_directory('production/changed.txt'), 'v3')
+    creator.build_backup(Backup(project='myproject', volume='uploads', datetime='20200422_130000'))
+
+    restorer = BackupRestorer(creator.target_repository, Volume(name='uploads', project='myproject'), prefetch=1)
+    restorer.block_size = 1024
+
+    backup = restorer.select('20200421_180000')
+    assert backup.datetime == '20200421_130000'
+    chain = restorer.restore(backup, temp_directory('restore/uploads'))
+
+    assert [link.datetime for link in chain] == ['20200420_130000', '20200421_130000']
+    assert read_tree(temp_directory('restore/uploads/production')) == {'changed.txt': 'v2', 'added.txt': 'A'*100000}
+
+    assert restorer.select().datetime == '20200422_130000'
+    with pytest.raises(EasyBackupException):
+        restorer.select('20200419_130000')
+    with pytest.raises(EasyBackupException):
+        restorer.restore_into(backup, creator)
+
+
+def test_quota_cleanup_with_listed_sizes(temp_directory):
+
+    for volume, sizes in (('db', [300, 200, 100]), ('app', [400, 50])):
+        for day, size in enumerate(sizes):
+            write_file(temp_directory('backups/easybackup-myproject-%s-2020042%d_130000.tar' % (volume, day)), 'A'*size)
+
+    repository = Repository(adapter=LocalRepositoryAdapter(directory=temp_directory('backups')))
+    backups = repository.fetch()
+    assert sorted(backup.size for backup in backups) == [50, 100, 200, 300, 400]
+
+    db = Volume(name='db', project='myproject')
+    volume_policy = QuotaCleanupPolicy(max_bytes=350, minimum=1)
+    assert [backup.size for backup in repository.tocleanup(volume_policy, db)] == [300]
+
+    repository_policy = QuotaCleanupPolicy(max_bytes=350, minimum=1, scope='repository')
+    repository.cleanup(repository_policy, db)
+    assert sorted(backup.size for backup in repository.fetch()) == [50, 100, 200]
+
+
+def test_quota_cleanup_with_catalog_sizes(temp_directory):
+
+    for day, size in enumerate([300, 200, 100]):
+        write_file(temp_directory('backups/easybackup-myproject-db-2020042%d_130000.tar' % day), 'A'*size)
+
+    db = Volume(name='db', project='myproject')
+    policy = QuotaCleanupPolicy(max_bytes=350, minimum=1)
+
+    # a catalog written before sizes were recorded lists none, they are read one by one
+    write_file(temp_directory('backups/' + Catalog.filename), ''.join(
+        '+ easybackup-myproject-db-2020042%d_130000.tar\n' % day for day in range(3)
+    ))
+    repository = Repository(adapter=LocalRepositoryAdapter(directory=temp_directory('backups')))
+    assert [backup.size for backup in repository.adapter.fetch_backups()] == [None, None, None]
+    assert [backup.size for backup in repository.tocleanup(policy, db)] == [300]
+
+    # reindexing records the listed sizes
+    repository.adapter.reindex()
+    assert [backup.size for backup in repository.adapter.fetch_backups()] == [300, 200, 100]
+
+    # backups registered by a copy record the size they were copied with
+    target = LocalRepositoryAdapter(directory=temp_directory('restore'), catalog=True)
+    LocalToLocal(source=repository.adapter, target=target, volume=db).synchronize()
+    assert sorted(Catalog(target).entries().values()) == [100, 200, 300]
+
+
+def test_built_backup_knows_its_size(temp_directory):
+
+    repository = build_backups(temp_directory, ['20200420_130000'])
+    backup = repository.fetch()[0]
+
+    assert backup.size == os.path.getsize(repository.adapter.backup_path(backup))
+    assert backup.size == repository.read_metadata(backup)['size']
+
+
+def test_budget_synchronization_resumes_on_next_run(temp_directory):
+
+    for day, size in enumerate([300, 200, 100]):
+        write_file(temp_directory('backups/easybackup-myproject-db-2020042%d_130000.tar' % day), 'A'*size)
+
+    source = LocalRepositoryAdapter(directory=temp_directory('backups'))
+    target = LocalRepositoryAdapter(directory=temp_directory('restore'))
+    policy = BudgetSynchronizationPolicy(max_bytes=350)
+
+    LocalToLocal(source, target).synchronize(policy)
+    assert [backup.size for backup in target.fetch_backups()] == [200, 100]
+
+    LocalToLocal(source, target).synchronize(policy)
+    assert [backup.size for backup in target.fetch_backups()] == [300, 200, 100]
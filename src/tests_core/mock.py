@@ -36,6 +36,10 @@ class MemoryRepositoryAdapter(RepositoryAdapter):
         if force_clear:
             self.backups = []
 
+    @property
+    def identity(self):
+        return (self.type_tag, self.bucket)
+
     def fetch_backups(self) -> List[Backup]:
         return [
             Backup(**self.parse(name)) for name in self.backups
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+from easybackup.core.backup import Backup
+from easybackup.core.chain import BackupChain
+from easybackup.policy.backup import TimeIntervalBackupPolicy
+from easybackup.policy.cleanup import LifetimeCleanupPolicy
+
+from .mock import clock
+
+
+def backup(datetime, file_type, volume='uploads'):
+    return Backup(project='myproject', volume=volume, datetime=datetime, file_type=file_type)
+
+
+full = backup('20200420_130000', 'tar')
+inc1 = backup('20200421_130000', 'inc.tar')
+inc2 = backup('20200422_130000', 'inc.tar.xz')
+full2 = backup('20200423_130000', 'tar')
+diff = backup('20200424_130000', 'diff.tar')
+orphan = backup('20200420_130000', 'inc.tar', volume='media')
+
+
+def test_chains_follow_backup_levels():
+
+    chains = BackupChain.chains([inc2, full, inc1, full2, diff, orphan])
+
+    assert chains[full] == [full]
+    assert chains[inc2] == [full, inc1, inc2]
+    assert chains[diff] == [full2, diff]
+    assert chains[orphan] is False
+
+
+def test_restorable_backups_exclude_broken_chains():
+    assert BackupChain.restorable([inc1, inc2, full2, diff]) == [full2, diff]
+
+
+def test_chains_follow_recorded_bases():
+
+    recorded = backup('20200422_130000', 'inc.tar')
+    recorded.base = inc1.formated_name
+
+    # without inc1 the listing order would wrongly chain the incremental to full
+    assert BackupChain.chain([full, recorded], recorded) is False
+    assert BackupChain.restorable([full, recorded]) == [full]
+    assert BackupChain.chain([full, inc1, recorded], recorded) == [full, inc1, recorded]
+    assert BackupChain.with_dependencies([full, inc1, recorded, full2], [recorded]) == [full, inc1, recorded]
+
+
+@clock('20200422_140000')
+def test_lifetime_cleanup_keeps_bases_of_kept_incrementals():
+
+    policy = LifetimeCleanupPolicy(max_age=2*60*60, minimum=0)
+    backups = [full, inc1, inc2]
+
+    assert policy.filter_backups_to_cleanup(backups) == []
+    assert policy.filter_backups_to_cleanup(backups+[full2]) == []
+
+
+@clock('20200424_140000')
+def test_lifetime_cleanup_releases_unused_chains():
+
+    policy = LifetimeCleanupPolicy(max_age=2*60*60, minimum=0)
+    assert policy.filter_backups_to_cleanup([full, inc1, inc2, full2, diff]) == [full, inc1, inc2]
+
+
+@clock('20200421_140000')
+def test_time_interval_ignores_unrestorable_backups():
+
+    policy = TimeIntervalBackupPolicy(interval=24*60*60)
+
+    assert policy.should_backup([inc1]) is True
+    assert policy.should_backup([full, inc1]) is False
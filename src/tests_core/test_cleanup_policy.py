@@ -1,10 +1,14 @@
+import datetime
+
 import pytest
 from parameterized import parameterized
 
 from easybackup.core.backup import Backup
 from easybackup.core.clock import Clock
+from easybackup.core.lexique import DATE_FORMAT
 from easybackup.core.repository import Repository
-from easybackup.policy.cleanup import LifetimeCleanupPolicy
+from easybackup.core.exceptions import EasyBackupException
+from easybackup.policy.cleanup import GrandfatherFatherSonCleanupPolicy, LifetimeCleanupPolicy, QuotaCleanupPolicy
 
 from .mock import MemoryRepositoryAdapter, clock
 
@@ -143,3 +147,128 @@ def test_cleanup_backups(memory_adapter):
     assert len(backups) == 2
     assert backups[0].datetime == '20200421_130000'
     assert backups[1].datetime == '20200422_130000'
+
+
+def hourly_backups(days, volume='db'):
+    start = datetime.datetime(2020, 1, 1)
+    return [
+        Backup(
+            project='myproject',
+            volume=volume,
+            datetime=(start + datetime.timedelta(days=day, hours=hour)).strftime(DATE_FORMAT)
+        )
+        for day in range(days) for hour in range(0, 24, 6)
+    ]
+
+
+def test_gfs_keeps_newest_backup_of_each_period():
+
+    # 2020-01-01 is a wednesday, backups every 6 hours until 2020-03-31
+    backups = hourly_backups(91)
+    policy = GrandfatherFatherSonCleanupPolicy(hourly=2, daily=3, weekly=2, monthly=2, yearly=1)
+
+    tokeep = [backup.datetime for backup in policy.filter_backups_to_keep(backups)]
+
+    assert tokeep == [
+        '20200229_180000',  # monthly
+        '20200329_180000',  # daily, weekly as weeks start on monday
+        '20200330_180000',  # daily
+        '20200331_120000',  # hourly
+        '20200331_180000',  # hourly, daily, weekly, monthly, yearly
+    ]
+    assert len(policy.filter_backups_to_cleanup(backups)) == len(backups) - len(tokeep)
+
+
+def test_gfs_buckets_volumes_separately():
+
+    backups = hourly_backups(2, volume='db') + hourly_backups(1, volume='app')
+    policy = GrandfatherFatherSonCleanupPolicy(daily=1)
+
+    tokeep = policy.filter_backups_to_keep(backups)
+
+    assert [(backup.volume, backup.datetime) for backup in tokeep] == [
+        ('db', '20200102_180000'),
+        ('app', '20200101_180000'),
+    ]
+
+
+def test_gfs_keeps_dependencies_of_kept_backups():
+
+    backups = [
+        Backup(project='myproject', volume='db', datetime='20200101_000000', file_type='tar'),
+        Backup(project='myproject', volume='db', datetime='20200101_120000', file_type='inc.tar'),
+        Backup(project='myproject', volume='db', datetime='20200101_180000', file_type='inc.tar'),
+    ]
+    policy = GrandfatherFatherSonCleanupPolicy(daily=1)
+
+    assert policy.filter_backups_to_keep(backups) == backups
+
+
+def sized_backups(volume, sizes):
+    return [
+        Backup(project='myproject', volume=volume, datetime='202004%02d_130000' % (day + 1), size=size)
+        for day, size in enumerate(sizes)
+    ]
+
+
+def test_quota_deletes_oldest_backups_over_budget():
+
+    backups = sized_backups('db', [100, 10, 40, 30, 20])
+    policy = QuotaCleanupPolicy(max_bytes=95, minimum=1)
+
+    tocleanup = policy.filter_backups_to_cleanup(backups)
+
+    # 20 + 30 + 40 fit, the 10 bytes backup is older than the first one over budget
+    assert [backup.size for backup in tocleanup] == [100, 10]
+
+
+def test_quota_keeps_minimum_backups_per_volume():
+
+    backups = sized_backups('db', [50, 50, 50]) + sized_backups('app', [500, 500])
+    policy = QuotaCleanupPolicy(max_bytes=120, minimum=1)
+
+    tokeep = policy.filter_backups_to_keep(backups)
+
+    # both db backups fit before the app one overflows, the last app backup is kept anyway
+    assert [(backup.volume, backup.datetime) for backup in tokeep] == [
+        ('db', '20200402_130000'),
+        ('db', '20200403_130000'),
+        ('app', '20200402_130000'),
+    ]
+
+
+def test_quota_rejects_backups_without_size():
+
+    backups = sized_backups('db', [100, None, 40])
+    policy = QuotaCleanupPolicy(max_bytes=1000, minimum=1)
+
+    with pytest.raises(EasyBackupException):
+        policy.filter_backups_to_cleanup(backups)
+
+
+def test_quota_rejects_unknown_scope():
+
+    with pytest.raises(EasyBackupException):
+        QuotaCleanupPolicy(max_bytes=100, scope='project')
+
+
+@pytest.mark.parametrize('counts', [
+    {},
+    {'daily': 0, 'weekly': 0},
+    {'daily': -1, 'weekly': 4},
+    {'daily': 7, 'minimum': -1},
+])
+def test_gfs_rejects_counts_keeping_nothing_or_everything(counts):
+    with pytest.raises(EasyBackupException):
+        GrandfatherFatherSonCleanupPolicy(**counts)
+
+
+def test_gfs_keeps_minimum_newest_backups():
+
+    backups = hourly_backups(1)
+    policy = GrandfatherFatherSonCleanupPolicy(yearly=1, minimum=2)
+
+    assert [backup.datetime for backup in policy.filter_backups_to_keep(backups)] == [
+        '20200101_120000',
+        '20200101_180000',
+    ]
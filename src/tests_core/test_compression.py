@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+import gzip
+import io
+import os
+
+import pytest
+
+from easybackup.core.compression import Codec, GzipCodec, ParallelGzipWriter
+
+
+def test_parallel_gzip_writes_readable_multi_member_stream():
+
+    data = os.urandom(1000) * 50
+    output = io.BytesIO()
+
+    with ParallelGzipWriter(output, threads=4, block_size=4096) as writer:
+        for start in range(0, len(data), 3000):
+            writer.write(data[start:start+3000])
+
+    assert gzip.decompress(output.getvalue()) == data
+    assert output.getvalue().count(b'\x1f\x8b\x08') >= len(data) // 4096
+
+
+def test_parallel_gzip_empty_stream_is_valid_gzip():
+
+    output = io.BytesIO()
+    with ParallelGzipWriter(output, threads=2):
+        pass
+
+    assert gzip.decompress(output.getvalue()) == b''
+
+
+def test_parallel_gzip_discards_pending_blocks_on_error():
+
+    output = io.BytesIO()
+    with pytest.raises(RuntimeError):
+        with ParallelGzipWriter(output, threads=2, block_size=16) as writer:
+            writer.write(b'A'*100)
+            raise RuntimeError('source vanished')
+
+    assert writer.closed
+
+
+def test_gzip_codec_uses_parallel_writer_with_threads():
+
+    assert isinstance(Codec.build('gzip', threads=4).compressor(io.BytesIO()), ParallelGzipWriter)
+    assert not isinstance(GzipCodec().compressor(io.BytesIO()), ParallelGzipWriter)
@@ -6,8 +6,8 @@ from easybackup.core.backup_supervisor import BackupSupervisor
 from easybackup.core.repository import RepositoryAdapter
 from easybackup.core.repository_link import RepositoryLink
 from easybackup.policy.backup import BackupPolicy, TimeIntervalBackupPolicy
-from easybackup.policy.cleanup import LifetimeCleanupPolicy
-from easybackup.policy.synchronization import SynchronizeRecentPolicy
+from easybackup.policy.cleanup import GrandfatherFatherSonCleanupPolicy, LifetimeCleanupPolicy
+from easybackup.policy.synchronization import ClonePolicy, SynchronizeRecentPolicy
 from easybackup.loader.yaml_composer import YamlComposer, YamlComposerException
 from easybackup.core.lexique import parse_time_duration, is_explicit_time_duration
 
@@ -229,6 +229,33 @@ def test_yaml_load_volume_creator_with_cleanup_policy():
     assert composers[0].cleanup_policy.minimum == 5
 
 
+def test_yaml_load_volume_creator_with_gfs_cleanup_policy():
+
+    composers = YamlComposer("""
+        version: 1.0.0
+        projects:
+            myproject:
+                app:
+                   type: inmemory
+                   source_bucket: A
+                   target_bucket: B
+
+                   backup_policy:
+                     policy: timeinterval
+                     interval: 1000
+
+                   cleanup_policy:
+                     policy: gfs
+                     daily: 7
+                     weekly: 4
+                     monthly: 12
+
+    """).composers
+
+    assert type(composers[0].cleanup_policy) is GrandfatherFatherSonCleanupPolicy
+    assert str(composers[0].cleanup_policy) == '[gfs cleanup policy (daily=7, weekly=4, monthly=12)]'
+
+
 def test_yaml_load_repository():
 
     loader = YamlComposer("""
@@ -337,3 +364,86 @@ def test_yaml_load_dispatcher():
 
     assert type(composer.synchronizers[0].sync_policy) is SynchronizeRecentPolicy
     assert composer.synchronizers[0].sync_policy.minimum == 5
+
+
+def test_yaml_load_clone_dispatcher():
+
+    composer = YamlComposer("""
+        version: 1.0.0
+
+        repositories:
+            bucketB:
+                type: inmemory
+                bucket: B
+
+        projects:
+            myproject:
+                app:
+                    type: inmemory
+                    source_bucket: A
+                    target_bucket: B
+
+                    backup_policy:
+                        policy: timeinterval
+                        interval: 1000
+
+                    dispatchers:
+                        bucketB:
+                            policy: clone
+    """).composers[0]
+
+    assert type(composer.synchronizers[0].sync_policy) is ClonePolicy
+    assert composer.synchronizers[0].sync_policy.volume.name == 'app'
+
+
+def test_yaml_load_dispatcher_workers():
+
+    composers = YamlComposer("""
+        version: 1.0.0
+
+        repositories:
+            bucketB:
+                type: inmemory
+                bucket: B
+
+        projects:
+            myproject:
+                app:
+                    type: inmemory
+                    source_bucket: A
+                    target_bucket: B
+
+                    backup_policy:
+                        policy: timeinterval
+                        interval: 1000
+
+                    dispatchers:
+                        bucketB:
+                            policy: copypaste
+                            workers: 4
+    """).composers
+
+    assert composers[0].synchronizers[0].link.workers == 4
+
+
+def test_yaml_stream_to_requires_a_streamable_creator():
+
+    with pytest.raises(YamlComposerException) as error:
+        YamlComposer("""
+            version: 1.0.0
+
+            repositories:
+                bucketB:
+                    type: inmemory
+                    bucket: B
+
+            projects:
+                myproject:
+                    app:
+                        type: inmemory
+                        stream_to: bucketB
+                        backup_policy:
+                            policy: timeinterval
+                            interval: 1000
+        """).composers
+    assert error.value.code == 'creator_cannot_stream'
@@ -0,0 +1,126 @@
+import pytest
+
+from easybackup.core.backup import Backup
+from easybackup.core.clock import Clock
+from easybackup.core.cron import CronExpression
+from easybackup.core.exceptions import EasyBackupException
+from easybackup.core.hook import Hook
+from easybackup.loader.yaml_composer import YamlComposer
+from easybackup.policy.backup import CronBackupPolicy
+
+from .mock import MemoryRepositoryAdapter, clock
+
+
+def next_fire(expression, datetime):
+    return Clock.from_timestamp(CronExpression(expression).next_after(Clock.timestamp(datetime)))
+
+
+@pytest.mark.parametrize('expression, datetime, expected', [
+    ('30 2 * * *', '20200420_010000', '20200420_023000'),
+    ('30 2 * * *', '20200420_023000', '20200421_023000'),
+    ('*/15 * * * *', '20200420_235959', '20200421_000000'),
+    ('0 9-17/4 * * 1-5', '20200424_180000', '20200427_090000'),
+    ('0 0 1 */3 *', '20200420_130000', '20200701_000000'),
+    ('0 0 29 2 *', '20200301_000000', '20240229_000000'),
+    ('0 0 13 * 5', '20200420_000000', '20200424_000000'),
+    ('@weekly', '20200420_130000', '20200426_000000'),
+    ('0 12 * * 7', '20200420_130000', '20200426_120000'),
+])
+def test_cron_next_fire_time(expression, datetime, expected):
+    assert next_fire(expression, datetime) == expected
+
+
+@pytest.mark.parametrize('expression', ['* * * *', '61 * * * *', '5-1 * * * *', '*/0 * * * *', 'a * * * *'])
+def test_invalid_cron_expression(expression):
+    with pytest.raises(EasyBackupException):
+        CronExpression(expression)
+
+
+def test_cron_expression_never_firing():
+    with pytest.raises(EasyBackupException):
+        CronExpression('0 0 30 2 *').next_after(0)
+
+
+def backups(*datetimes):
+    return [Backup(project='myproject', volume='db', datetime=datetime, file_type='tar') for datetime in datetimes]
+
+
+@clock('20200421_023000')
+def test_cron_backup_policy_is_due_at_schedule():
+
+    policy = CronBackupPolicy(schedule='30 2 * * *')
+
+    assert policy.should_backup([])
+    assert policy.should_backup(backups('20200420_023000'))
+    assert not policy.should_backup(backups('20200420_023000', '20200421_023000'))
+    assert Clock.from_timestamp(policy.next_due(backups('20200421_023000'))) == '20200422_023000'
+
+
+@clock('20200421_120000')
+def test_cron_backup_policy_skips_schedules_out_of_window():
+
+    late = CronBackupPolicy(schedule='30 2 * * *')
+    windowed = CronBackupPolicy(schedule='30 2 * * *', window=60*60)
+
+    assert late.should_backup(backups('20200420_023000'))
+    assert not windowed.should_backup(backups('20200420_023000'))
+    assert Clock.from_timestamp(windowed.next_due(backups('20200420_023000'))) == '20200422_023000'
+
+
+def test_yaml_load_cron_backup_policy():
+
+    composer = YamlComposer("""
+        version: 1.0.0
+        projects:
+            myproject:
+                app:
+                   type: inmemory
+                   source_bucket: A
+                   target_bucket: B
+
+                   backup_policy:
+                     policy: cron
+                     schedule: 30 2 * * *
+                     window: 2h
+    """).composers[0]
+
+    assert type(composer.backup_policy) is CronBackupPolicy
+    assert composer.backup_policy.schedule == '30 2 * * *'
+    assert composer.backup_policy.window == 2*60*60
+
+
+@clock('20200421_120000')
+def test_watch_sleeps_until_the_next_due_backup(monkeypatch):
+
+    composer = YamlComposer("""
+        version: 1.0.0
+        projects:
+            myproject:
+                app:
+                   type: inmemory
+                   target_bucket: D
+
+                   backup_policy:
+                     policy: timeinterval
+                     interval: 30m
+    """)
+    MemoryRepositoryAdapter(bucket='D', force_clear=True)
+
+    fetches = []
+    monkeypatch.setitem(Hook.registery, 'before_fetch_backups', [lambda **kwargs: fetches.append(kwargs['volume'])])
+
+    sleeps = []
+
+    def sleep(duration):
+        sleeps.append((duration, len(fetches)))
+        if len(sleeps) == 2:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr('easybackup.loader.yaml_composer.time.sleep', sleep)
+
+    with pytest.raises(KeyboardInterrupt):
+        composer.watch()
+
+    # the second round runs nothing, nor lists the repository
+    assert sleeps == [(30*60, sleeps[0][1]), (30*60, sleeps[0][1])]
+    assert len(MemoryRepositoryAdapter(bucket='D').backups) == 1
@@ -1,9 +1,12 @@
 # -*- coding: utf-8 -*-
 import pytest
 
+from easybackup.core import exceptions as exp
 from easybackup.core.backup import Backup
 from easybackup.core.backup_supervisor import BackupSupervisor
 from easybackup.core.repository import Repository
+from easybackup.core.restore import BackupRestorer
+from easybackup.core.volume import Volume
 
 from .mock import MemoryBackupCreator, MemoryRepositoryAdapter, clock
 
@@ -40,6 +43,16 @@ def test_load_backups_repository(memory_adapter):
     assert backups[0].file_type == 'tar'
 
 
+def test_last_backup_does_not_depend_on_listing_order():
+
+    repository = Repository(adapter=MemoryRepositoryAdapter(backups=mockbackups[::-1]))
+    restorer = BackupRestorer(repository, Volume(name='db', project='myproject'))
+
+    assert repository.last_backup().datetime == '20200422_130000'
+    assert restorer.select().datetime == '20200422_130000'
+    assert restorer.select('20200421_140000').datetime == '20200421_130000'
+
+
 def test_fetch_backup_on_repository_with_many_volumes():
 
     mockbackups = [
@@ -90,3 +103,21 @@ def test_fetch_backup_on_repository_with_many_project():
     assert len(backups) == 2
     assert backups[0].project == 'myproject'
     assert backups[1].project == 'myproject'
+
+
+def test_backup_is_a_value_hashed_by_name():
+
+    backup = Backup(datetime='20200420_130000', project='myproject', volume='db', file_type='tar')
+    same = Backup(datetime='20200420_130000', project='myproject', volume='db')
+    other = Backup(datetime='20200420_130100', project='myproject', volume='db', file_type='tar')
+
+    assert backup == same
+    assert backup != other
+    assert len({backup, same, other}) == 2
+    assert other.epoch - backup.epoch == 60
+
+    with pytest.raises(AttributeError):
+        backup.datetime = '20200420_130100'
+
+    with pytest.raises(exp.BackupParseNameError):
+        Backup(datetime='20200420', project='myproject', volume='db')
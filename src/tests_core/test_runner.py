@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from easybackup.core.backup_supervisor import BackupSupervisor
+from easybackup.core.hook import Hook
+from easybackup.core.repository import Repository
+from easybackup.core.runner import SupervisorRunner
+from easybackup.policy.backup import TimeIntervalBackupPolicy
+
+from .mock import MemoryBackupCreator, MemoryRepositoryAdapter
+
+
+class SlowBackupCreator(MemoryBackupCreator):
+
+    type_tag = 'inmemory_slow'
+
+    running = 0
+    max_running = 0
+    lock = threading.Lock()
+
+    def build_backup(self, backup):
+        cls = SlowBackupCreator
+        with cls.lock:
+            cls.running += 1
+            cls.max_running = max(cls.max_running, cls.running)
+        time.sleep(0.05)
+        with cls.lock:
+            cls.running -= 1
+        backup.file_type = 'tar'
+
+
+class FailingBackupCreator(MemoryBackupCreator):
+
+    type_tag = 'inmemory_failing'
+
+    def build_backup(self, backup):
+        raise RuntimeError('disk is full')
+
+
+def supervisor(volume, creator, bucket='C'):
+    return BackupSupervisor(
+        project='myproject',
+        volume=volume,
+        creator=creator,
+        repository=Repository(adapter=MemoryRepositoryAdapter(bucket=bucket, force_clear=True)),
+        backup_policy=TimeIntervalBackupPolicy(1000)
+    )
+
+
+def test_run_supervisors_concurrently_within_limits():
+
+    SlowBackupCreator.max_running = 0
+    supervisors = [
+        supervisor('vol%s' % i, SlowBackupCreator(), bucket=bucket)
+        for i, bucket in enumerate(['C', 'D', 'C', 'D'])
+    ]
+
+    failures = SupervisorRunner(supervisors, jobs=4, repository_jobs=1).run()
+
+    assert failures == []
+    assert SlowBackupCreator.max_running == 2
+
+    SlowBackupCreator.max_running = 0
+    SupervisorRunner(supervisors, jobs=4, creator_jobs=3).run()
+    assert SlowBackupCreator.max_running == 3
+
+
+def test_failing_supervisor_does_not_stop_the_others():
+
+    errors = []
+
+    @Hook.register('on_supervisor_failure')
+    def on_failure(volume, error):
+        errors.append((volume.name, str(error)))
+
+    supervisors = [
+        supervisor('app', SlowBackupCreator()),
+        supervisor('db', FailingBackupCreator()),
+        supervisor('www', SlowBackupCreator()),
+    ]
+
+    failures = SupervisorRunner(supervisors, jobs=2).run()
+
+    assert failures == [supervisors[1]]
+    assert errors == [('db', 'disk is full')]
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+from easybackup.core.backup_supervisor import BackupSupervisor
+from easybackup.core.repository import Repository
+from easybackup.core.repository_link import Synchroniser
+from easybackup.core.snapshot import ListingSnapshot
+from easybackup.core.volume import Volume
+from easybackup.policy.backup import TimeIntervalBackupPolicy
+from easybackup.policy.cleanup import LifetimeCleanupPolicy
+from easybackup.policy.synchronization import SynchronizeRecentPolicy
+
+from .mock import MemoryBackupCreator, MemoryRepositoryAdapter, MemoryRepositoryLink, clock
+
+mockbackups = [
+    'easybackup-myproject-db-20200420_130000.tar',
+    'easybackup-myproject-db-20200420_130100.tar',
+    'easybackup-myproject-db-20200421_130000.tar',
+    'easybackup-myproject-db-20200422_130000.tar',
+]
+
+
+class CountingRepositoryAdapter(MemoryRepositoryAdapter):
+
+    type_tag = 'inmemory_counting'
+
+    fetch_count = {}
+
+    def fetch_backups(self):
+        self.fetch_count[self.bucket] = self.fetch_count.get(self.bucket, 0) + 1
+        return super().fetch_backups()
+
+
+def test_snapshot_is_inactive_outside_a_run():
+
+    adapter = CountingRepositoryAdapter(bucket='A', backups=list(mockbackups))
+    CountingRepositoryAdapter.fetch_count = {}
+
+    Repository(adapter=adapter).fetch()
+    Repository(adapter=adapter).fetch()
+
+    assert ListingSnapshot.active() is False
+    assert CountingRepositoryAdapter.fetch_count['A'] == 2
+
+
+def test_snapshot_is_shared_between_adapters_with_same_identity():
+
+    CountingRepositoryAdapter(bucket='A', backups=list(mockbackups))
+    CountingRepositoryAdapter.fetch_count = {}
+
+    with ListingSnapshot.run():
+        Repository(adapter=CountingRepositoryAdapter(bucket='A')).fetch()
+        backups = Repository(adapter=CountingRepositoryAdapter(bucket='A')).fetch(
+            volume=Volume(name='db', project='myproject')
+        )
+
+    assert len(backups) == 4
+    assert CountingRepositoryAdapter.fetch_count['A'] == 1
+
+
+@clock('20200423_120000')
+def test_snapshot_is_updated_by_cleanup_build_and_copy():
+
+    adapterA = CountingRepositoryAdapter(bucket='A', backups=list(mockbackups))
+    adapterB = CountingRepositoryAdapter(bucket='B', force_clear=True)
+    CountingRepositoryAdapter.fetch_count = {}
+
+    creator = MemoryBackupCreator(target_bucket='A')
+    creator.target_adapter = lambda: CountingRepositoryAdapter(bucket='A')
+
+    supervisor = BackupSupervisor(
+        project='myproject',
+        volume='db',
+        creator=creator,
+        repository=Repository(adapter=adapterA),
+        backup_policy=TimeIntervalBackupPolicy(60),
+        cleanup_policy=LifetimeCleanupPolicy(max_age=24*60*60, minimum=2),
+        synchronizers=[
+            Synchroniser(MemoryRepositoryLink(adapterA, adapterB), SynchronizeRecentPolicy(minimum=2))
+        ]
+    )
+
+    with ListingSnapshot.run():
+        supervisor.run()
+        snapshot_a = Repository(adapter=adapterA).fetch()
+        snapshot_b = Repository(adapter=adapterB).fetch()
+
+    assert CountingRepositoryAdapter.fetch_count == {'A': 1, 'B': 1}
+    assert len(snapshot_a) == 3
+    assert snapshot_a[-1].datetime == '20200423_120000'
+    assert len(snapshot_b) == 2
+    assert [b.formated_name for b in snapshot_a] == [b.formated_name for b in adapterA.fetch_backups()]
+    assert [b.formated_name for b in snapshot_b] == [b.formated_name for b in adapterB.fetch_backups()]
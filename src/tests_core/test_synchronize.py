@@ -10,9 +10,11 @@ from easybackup.core.backup_supervisor import BackupSupervisor
 from easybackup.core.repository_link import RepositoryLink, Synchroniser
 from easybackup.core.repository import Repository
 from easybackup.policy.backup import TimeIntervalBackupPolicy
-from easybackup.policy.synchronization import CopyPastePolicy, SynchronizeRecentPolicy
+from easybackup.policy.synchronization import (BackupDiff, BudgetSynchronizationPolicy, ClonePolicy, CopyPastePolicy,
+                                               SynchronizeRecentPolicy, TransferBudget)
 from easybackup.policy.cleanup import LifetimeCleanupPolicy
 from easybackup.core.clock import Clock
+from easybackup.core.hook import Hook
 
 
 from .mock import (MemoryBackupCreator, MemoryRepositoryAdapter,
@@ -246,3 +248,141 @@ def test_synchronise_repository_with_multiple_volumes():
     assert len(tocopy) == 2
     assert tocopy[0].volume == 'db'
     assert tocopy[1].volume == 'db'
+
+
+def test_diff_source_and_target_listings():
+
+    source = [MemoryRepositoryAdapter.filename_to_backup(name) for name in mockbackups[1:]]
+    target = [MemoryRepositoryAdapter.filename_to_backup(name) for name in mockbackups[:3]]
+
+    diff = BackupDiff(list(reversed(source)), target)
+
+    assert [b.datetime for b in diff.missing] == ['20200422_130000']
+    assert [b.datetime for b in diff.extra] == ['20200420_130000']
+    assert [b.datetime for b in diff.common] == ['20200420_130100', '20200421_130000']
+    assert [b.datetime for b in diff.source] == ['20200420_130100', '20200421_130000', '20200422_130000']
+
+
+def test_plan_fetches_each_repository_once():
+
+    A = Repository(adapter=MemoryRepositoryAdapter(bucket='A', backups=mockbackups))
+    B = Repository(adapter=MemoryRepositoryAdapter(bucket='B', backups=mockbackups[:3]))
+
+    fetched = []
+    A.fetch = lambda volume=False, fetch=A.fetch: fetched.append('A') or fetch(volume)
+    B.fetch = lambda volume=False, fetch=B.fetch: fetched.append('B') or fetch(volume)
+
+    tocopy, todelete = SynchronizeRecentPolicy(minimum=3).plan(A, B)
+
+    assert sorted(fetched) == ['A', 'B']
+    assert [b.datetime for b in tocopy] == ['20200422_130000']
+    assert [b.datetime for b in todelete] == ['20200420_130000']
+
+
+def test_copy_backups_with_concurrent_transfers():
+
+    adapterA = MemoryRepositoryAdapter(bucket='A', backups=mockbackups)
+    adapterB = MemoryRepositoryAdapter(bucket='B', force_clear=True)
+
+    transferred = []
+
+    @Hook.register('on_backup_transferred')
+    def on_transferred(backup, source, target, size, duration):
+        transferred.append(backup.formated_name)
+
+    link = MemoryRepositoryLink(adapterA, adapterB, workers=3)
+    link.synchronize(policy=CopyPastePolicy())
+
+    assert len(adapterB.fetch_backups()) == 4
+    assert sorted(transferred) == sorted(b.formated_name for b in adapterA.fetch_backups())
+
+
+def test_copy_backups_aggregates_transfer_errors():
+
+    class FlakyRepositoryLink(MemoryRepositoryLink):
+
+        def copy_backup(self, backup):
+            if backup.datetime.endswith('130100'):
+                raise IOError('connection reset')
+            return super().copy_backup(backup)
+
+    adapterA = MemoryRepositoryAdapter(bucket='A', backups=mockbackups)
+    adapterB = MemoryRepositoryAdapter(bucket='B', force_clear=True)
+
+    link = FlakyRepositoryLink(adapterA, adapterB, workers=2)
+    with pytest.raises(exp.BackupTransferError) as error:
+        link.synchronize(policy=CopyPastePolicy())
+
+    assert error.value.kwargs['count'] == 1
+    assert 'connection reset' in str(error.value)
+    assert len(adapterB.fetch_backups()) == 3
+
+
+def test_clone_policy_mirrors_source_from_a_single_listing(monkeypatch):
+
+    extra = 'easybackup-myproject-db-20200419_130000.tar'
+    adapterA = MemoryRepositoryAdapter(bucket='A', backups=list(mockbackups))
+    adapterB = MemoryRepositoryAdapter(bucket='B', backups=[extra, mockbackups[1]])
+
+    fetches = []
+    for adapter in (adapterA, adapterB):
+        fetch_backups = adapter.fetch_backups
+        monkeypatch.setattr(adapter, 'fetch_backups', lambda fetch_backups=fetch_backups, bucket=adapter.bucket: (
+            fetches.append(bucket) or fetch_backups()
+        ))
+
+    MemoryRepositoryLink(adapterA, adapterB).synchronize(policy=ClonePolicy())
+
+    assert sorted(fetches) == ['A', 'B']
+    # the most recent backups are copied first
+    assert adapterB.backups == [mockbackups[1], mockbackups[3], mockbackups[2], mockbackups[0]]
+
+
+def test_transfer_budget_stops_admitting_once_exhausted(monkeypatch):
+
+    budget = TransferBudget(max_bytes=100)
+    assert budget.admit(150)
+    assert not budget.admit(0)
+
+    budget = TransferBudget(max_bytes=100)
+    assert [budget.admit(size) for size in (60, 30, 20, 5)] == [True, True, False, False]
+    assert budget.spent == 90
+
+    now = [1000.0]
+    monkeypatch.setattr('easybackup.policy.synchronization.time.monotonic', lambda: now[0])
+    budget = TransferBudget(max_duration=60)
+    assert budget.admit()
+    now[0] += 61
+    assert not budget.admit()
+
+
+def test_budget_policy_copies_recent_backups_first():
+
+    names = ['easybackup-myproject-db-2020042%d_130000.tar' % day for day in range(3)]
+    policy = BudgetSynchronizationPolicy(max_bytes=100)
+    diff = BackupDiff(list(map(MemoryRepositoryAdapter.filename_to_backup, names)), [])
+
+    assert [backup.datetime for backup in policy.copies(diff)] == [
+        '20200422_130000',
+        '20200421_130000',
+        '20200420_130000',
+    ]
+    assert policy.deletes(diff) == []
+
+
+def test_postponed_transfers_do_no_io(monkeypatch):
+
+    names = ['easybackup-myproject-db-2020042%d_130000.tar' % day for day in range(4)]
+    adapterA = MemoryRepositoryAdapter(bucket='A', backups=list(names))
+    adapterB = MemoryRepositoryAdapter(bucket='B', force_clear=True)
+    link = MemoryRepositoryLink(adapterA, adapterB)
+
+    reads = []
+    monkeypatch.setattr(adapterA, 'read_metadata', lambda backup: reads.append(backup) or {})
+    backups = [MemoryRepositoryAdapter.filename_to_backup(name, size=100) for name in names[::-1]]
+
+    link.copy_backups(backups, budget=TransferBudget(max_bytes=150))
+
+    # only the admitted backup reads its sidecar, after being copied
+    assert reads == backups[:1]
+    assert adapterB.backups == [names[3]]